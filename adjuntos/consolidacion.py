@@ -2,6 +2,7 @@ from django.conf import settings
 import structlog
 from adjuntos.models import Attachment, Identificacion
 from elecciones.models import Carga, MesaCategoria
+from elecciones.cache_resultados import avanzar_epoca_consolidacion
 from fiscales.models import Fiscal
 from django.db import transaction
 from django.db.models import Count, Q
@@ -10,6 +11,7 @@ from django.utils import timezone
 from datetime import timedelta
 from django.db.models.signals import post_save
 from problemas.models import Problema
+from scheduling.models import MetricasColaPorMinuto, NovedadScheduler
 from antitrolling.efecto import (
     efecto_scoring_troll_asociacion_attachment, efecto_scoring_troll_confirmacion_carga
 )
@@ -161,7 +163,9 @@ def consolidar_cargas(mesa_categoria):
         MesaCategoria.STATUS.parcial_consolidada_dc,
         MesaCategoria.STATUS.total_consolidada_dc
     ]
-    status_resultante = consolidar_cargas_sin_antitrolling(mesa_categoria)
+    mesa_categorias = MesaCategoria.objects.filter(id=mesa_categoria.id)
+    with NovedadScheduler.registrar_cambios(mesa_categorias=mesa_categorias):
+        status_resultante = consolidar_cargas_sin_antitrolling(mesa_categoria)
 
     # Esto lo hacemos fuera de la transición para evitar deadlock (ver #337).
     if status_resultante in statuses_que_requieren_computar_efecto_trolling:
@@ -234,30 +238,38 @@ def consolidar_identificaciones(attachment):
     # me acuerdo la mesa anterior por si se esta pasando a sin_identificar
     mesa_anterior = attachment.mesa
 
-    for attachment in attachment.with_children():
-        # si tiene hijos se asigna la misma mesa.
-
-        # Identifico el attachment y potencialmente sus attachment hijos.
-        # Notar que esta identificación podría estar sumando al attachment a una mesa que ya tenga.
-        # Eso es correcto.
-        # También podría estar haciendo pasar una attachment identificado al estado sin_identificar,
-        # porque ya no está más vigente alguna identificación que antes sí.
-        attachment.status = status_attachment
-        attachment.mesa = mesa_attachment
-        if attachment.parent is None:
-            attachment.identificacion_testigo = testigo
-        attachment.save(update_fields=['mesa', 'status', 'identificacion_testigo'])
-        logger.info(
-            'Consolid. identificación',
-            attachment=attachment.id,
-            testigo=getattr(attachment.identificacion_testigo, 'id', None),
-            status=status_attachment
-        )
+    # Pueden cambiar las tareas pendientes del attachment (y sus hijos) y las de las
+    # mesa-categorías de la mesa que tenía y de la que se le asigna.
+    with NovedadScheduler.registrar_cambios(
+        mesa_categorias=MesaCategoria.objects.filter(
+            mesa_id__in=[attachment.mesa_id, getattr(mesa_attachment, 'id', None)]
+        ),
+        attachments=Attachment.objects.filter(Q(id=attachment.id) | Q(parent_id=attachment.id)),
+    ):
+        for attachment in attachment.with_children():
+            # si tiene hijos se asigna la misma mesa.
+
+            # Identifico el attachment y potencialmente sus attachment hijos.
+            # Notar que esta identificación podría estar sumando al attachment a una mesa que ya tenga.
+            # Eso es correcto.
+            # También podría estar haciendo pasar una attachment identificado al estado sin_identificar,
+            # porque ya no está más vigente alguna identificación que antes sí.
+            attachment.status = status_attachment
+            attachment.mesa = mesa_attachment
+            if attachment.parent is None:
+                attachment.identificacion_testigo = testigo
+            attachment.save(update_fields=['mesa', 'status', 'identificacion_testigo'])
+            logger.info(
+                'Consolid. identificación',
+                attachment=attachment.id,
+                testigo=getattr(attachment.identificacion_testigo, 'id', None),
+                status=status_attachment
+            )
 
-    # Si el attachment pasa de tener una mesa a no tenerla, entonces hay que invalidar
-    # todo lo que se haya cargado para las MesaCategoria de la mesa que perdió su attachment.
-    if mesa_anterior and not mesa_attachment:
-        mesa_anterior.invalidar_asignacion_attachment()
+        # Si el attachment pasa de tener una mesa a no tenerla, entonces hay que invalidar
+        # todo lo que se haya cargado para las MesaCategoria de la mesa que perdió su attachment.
+        if mesa_anterior and not mesa_attachment:
+            mesa_anterior.invalidar_asignacion_attachment()
 
 
 def consumir_novedades_identificacion(cant_por_iteracion=None):
@@ -332,6 +344,10 @@ def consumir_novedades_identificacion(cant_por_iteracion=None):
     if con_error:
         Identificacion.objects.filter(id__in=con_error).update(tomada_por_consolidador=None)
 
+    # Las identificaciones cambian el avance de carga.
+    if procesadas:
+        avanzar_epoca_consolidacion()
+
     return procesadas
 
 
@@ -355,6 +371,7 @@ def consumir_novedades_carga(cant_por_iteracion=None):
     mesa_categorias_con_novedades = MesaCategoria.objects.filter(
         cargas__in=ids_a_procesar
     ).distinct()
+    estado_anterior = estado_de_mesa_categorias(mesa_categorias_con_novedades)
     con_error = []
 
     for mesa_categoria_con_novedades in mesa_categorias_con_novedades:
@@ -405,14 +422,27 @@ def consumir_novedades_carga(cant_por_iteracion=None):
     if con_error:
         Carga.objects.filter(id__in=con_error).update(tomada_por_consolidador=None)
 
+    # Los resultados cacheados sólo se invalidan si cambió lo que se consolidó.
+    if estado_de_mesa_categorias(mesa_categorias_con_novedades) != estado_anterior:
+        avanzar_epoca_consolidacion()
+
     return procesadas
 
 
+def estado_de_mesa_categorias(mesa_categorias):
+    """
+    Status y carga testigo de cada MesaCategoria, que es lo que determina los resultados.
+    """
+    return set(mesa_categorias.values_list('id', 'status', 'carga_testigo_id'))
+
+
 def liberar_mesacategorias_y_attachments():
     """
     Para la documentación ver a la función a la que se llama.
     """
-    Fiscal.liberar_mesacategorias_y_attachments()
+    vencidas = Fiscal.liberar_mesacategorias_y_attachments()
+    if vencidas:
+        MetricasColaPorMinuto.registrar(tareas_vencidas=vencidas)
 
 
 def consumir_novedades(cant_por_iteracion=None):
@@ -431,12 +461,10 @@ def consumir_novedades(cant_por_iteracion=None):
 
 @receiver(post_save, sender=Attachment)
 def actualizar_orden_de_carga(sender, instance=None, created=False, **kwargs):
-    if instance.mesa and instance.identificacion_testigo:
-        # Un nuevo attachment para una mesa ya identificada
-        # (es decir, con coeficiente de orden de carga ya definido) la vuelve a actualizar.
-        a_actualizar = MesaCategoria.objects.filter(mesa=instance.mesa)
-        for mc in a_actualizar:
-            mc.actualizar_coeficiente_para_orden_de_carga()
+    if instance.mesa_id and instance.identificacion_testigo_id:
+        # Las MesaCategoria de la mesa que todavía no tenían orden de carga lo reciben ahora.
+        # Si la mesa ya estaba identificada (un nuevo attachment para la misma mesa), no cambia.
+        MesaCategoria.asignar_orden_de_carga(instance.mesa_id)
 
 # (*) Explicación de por qué es necesario obtener los ids de las cargas:
 #
@@ -8,7 +8,7 @@ from django.db.models import Count, Value, F
 from django.db.models.functions import Coalesce
 from django.db.models import Q
 from django.db import models
-from model_utils import Choices
+from model_utils import Choices, FieldTracker
 from model_utils.fields import StatusField
 from model_utils.models import TimeStampedModel
 import structlog
@@ -210,6 +210,9 @@ class Attachment(TimeStampedModel):
         null=False
     )
 
+    # Para actualizar los resúmenes de avance cuando la foto cambia de mesa.
+    tracker = FieldTracker(fields=['mesa'])
+
     def asignar_a_fiscal(self):
         self.cant_fiscales_asignados += 1
         self.cant_asignaciones_realizadas += 1
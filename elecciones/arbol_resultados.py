@@ -0,0 +1,234 @@
+from attrdict import AttrDict
+from django.db import connection
+from .models import (
+    Circuito,
+    Mesa,
+    MesaCategoria,
+    MesasEscrutadasCircuito,
+    Seccion,
+    VotosCircuito,
+    NIVELES_DE_AGREGACION,
+)
+from .resultados import Resultados
+from .sumarizador import Sumarizador
+
+
+# Niveles que se resuelven en el árbol, del más general al más particular.
+NIVELES_DEL_ARBOL = [
+    NIVELES_DE_AGREGACION.distrito,
+    NIVELES_DE_AGREGACION.seccion,
+    NIVELES_DE_AGREGACION.circuito,
+]
+
+# Valor de GROUPING(distrito, seccion, circuito) para cada nivel del ROLLUP.
+# Cada bit prendido indica una columna que fue agregada.
+GROUPING_POR_NIVEL = {
+    0b111: None,
+    0b011: NIVELES_DE_AGREGACION.distrito,
+    0b001: NIVELES_DE_AGREGACION.seccion,
+    0b000: NIVELES_DE_AGREGACION.circuito,
+}
+
+
+class NodoDeResultados():
+    """
+    Un nodo del árbol de resultados: una unidad geográfica con sus resultados y sus hijos.
+    El nodo raíz (nivel None) corresponde a todo el país.
+    """
+
+    def __init__(self, nivel, id_unidad, resultados, padre=None, votos_por_opcion=None):
+        self.nivel = nivel
+        self.id = id_unidad
+        self.resultados = resultados
+        # Votos sin agrupar: {id de opción: votos}.
+        self.votos_por_opcion = votos_por_opcion or {}
+        # Clave (nivel, id) del nodo padre.
+        self.padre = padre
+        self.hijos = []
+
+    def __repr__(self):
+        return f'NodoDeResultados({self.nivel}, {self.id})'
+
+
+class ArbolDeResultados(Sumarizador):
+    """
+    Calcula de una sola vez los resultados de una categoría para todos los niveles de la
+    jerarquía Distrito -> Sección -> Circuito, usando ROLLUP sobre los totales por circuito.
+
+    Los números de cada nodo son los mismos que devolvería ``Sumarizador.calcular`` filtrando
+    por esa unidad geográfica.
+    """
+
+    def __init__(self, tipo_de_agregacion, opciones_a_considerar):
+        super().__init__(tipo_de_agregacion=tipo_de_agregacion, opciones_a_considerar=opciones_a_considerar)
+        self.nodos = {}
+
+    @classmethod
+    def resuelve(cls, sumarizador):
+        """
+        Indica si los resultados que calcularía el sumarizador pueden leerse del árbol.
+        """
+        return (
+            type(sumarizador) is Sumarizador and
+            (not sumarizador.ids_a_considerar or len(sumarizador.ids_a_considerar) == 1) and
+            (sumarizador.nivel_de_agregacion is None or sumarizador.nivel_de_agregacion in NIVELES_DEL_ARBOL)
+        )
+
+    def statuses_a_considerar(self, categoria):
+        lookups = self.cargas_a_considerar_status_filter(categoria, '')
+        if 'status' in lookups:
+            return (lookups['status'], )
+        return tuple(lookups.get('status__in', (status for status, _ in MesaCategoria.STATUS)))
+
+    def rollup(self, sql, params):
+        """
+        Ejecuta la consulta y devuelve las filas indexadas por (nivel, id de la unidad).
+        La consulta debe devolver las tres columnas de agrupación, luego los valores y por último
+        el GROUPING de las tres columnas.
+        """
+        filas = {}
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            for id_distrito, id_seccion, id_circuito, *valores, grouping in cursor.fetchall():
+                nivel = GROUPING_POR_NIVEL[grouping]
+                id_unidad = {
+                    None: None,
+                    NIVELES_DE_AGREGACION.distrito: id_distrito,
+                    NIVELES_DE_AGREGACION.seccion: id_seccion,
+                    NIVELES_DE_AGREGACION.circuito: id_circuito,
+                }[nivel]
+                filas.setdefault((nivel, id_unidad), []).append(
+                    (id_distrito, id_seccion, id_circuito, *valores)
+                )
+        return filas
+
+    def totales_de_mesas(self, categoria):
+        """
+        Cantidad de mesas y electores de la categoría en cada unidad.
+        """
+        return self.rollup(
+            f'SELECT s.distrito_id, c.seccion_id, m.circuito_id, COUNT(*), COALESCE(SUM(m.electores), 0), '
+            f'GROUPING(s.distrito_id, c.seccion_id, m.circuito_id) '
+            f'FROM "{Mesa._meta.db_table}" m '
+            f'JOIN "{MesaCategoria._meta.db_table}" mc ON mc.mesa_id = m.id AND mc.categoria_id = %s '
+            f'LEFT JOIN "{Circuito._meta.db_table}" c ON c.id = m.circuito_id '
+            f'LEFT JOIN "{Seccion._meta.db_table}" s ON s.id = c.seccion_id '
+            f'GROUP BY ROLLUP(s.distrito_id, c.seccion_id, m.circuito_id)',
+            [categoria.id]
+        )
+
+    def totales_de_mesas_escrutadas(self, categoria):
+        """
+        Cantidad de mesas escrutadas y sus electores en cada unidad.
+        """
+        return self.rollup(
+            f'SELECT s.distrito_id, c.seccion_id, e.circuito_id, SUM(e.cant_mesas), SUM(e.electores), '
+            f'GROUPING(s.distrito_id, c.seccion_id, e.circuito_id) '
+            f'FROM "{MesasEscrutadasCircuito._meta.db_table}" e '
+            f'JOIN "{Circuito._meta.db_table}" c ON c.id = e.circuito_id '
+            f'JOIN "{Seccion._meta.db_table}" s ON s.id = c.seccion_id '
+            f'WHERE e.categoria_id = %s AND e.status IN %s '
+            f'GROUP BY ROLLUP(s.distrito_id, c.seccion_id, e.circuito_id)',
+            [categoria.id, self.statuses_a_considerar(categoria)]
+        )
+
+    def totales_de_votos(self, categoria):
+        """
+        Votos por opción en cada unidad.
+        """
+        return self.rollup(
+            f'SELECT s.distrito_id, c.seccion_id, v.circuito_id, v.opcion_id, SUM(v.votos), '
+            f'GROUPING(s.distrito_id, c.seccion_id, v.circuito_id) '
+            f'FROM "{VotosCircuito._meta.db_table}" v '
+            f'JOIN "{Circuito._meta.db_table}" c ON c.id = v.circuito_id '
+            f'JOIN "{Seccion._meta.db_table}" s ON s.id = c.seccion_id '
+            f'WHERE v.categoria_id = %s AND v.status IN %s AND v.opcion_id IN %s '
+            f'GROUP BY v.opcion_id, ROLLUP(s.distrito_id, c.seccion_id, v.circuito_id)',
+            [
+                categoria.id,
+                self.statuses_a_considerar(categoria),
+                tuple(self.opciones_dict().keys()) or (None, ),
+            ]
+        )
+
+    def calcular_arbol(self, categoria):
+        self.categoria = categoria
+        mesas = self.totales_de_mesas(categoria)
+        escrutadas = self.totales_de_mesas_escrutadas(categoria)
+        votos = self.totales_de_votos(categoria)
+
+        for clave, filas in mesas.items():
+            nivel, id_unidad = clave
+            if nivel is not None and id_unidad is None:
+                # Mesas sin circuito: sólo cuentan para el total del país.
+                continue
+            _, _, _, total_mesas, electores = filas[0]
+            total_mesas_escrutadas, electores_en_mesas_escrutadas = next(
+                ((cant, electores) for *_, cant, electores in escrutadas.get(clave, [])), (0, 0)
+            )
+            votos_por_opcion = {opcion.id: 0 for opcion in self.opciones()}
+            votos_por_opcion.update(
+                (id_opcion, sum_votos) for *_, id_opcion, sum_votos in votos.get(clave, [])
+            )
+            votos_positivos, votos_no_positivos = self.agrupar_votos(votos_por_opcion.items())
+
+            # El padre de cada nodo es el nivel inmediato superior de la misma fila.
+            id_distrito, id_seccion, *_ = filas[0]
+            padre = {
+                None: None,
+                NIVELES_DE_AGREGACION.distrito: (None, None),
+                NIVELES_DE_AGREGACION.seccion: (NIVELES_DE_AGREGACION.distrito, id_distrito),
+                NIVELES_DE_AGREGACION.circuito: (NIVELES_DE_AGREGACION.seccion, id_seccion),
+            }[nivel]
+
+            resultados = Resultados(self.opciones_a_considerar, AttrDict({
+                "total_mesas": total_mesas,
+                "total_mesas_escrutadas": total_mesas_escrutadas or 0,
+                "electores": electores,
+                "electores_en_mesas_escrutadas": electores_en_mesas_escrutadas or 0,
+                "votos_positivos": votos_positivos,
+                "votos_no_positivos": votos_no_positivos,
+            }))
+            self.nodos[clave] = NodoDeResultados(nivel, id_unidad, resultados, padre, votos_por_opcion)
+
+        for nodo in self.nodos.values():
+            if nodo.padre in self.nodos:
+                self.nodos[nodo.padre].hijos.append(nodo)
+
+        return self.raiz
+
+    @property
+    def raiz(self):
+        return self.nodos.get((None, None))
+
+    def nodo(self, nivel=None, id_unidad=None):
+        return self.nodos.get((nivel, int(id_unidad) if id_unidad is not None else None))
+
+    def resultados_para(self, nivel=None, id_unidad=None):
+        """
+        Devuelve los resultados de la unidad pedida. Si la unidad no tiene mesas para la
+        categoría, devuelve resultados vacíos.
+        """
+        nodo = self.nodo(nivel, id_unidad)
+        if nodo:
+            return nodo.resultados
+        votos_positivos, votos_no_positivos = self.agrupar_votos(
+            (opcion.id, 0) for opcion in self.opciones()
+        )
+        return Resultados(self.opciones_a_considerar, AttrDict({
+            "total_mesas": 0,
+            "total_mesas_escrutadas": 0,
+            "electores": 0,
+            "electores_en_mesas_escrutadas": 0,
+            "votos_positivos": votos_positivos,
+            "votos_no_positivos": votos_no_positivos,
+        }))
+
+    def get_resultados(self, categoria):
+        """
+        Como en el Sumarizador, los resultados de todo el país.
+        """
+        if getattr(self, 'categoria', None) != categoria:
+            self.nodos = {}
+            self.calcular_arbol(categoria)
+        return self.resultados_para()
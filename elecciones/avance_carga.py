@@ -1,4 +1,4 @@
-from django.db.models import Q, Sum, OuterRef, Exists
+from django.db.models import Q, Count, Sum, OuterRef, Exists
 from attrdict import AttrDict
 from .models import (
     Distrito,
@@ -13,7 +13,7 @@ from .models import (
 )
 from .resultados import porcentaje_numerico
 from .sumarizador import Sumarizador
-from adjuntos.models import Identificacion, PreIdentificacion
+from adjuntos.models import Attachment, Identificacion, PreIdentificacion
 
 
 class AvanceDeCarga(Sumarizador):
@@ -70,86 +70,69 @@ class AvanceDeCarga(Sumarizador):
             cantidad_preidentificaciones = PreIdentificacion.objects.filter(lookups_preident).count()
 
 
-        mesacats_de_la_categoria = MesaCategoria.objects.filter(
-            mesa__in=self.mesas_a_considerar,
-            categoria=self.categoria
-        )
-
-        # mesas sin identificar y en identificación: dependen de las identificaciones **válidas**
-        # y de los attachment.
-        # respecto de la condición "mesa__attachments=None" ver comentario abajo, 
-        # en la definición de mesacats_sin_cargar
-        identificaciones_validas_mesacat = Identificacion.objects.filter(mesa=OuterRef('mesa'), invalidada=False)
-        mesacats_con_marca_identificacion = mesacats_de_la_categoria.annotate(
-            tiene_identificaciones=Exists(identificaciones_validas_mesacat))
-        mesacats_sin_identificar = mesacats_con_marca_identificacion.filter(
-            tiene_identificaciones=False)
-        mesacats_sin_identificar_sin_cargas = mesacats_sin_identificar.filter(status=MesaCategoria.STATUS.sin_cargar)
-        mesacats_sin_identificar_con_cargas = mesacats_sin_identificar.exclude(status=MesaCategoria.STATUS.sin_cargar)
-        mesacats_en_identificacion = mesacats_con_marca_identificacion.filter(
-            tiene_identificaciones=True, mesa__attachments=None)
-        mesacats_en_identificacion_sin_cargas = mesacats_en_identificacion.filter(
-            status=MesaCategoria.STATUS.sin_cargar)
-        mesacats_en_identificacion_con_cargas = mesacats_en_identificacion.exclude(
-            status=MesaCategoria.STATUS.sin_cargar)
-        
-
-        # mesas sin identificar y en identificación: dependen de las identificaciones **válidas**
-        # y de los attachment
-        # identificaciones_validas_mesa = Identificacion.objects.filter(mesa=OuterRef('pk'), invalidada=False)
-        # mesas_con_marca_identificacion = self.mesas_a_considerar.annotate(
-        #     tiene_identificaciones=Exists(identificaciones_validas_mesa))
-        # mesas_sin_identificar = mesas_con_marca_identificacion.filter(
-        #     tiene_identificaciones=False)
-        # mesas_en_identificacion = mesas_con_marca_identificacion.filter(
-        #     tiene_identificaciones=True, attachments=None)
-
-        # como "a cargar" se reportan solamente los que tienen attachments
-        # OJO hay que hacer .exclude(mesa__attachments=None), si el query se arma distinto
-        # se corre el peligro de que una mesa con N attachments con N > 1 (lo que es válido en esta app) cuente N veces.
-        # Carlos Lombardi, 9/8/2019
-        mesacats_sin_cargar = mesacats_de_la_categoria.filter(status=MesaCategoria.STATUS.sin_cargar) \
-            .exclude(mesa__attachments=None)
-
-        mesacats_carga_parcial_sin_consolidar = \
-            mesacats_de_la_categoria.filter(status=MesaCategoria.STATUS.parcial_sin_consolidar) 
-
-        mesacats_carga_parcial_consolidada_csv = \
-            mesacats_de_la_categoria.filter(status=MesaCategoria.STATUS.parcial_consolidada_csv)
-
-        mesacats_carga_parcial_consolidada_dc = \
-            mesacats_de_la_categoria.filter(status=MesaCategoria.STATUS.parcial_consolidada_dc)
-
-        mesacats_carga_total_sin_consolidar = \
-            mesacats_de_la_categoria.filter(status=MesaCategoria.STATUS.total_sin_consolidar)
-                
-        mesacats_carga_total_consolidada_csv = \
-            mesacats_de_la_categoria.filter(status=MesaCategoria.STATUS.total_consolidada_csv)
-
-        mesacats_carga_total_consolidada_dc = \
-            mesacats_de_la_categoria.filter(status=MesaCategoria.STATUS.total_consolidada_dc)
-
-        mesacats_conflicto_o_problema = \
-            mesacats_de_la_categoria.filter(status=MesaCategoria.STATUS.parcial_en_conflicto) | \
-                mesacats_de_la_categoria.filter(status=MesaCategoria.STATUS.total_en_conflicto) | \
-                    mesacats_de_la_categoria.filter(status=MesaCategoria.STATUS.con_problemas)
-
-        dato_total = DatoTotalAvanceDeCarga().para_mesas(self.mesas_a_considerar)
+        # Un único query, agrupado por status y por si la mesa tiene identificaciones **válidas**
+        # y attachments. Cada dato del avance se arma sumando los grupos que le corresponden.
+        # Se usa Exists (y no joins con identificaciones o attachments) para que una mesa con
+        # N attachments, con N > 1 (lo que es válido en esta app), no cuente N veces.
+        grupos = list(MesaCategoria.objects.filter(
+            categoria=self.categoria,
+            **self.lookups_de_mesas('mesa__')
+        ).annotate(
+            tiene_identificaciones=Exists(
+                Identificacion.objects.filter(mesa=OuterRef('mesa'), invalidada=False)
+            ),
+            tiene_attachments=Exists(Attachment.objects.filter(mesa=OuterRef('mesa'))),
+        ).values(
+            'status', 'tiene_identificaciones', 'tiene_attachments'
+        ).annotate(
+            cantidad_mesas=Count('id'),
+            cantidad_electores=Sum('mesa__electores'),
+        ).order_by())
+
+        def sumar_grupos(dato, condicion=lambda grupo: True):
+            seleccionados = [grupo for grupo in grupos if condicion(grupo)]
+            return dato.para_valores_fijos(
+                sum(grupo['cantidad_mesas'] for grupo in seleccionados),
+                sum(grupo['cantidad_electores'] or 0 for grupo in seleccionados),
+            )
+
+        dato_total = sumar_grupos(DatoTotalAvanceDeCarga())
+        STATUS = MesaCategoria.STATUS
+
+        def dato_parcial(condicion):
+            return sumar_grupos(DatoParcialAvanceDeCarga(dato_total), condicion)
+
+        def con_status(*statuses):
+            return lambda grupo: grupo['status'] in statuses
+
+        def sin_cargas(grupo):
+            return grupo['status'] == STATUS.sin_cargar
+
+        def sin_identificar(grupo):
+            return not grupo['tiene_identificaciones']
+
+        def en_identificacion(grupo):
+            return grupo['tiene_identificaciones'] and not grupo['tiene_attachments']
 
         return AttrDict({
             "total": dato_total,
-            "sin_identificar_sin_cargas": DatoParcialAvanceDeCarga(dato_total).para_mesacats(mesacats_sin_identificar_sin_cargas),
-            "sin_identificar_con_cargas": DatoParcialAvanceDeCarga(dato_total).para_mesacats(mesacats_sin_identificar_con_cargas),
-            "en_identificacion_sin_cargas": DatoParcialAvanceDeCarga(dato_total).para_mesacats(mesacats_en_identificacion_sin_cargas),
-            "en_identificacion_con_cargas": DatoParcialAvanceDeCarga(dato_total).para_mesacats(mesacats_en_identificacion_con_cargas),
-            "sin_cargar": DatoParcialAvanceDeCarga(dato_total).para_mesacats(mesacats_sin_cargar),
-            "carga_parcial_sin_consolidar": DatoParcialAvanceDeCarga(dato_total).para_mesacats(mesacats_carga_parcial_sin_consolidar),
-            "carga_parcial_consolidada_csv": DatoParcialAvanceDeCarga(dato_total).para_mesacats(mesacats_carga_parcial_consolidada_csv),
-            "carga_parcial_consolidada_dc": DatoParcialAvanceDeCarga(dato_total).para_mesacats(mesacats_carga_parcial_consolidada_dc),
-            "carga_total_sin_consolidar": DatoParcialAvanceDeCarga(dato_total).para_mesacats(mesacats_carga_total_sin_consolidar),
-            "carga_total_consolidada_csv": DatoParcialAvanceDeCarga(dato_total).para_mesacats(mesacats_carga_total_consolidada_csv),
-            "carga_total_consolidada_dc": DatoParcialAvanceDeCarga(dato_total).para_mesacats(mesacats_carga_total_consolidada_dc),
-            "conflicto_o_problema": DatoParcialAvanceDeCarga(dato_total).para_mesacats(mesacats_conflicto_o_problema),
+            "sin_identificar_sin_cargas": dato_parcial(lambda g: sin_identificar(g) and sin_cargas(g)),
+            "sin_identificar_con_cargas": dato_parcial(lambda g: sin_identificar(g) and not sin_cargas(g)),
+            "en_identificacion_sin_cargas": dato_parcial(lambda g: en_identificacion(g) and sin_cargas(g)),
+            "en_identificacion_con_cargas": dato_parcial(
+                lambda g: en_identificacion(g) and not sin_cargas(g)
+            ),
+            # Como "a cargar" se reportan solamente los que tienen attachments.
+            "sin_cargar": dato_parcial(lambda g: sin_cargas(g) and g['tiene_attachments']),
+            "carga_parcial_sin_consolidar": dato_parcial(con_status(STATUS.parcial_sin_consolidar)),
+            "carga_parcial_consolidada_csv": dato_parcial(con_status(STATUS.parcial_consolidada_csv)),
+            "carga_parcial_consolidada_dc": dato_parcial(con_status(STATUS.parcial_consolidada_dc)),
+            "carga_total_sin_consolidar": dato_parcial(con_status(STATUS.total_sin_consolidar)),
+            "carga_total_consolidada_csv": dato_parcial(con_status(STATUS.total_consolidada_csv)),
+            "carga_total_consolidada_dc": dato_parcial(con_status(STATUS.total_consolidada_dc)),
+            "conflicto_o_problema": dato_parcial(con_status(
+                STATUS.parcial_en_conflicto, STATUS.total_en_conflicto, STATUS.con_problemas
+            )),
             "preidentificaciones": cantidad_preidentificaciones
         })
 
@@ -0,0 +1,142 @@
+"""
+Escenarios de benchmark de los motores de cómputo (sumarizador, proyecciones, avance de carga
+y scheduler). Pensados para correr sobre el dataset de ``generar_dataset_sintetico``.
+
+De cada escenario se registra el tiempo, la cantidad de consultas a la base y el pico de memoria,
+para poder compararlo contra una línea de base guardada.
+"""
+import time
+import tracemalloc
+from collections import OrderedDict
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from scheduling.scheduler import scheduler
+from .arbol_resultados import ArbolDeResultados
+from .avance_carga import AvanceDeCarga
+from .models import (
+    Categoria,
+    Mesa,
+    TecnicaProyeccion,
+    NIVELES_DE_AGREGACION,
+    OPCIONES_A_CONSIDERAR,
+    TIPOS_DE_AGREGACIONES,
+)
+from .proyecciones import Proyecciones
+from .sumarizador import Sumarizador
+
+METRICAS = ['segundos', 'consultas', 'memoria_pico_mb']
+
+
+class ContextoBenchmark():
+    """
+    Unidades sobre las que corren los escenarios: la categoría sensible del dataset sintético
+    (o la primera activa) y el distrito y la sección de su primera mesa.
+    """
+
+    def __init__(self):
+        self.categoria = (
+            Categoria.objects.filter(slug='sintetica-1').first() or
+            Categoria.objects.filter(activa=True).first()
+        )
+        mesa = Mesa.objects.filter(categorias=self.categoria).exclude(seccion=None).first()
+        self.distrito = mesa.distrito
+        self.seccion = mesa.seccion
+        self.tecnica = TecnicaProyeccion.objects.first()
+
+
+def sumarizador(nivel=None, unidad=None):
+    def escenario(contexto):
+        ids = [getattr(contexto, unidad).id] if unidad else None
+        return Sumarizador(
+            TIPOS_DE_AGREGACIONES.todas_las_cargas, OPCIONES_A_CONSIDERAR.todas, nivel, ids
+        ).get_resultados(contexto.categoria)
+    return escenario
+
+
+def arbol_de_resultados(contexto):
+    arbol = ArbolDeResultados(TIPOS_DE_AGREGACIONES.todas_las_cargas, OPCIONES_A_CONSIDERAR.todas)
+    return arbol.calcular_arbol(contexto.categoria)
+
+
+def proyecciones(contexto):
+    return Proyecciones(
+        contexto.tecnica, TIPOS_DE_AGREGACIONES.todas_las_cargas, OPCIONES_A_CONSIDERAR.todas
+    ).get_resultados(contexto.categoria)
+
+
+def avance_de_carga(nivel=None, unidad=None):
+    def escenario(contexto):
+        ids = [getattr(contexto, unidad).id] if unidad else None
+        return AvanceDeCarga(nivel, ids).get_resultados(contexto.categoria)
+    return escenario
+
+
+def encolar(contexto):
+    # El scheduler modifica la cola: se deshace para que cada corrida parta del mismo estado.
+    with transaction.atomic():
+        resultado = scheduler(reconstruir_la_cola=True)
+        transaction.set_rollback(True)
+    return resultado
+
+
+ESCENARIOS = OrderedDict([
+    ('sumarizador_pais', sumarizador()),
+    ('sumarizador_distrito', sumarizador(NIVELES_DE_AGREGACION.distrito, 'distrito')),
+    ('sumarizador_seccion', sumarizador(NIVELES_DE_AGREGACION.seccion, 'seccion')),
+    ('arbol_de_resultados', arbol_de_resultados),
+    ('proyecciones_pais', proyecciones),
+    ('avance_de_carga_pais', avance_de_carga()),
+    ('avance_de_carga_distrito', avance_de_carga(NIVELES_DE_AGREGACION.distrito, 'distrito')),
+    ('scheduler', encolar),
+])
+
+
+def medir(escenario, contexto, repeticiones=3):
+    """
+    Corre el escenario varias veces. Se queda con el menor tiempo (el menos afectado por ruido),
+    y con la cantidad de consultas y el pico de memoria de la última corrida.
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            escenario(contexto)
+            tiempos.append(time.perf_counter() - inicio)
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        'segundos': round(min(tiempos), 4),
+        'consultas': len(consultas),
+        'memoria_pico_mb': round(pico / 2 ** 20, 2),
+    }
+
+
+def correr(nombres=None, repeticiones=3):
+    contexto = ContextoBenchmark()
+    return OrderedDict(
+        (nombre, medir(escenario, contexto, repeticiones))
+        for nombre, escenario in ESCENARIOS.items()
+        if not nombres or nombre in nombres
+    )
+
+
+def comparar(resultados, linea_de_base, tolerancia):
+    """
+    Devuelve, por escenario y métrica, el cociente contra la línea de base
+    y si se considera una regresión (más de ``tolerancia`` por encima).
+    """
+    comparacion = OrderedDict()
+    for nombre, metricas in resultados.items():
+        base = linea_de_base.get(nombre)
+        if not base:
+            continue
+        comparacion[nombre] = OrderedDict()
+        for metrica in METRICAS:
+            if not base.get(metrica):
+                continue
+            cociente = metricas[metrica] / base[metrica]
+            comparacion[nombre][metrica] = (cociente, cociente > 1 + tolerancia)
+    return comparacion
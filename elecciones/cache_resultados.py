@@ -0,0 +1,66 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+from elecciones.models import Epoca
+
+CLAVE_EPOCA_CONSOLIDACION = Epoca.CONSOLIDACION
+
+
+def cache_resultados():
+    return caches[settings.CACHE_RESULTADOS]
+
+
+def epoca_consolidacion():
+    """
+    Número que identifica el estado actual de los datos consolidados.
+    Mientras no cambie, cualquier resultado calculado sigue siendo válido.
+    """
+    return Epoca.actual(CLAVE_EPOCA_CONSOLIDACION)
+
+
+def avanzar_epoca_consolidacion():
+    """
+    Invalida todos los resultados cacheados. Se invoca cuando la consolidación
+    modificó el estado de alguna MesaCategoria.
+    """
+    return avanzar_epoca(CLAVE_EPOCA_CONSOLIDACION)
+
+
+def avanzar_epoca(clave):
+    """
+    Incrementa el contador de época guardado bajo `clave` y devuelve el nuevo valor.
+    """
+    return Epoca.avanzar(clave)
+
+
+def clave_resultados(*partes):
+    """
+    Arma una clave de cache a partir de los parámetros del cómputo.
+    """
+    return hashlib.md5(repr(partes).encode()).hexdigest()
+
+
+def clave_de_epoca(clave):
+    """
+    Clave bajo la cual se guarda lo identificado por `clave` en la época de consolidación vigente.
+    """
+    return f'resultados-{epoca_consolidacion()}-{clave}'
+
+
+def obtener_resultados(clave, calcular):
+    """
+    Devuelve lo cacheado bajo `clave` para la época de consolidación vigente.
+    Si no está, lo obtiene invocando a `calcular` y lo guarda (a lo sumo por el TIMEOUT del cache).
+    """
+    if not settings.CACHEAR_RESULTADOS:
+        return calcular()
+
+    cache = cache_resultados()
+    clave_epoca = clave_de_epoca(clave)
+    resultados = cache.get(clave_epoca)
+    if resultados is None:
+        resultados = calcular()
+        cache.set(clave_epoca, resultados)
+    return resultados
@@ -3,46 +3,147 @@ Vistas con datos crudos
 ej: http://localhost:8000/elecciones/resultados-parciales-gobernador-cordoba-2019.csv
 
 """
-from elecciones.models import Categoria, VotoMesaReportado
+import csv
+import posixpath
+import tempfile
+from itertools import groupby
+from operator import itemgetter
+from urllib.parse import quote
+
 import django_excel as excel
-from django.views.decorators.cache import cache_page
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.http import FileResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from pyexcel_webio import FILE_TYPE_MIME_TABLE
+
+from elecciones.cache_resultados import epoca_consolidacion
+from elecciones.models import Categoria, VotoMesaReportado
+
+# Directorio del storage en el que se guardan las exportaciones ya generadas.
+DIRECTORIO_EXPORTACIONES = 'exportaciones'
+
+
+class Eco():
+    """
+    Pseudo-archivo que devuelve lo que se le escribe, para generar el CSV de a una línea.
+    """
+
+    def write(self, valor):
+        return valor
+
+
+def filas_resultado_parcial(categoria):
+    """
+    Genera el encabezado y una fila por mesa con los votos de cada opción (de la carga testigo).
+    Los votos se leen con una única consulta y se pivotean en una sola pasada.
+    """
+    opciones = list(categoria.opciones_actuales())
+    yield [
+        'seccion', 'numero seccion', 'circuito', 'codigo circuito', 'centro de votacion', 'mesa'
+    ] + [opcion.nombre for opcion in opciones]
+
+    votos = VotoMesaReportado.objects.filter(
+        carga__mesa_categoria__categoria=categoria,
+        carga__es_testigo__isnull=False,
+    ).values_list(
+        'carga__mesa_categoria__mesa_id',
+        'carga__mesa_categoria__seccion__nombre',
+        'carga__mesa_categoria__seccion__numero',
+        'carga__mesa_categoria__mesa__circuito__nombre',
+        'carga__mesa_categoria__mesa__circuito__numero',
+        'carga__mesa_categoria__mesa__lugar_votacion__nombre',
+        'carga__mesa_categoria__mesa__numero',
+        'opcion_id',
+        'votos',
+    ).order_by('carga__mesa_categoria__mesa__numero', 'carga__mesa_categoria__mesa_id')
+
+    for _, votos_de_mesa in groupby(votos.iterator(), key=itemgetter(0)):
+        votos_de_mesa = list(votos_de_mesa)
+        votos_por_opcion = {voto[7]: voto[8] for voto in votos_de_mesa}
+        yield list(votos_de_mesa[0][1:7]) + [votos_por_opcion.get(opcion.id, '') for opcion in opciones]
+
+
+def ruta_exportacion(nombre, epoca):
+    """
+    Ruta del storage en la que se guarda la exportación `nombre` generada en la época `epoca`.
+    """
+    return posixpath.join(DIRECTORIO_EXPORTACIONES, nombre, str(epoca))
+
+
+def guardar_exportacion(ruta, archivo):
+    """
+    Guarda `archivo` en el storage bajo `ruta` y borra las de épocas anteriores de la misma
+    exportación, que ya no se van a servir.
+    """
+    directorio, epoca = posixpath.split(ruta)
+    if not default_storage.exists(ruta):
+        default_storage.save(ruta, archivo)
+    _, archivos = default_storage.listdir(directorio)
+    for anterior in archivos:
+        if anterior.isdigit() and int(anterior) < int(epoca):
+            default_storage.delete(posixpath.join(directorio, anterior))
+
+
+def guardar_al_terminar(ruta, partes):
+    """
+    Devuelve las partes a medida que se generan, escribiéndolas en un archivo temporal, y cuando
+    se llegó al final guarda el archivo en el storage. Si la descarga se interrumpe no se guarda.
+    """
+    if not settings.CACHEAR_RESULTADOS:
+        yield from partes
+        return
+
+    with tempfile.TemporaryFile() as archivo:
+        for parte in partes:
+            archivo.write(parte.encode(settings.DEFAULT_CHARSET))
+            yield parte
+        archivo.seek(0)
+        guardar_exportacion(ruta, File(archivo))
+
+
+def como_adjunto(response, nombre_archivo):
+    """
+    Indica que la respuesta se descarga como `nombre_archivo`, con el mismo encabezado que pone
+    ``excel.make_response``.
+    """
+    nombre = quote(nombre_archivo)
+    response['Content-Disposition'] = f"attachment; filename={nombre};filename*=utf-8''{nombre}"
+    return response
 
 
-@cache_page(60 * 5)  # 5 minutos
 def resultado_parcial_categoria(request, slug_categoria, filetype):
     '''
-    lista de paradas de transporte urbano de pasajeros
+    Resultados de la categoría mesa por mesa, con una columna por opción.
+
+    El CSV se envía a medida que se genera. Lo generado se guarda en el storage hasta que cambia
+    la época de consolidación, es decir, hasta que hay datos nuevos, y mientras tanto se sirve
+    desde ahí.
     '''
-    categoria = Categoria.objects.get(slug=slug_categoria)
-    mesas_reportadas = VotoMesaReportado.objects.filter(categoria=categoria).order_by('mesa__numero', 'opcion__orden')
-
-    headers = ['seccion', 'numero seccion', 'circuito', 'codigo circuito', 'centro de votacion', 'mesa']
-    for opcion in categoria.opciones.all().order_by('orden'):
-        headers.append(opcion.nombre)
-
-    csv_list = [headers]
-
-    resultados = {}
-    for mesa_reportada in mesas_reportadas:
-        mesa = mesa_reportada.mesa
-        opcion = mesa_reportada.opcion
-        if mesa not in resultados.keys():
-            resultados[mesa] = {}
-        if opcion.nombre not in resultados[mesa].keys():
-            resultados[mesa][opcion.nombre] = 0
-
-        resultados[mesa][opcion.nombre] += mesa_reportada.votos
-
-    for mesa, opciones in resultados.items():
-        fila = [mesa.lugar_votacion.circuito.seccion.nombre,
-                mesa.lugar_votacion.circuito.seccion.numero,
-                mesa.lugar_votacion.circuito.nombre,
-                mesa.lugar_votacion.circuito.numero,
-                mesa.lugar_votacion.nombre,
-                mesa.numero]
-        for opcion, votos in opciones.items():
-            fila.append(votos)
-
-        csv_list.append(fila)
-
-    return excel.make_response(excel.pe.Sheet(csv_list), filetype)
\ No newline at end of file
+    categoria = get_object_or_404(Categoria, slug=slug_categoria)
+    nombre_archivo = f'{categoria.slug}.{filetype}'
+    content_type = FILE_TYPE_MIME_TABLE[filetype]
+    # La época se toma al empezar, para no guardar datos viejos bajo una época nueva.
+    ruta = ruta_exportacion(f'resultado-parcial-{categoria.id}.{filetype}', epoca_consolidacion())
+    if settings.CACHEAR_RESULTADOS and default_storage.exists(ruta):
+        return como_adjunto(
+            FileResponse(default_storage.open(ruta), content_type=content_type), nombre_archivo
+        )
+
+    if filetype == 'csv':
+        writer = csv.writer(Eco())
+        lineas = (writer.writerow(fila) for fila in filas_resultado_parcial(categoria))
+        return como_adjunto(
+            StreamingHttpResponse(guardar_al_terminar(ruta, lineas), content_type=content_type),
+            nombre_archivo
+        )
+
+    # Las planillas no se pueden escribir de a partes.
+    response = excel.make_response(
+        excel.pe.Sheet(list(filas_resultado_parcial(categoria))), filetype, file_name=nombre_archivo
+    )
+    if settings.CACHEAR_RESULTADOS:
+        guardar_exportacion(ruta, ContentFile(response.content))
+    return response
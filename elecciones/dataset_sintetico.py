@@ -0,0 +1,291 @@
+"""
+Generador determinístico de un padrón y un escrutinio sintéticos, a escala nacional,
+para medir el rendimiento del sumarizador, las proyecciones, el avance de carga y el scheduler.
+
+Todo se inserta con ``bulk_create`` (sin pasar por los ``save`` ni las señales), así que los
+datos denormalizados (geografía de mesas, totales por circuito, coeficientes de orden de carga)
+se completan acá mismo.
+"""
+import random
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+
+from adjuntos.models import Attachment
+from fiscales.models import Fiscal
+from .models import (
+    AgrupacionCircuito,
+    AgrupacionCircuitos,
+    Carga,
+    Categoria,
+    CategoriaGeneral,
+    CategoriaOpcion,
+    Circuito,
+    Distrito,
+    LugarVotacion,
+    Mesa,
+    MesaCategoria,
+    MesasEscrutadasCircuito,
+    MesasIdentificadasCircuito,
+    Opcion,
+    Partido,
+    ResumenAvanceCarga,
+    ResumenFotosSeccion,
+    Seccion,
+    TecnicaProyeccion,
+    VotoMesaReportado,
+    VotosCircuito,
+)
+
+OPCIONES_BASICAS = ['OPCION_BLANCOS', 'OPCION_NULOS', 'OPCION_TOTAL_VOTOS', 'OPCION_TOTAL_SOBRES']
+
+# Distribución de status de las MesaCategoria identificadas (el resto queda sin identificar).
+PESOS_STATUS = [
+    (MesaCategoria.STATUS.total_consolidada_dc, 55),
+    (MesaCategoria.STATUS.total_sin_consolidar, 15),
+    (MesaCategoria.STATUS.total_en_conflicto, 2),
+    (MesaCategoria.STATUS.parcial_sin_consolidar, 3),
+    (MesaCategoria.STATUS.sin_cargar, 25),
+]
+
+TAMANIO_LOTE = 5000
+
+
+def en_lotes(iterable, tamanio=TAMANIO_LOTE):
+    iterador = iter(iterable)
+    lote = list(islice(iterador, tamanio))
+    while lote:
+        yield lote
+        lote = list(islice(iterador, tamanio))
+
+
+class GeneradorDatasetSintetico():
+    """
+    Genera el dataset. Con la misma semilla y los mismos parámetros, los datos son idénticos.
+    """
+
+    def __init__(
+        self,
+        cant_mesas=100000,
+        cant_distritos=24,
+        secciones_por_distrito=20,
+        circuitos_por_seccion=8,
+        mesas_por_lugar=8,
+        cant_categorias=5,
+        cant_opciones=20,
+        proporcion_identificadas=0.9,
+        semilla=42,
+        log=None,
+    ):
+        self.cant_mesas = cant_mesas
+        self.cant_distritos = cant_distritos
+        self.secciones_por_distrito = secciones_por_distrito
+        self.circuitos_por_seccion = circuitos_por_seccion
+        self.mesas_por_lugar = mesas_por_lugar
+        self.cant_categorias = cant_categorias
+        self.cant_opciones = cant_opciones
+        self.proporcion_identificadas = proporcion_identificadas
+        self.random = random.Random(semilla)
+        self.log = log or (lambda mensaje: None)
+
+    @transaction.atomic
+    def generar(self):
+        self.fiscal, _ = Fiscal.objects.get_or_create(
+            dni='benchmark', defaults={'apellido': 'Benchmark', 'nombres': 'Fiscal'}
+        )
+        self.generar_geografia()
+        self.generar_categorias_y_opciones()
+        self.generar_mesas()
+        self.generar_escrutinio()
+        self.generar_tecnica_de_proyeccion()
+        self.log('Reconstruyendo totales por circuito y resúmenes de avance.')
+        VotosCircuito.reconstruir()
+        MesasEscrutadasCircuito.reconstruir()
+        MesasIdentificadasCircuito.reconstruir()
+        ResumenAvanceCarga.reconstruir()
+        ResumenFotosSeccion.reconstruir()
+
+    def generar_geografia(self):
+        self.distritos = Distrito.objects.bulk_create(
+            Distrito(numero=str(100 + d), nombre=f'Distrito sintético {d}')
+            for d in range(1, self.cant_distritos + 1)
+        )
+        self.secciones = Seccion.objects.bulk_create(
+            Seccion(distrito=distrito, numero=str(s), nombre=f'Sección {distrito.numero}.{s}')
+            for distrito in self.distritos
+            for s in range(1, self.secciones_por_distrito + 1)
+        )
+        self.circuitos = Circuito.objects.bulk_create(
+            Circuito(seccion=seccion, numero=str(c), nombre=f'Circuito {seccion.nombre}.{c}')
+            for seccion in self.secciones
+            for c in range(1, self.circuitos_por_seccion + 1)
+        )
+        self.log(
+            f'{len(self.distritos)} distritos, {len(self.secciones)} secciones '
+            f'y {len(self.circuitos)} circuitos.'
+        )
+
+    def generar_categorias_y_opciones(self):
+        self.basicas = [
+            Opcion.objects.get_or_create(**criterio, defaults={'nombre': criterio['nombre_corto']})[0]
+            for criterio in (getattr(settings, constante) for constante in OPCIONES_BASICAS)
+        ]
+        cant_positivas = max(self.cant_opciones - len(self.basicas), 1)
+        partidos = Partido.objects.bulk_create(
+            Partido(numero=p, codigo=str(p), nombre=f'Partido sintético {p}', nombre_corto=f'P{p}')
+            for p in range(1, cant_positivas + 1)
+        )
+        self.positivas = Opcion.objects.bulk_create(
+            Opcion(
+                nombre=f'Opción sintética {partido.numero}', nombre_corto=f'O{partido.numero}',
+                codigo=str(partido.numero), partido=partido
+            )
+            for partido in partidos
+        )
+        # Popularidad fija de cada opción positiva, para que los resultados no sean uniformes.
+        self.popularidad = [self.random.paretovariate(1.5) for _ in self.positivas]
+
+        self.categorias = []
+        for c in range(1, self.cant_categorias + 1):
+            general = CategoriaGeneral.objects.create(
+                slug=f'sintetica-{c}', nombre=f'Categoría general sintética {c}'
+            )
+            self.categorias.append(Categoria.objects.create(
+                categoria_general=general, slug=f'sintetica-{c}', nombre=f'Categoría sintética {c}',
+                sensible=(c == 1),
+            ))
+        CategoriaOpcion.objects.bulk_create(
+            CategoriaOpcion(categoria=categoria, opcion=opcion, orden=orden, prioritaria=orden <= 5)
+            for categoria in self.categorias
+            for orden, opcion in enumerate(self.positivas + self.basicas, 1)
+        )
+
+    def generar_mesas(self):
+        lugares = []
+        mesas_por_circuito = self.cant_mesas // len(self.circuitos)
+        sobrantes = self.cant_mesas % len(self.circuitos)
+        self.mesas = []
+        numero = 0
+        for i, circuito in enumerate(self.circuitos):
+            cant = mesas_por_circuito + (1 if i < sobrantes else 0)
+            cant_lugares = max(1, -(-cant // self.mesas_por_lugar))
+            lugares_circuito = [
+                LugarVotacion(circuito=circuito, nombre=f'Escuela {circuito.id}.{j}', direccion='-')
+                for j in range(cant_lugares)
+            ]
+            lugares.extend(lugares_circuito)
+            for m in range(cant):
+                numero += 1
+                self.mesas.append(Mesa(
+                    numero=str(numero),
+                    circuito=circuito,
+                    distrito_id=circuito.seccion.distrito_id,
+                    seccion_id=circuito.seccion_id,
+                    lugar_votacion=lugares_circuito[m // self.mesas_por_lugar],
+                    electores=self.random.randint(250, 350),
+                ))
+        LugarVotacion.objects.bulk_create(lugares, batch_size=TAMANIO_LOTE)
+        for mesa in self.mesas:
+            mesa.lugar_votacion_id = mesa.lugar_votacion.id
+        Mesa.objects.bulk_create(self.mesas, batch_size=TAMANIO_LOTE)
+        self.log(f'{len(lugares)} lugares de votación y {len(self.mesas)} mesas.')
+
+    def generar_escrutinio(self):
+        identificadas = set(
+            mesa.id for mesa in self.mesas if self.random.random() < self.proporcion_identificadas
+        )
+        # Las mesas identificadas tienen su foto; por cada una de las demás hay una foto sin identificar.
+        Attachment.objects.bulk_create(
+            (
+                Attachment(
+                    mesa_id=mesa.id,
+                    status=Attachment.STATUS.identificada,
+                    foto_digest=f'benchmark-{mesa.id}',
+                ) if mesa.id in identificadas else Attachment(
+                    status=Attachment.STATUS.sin_identificar,
+                    foto_digest=f'benchmark-{mesa.id}',
+                )
+                for mesa in self.mesas
+            ),
+            batch_size=TAMANIO_LOTE
+        )
+
+        statuses, pesos = zip(*PESOS_STATUS)
+        cant_votos = 0
+        for categoria in self.categorias:
+            for lote in en_lotes(self.mesas):
+                mesa_categorias = MesaCategoria.objects.bulk_create(
+                    self.mesa_categoria(mesa, categoria, identificadas, statuses, pesos) for mesa in lote
+                )
+                cargadas = [mc for mc in mesa_categorias if mc.status != MesaCategoria.STATUS.sin_cargar]
+                cargas = Carga.objects.bulk_create(
+                    Carga(
+                        mesa_categoria=mc,
+                        tipo=Carga.TIPOS.total if mc.status.startswith('total') else Carga.TIPOS.parcial,
+                        origen=Carga.SOURCES.web,
+                        fiscal=self.fiscal,
+                        procesada=True,
+                    )
+                    for mc in cargadas
+                )
+                votos = [
+                    voto
+                    for mc, carga in zip(cargadas, cargas)
+                    for voto in self.votos_de_mesa(mc.mesa, carga)
+                ]
+                VotoMesaReportado.objects.bulk_create(votos, batch_size=TAMANIO_LOTE)
+                for mc, carga in zip(cargadas, cargas):
+                    mc.carga_testigo = carga
+                MesaCategoria.objects.bulk_update(cargadas, ['carga_testigo'], batch_size=TAMANIO_LOTE)
+                cant_votos += len(votos)
+            self.log(f'Categoría {categoria.nombre}: {cant_votos} votos reportados hasta ahora.')
+
+    def mesa_categoria(self, mesa, categoria, identificadas, statuses, pesos):
+        identificada = mesa.id in identificadas
+        status = self.random.choices(statuses, pesos)[0] if identificada else MesaCategoria.STATUS.sin_cargar
+        return MesaCategoria(
+            mesa=mesa,
+            categoria=categoria,
+            distrito_id=mesa.distrito_id,
+            seccion_id=mesa.seccion_id,
+            status=status,
+            coeficiente_para_orden_de_carga=self.random.randint(1, 1000000) if identificada else None,
+        )
+
+    def votos_de_mesa(self, mesa, carga):
+        votantes = int(mesa.electores * self.random.uniform(0.6, 0.85))
+        blancos = int(votantes * self.random.uniform(0, 0.04))
+        nulos = int(votantes * self.random.uniform(0, 0.02))
+        pesos = [p * self.random.uniform(0.7, 1.3) for p in self.popularidad]
+        total_pesos = sum(pesos)
+        positivos = [int((votantes - blancos - nulos) * p / total_pesos) for p in pesos]
+        total = sum(positivos) + blancos + nulos
+        blanco, nulo, total_votos, sobres = self.basicas
+        return [
+            VotoMesaReportado(carga=carga, opcion=opcion, votos=votos)
+            for opcion, votos in zip(
+                self.positivas + [blanco, nulo, total_votos, sobres],
+                positivos + [blancos, nulos, total, total]
+            )
+        ]
+
+    def generar_tecnica_de_proyeccion(self):
+        """
+        Técnica de proyección que agrupa los circuitos por sección.
+        """
+        self.tecnica = TecnicaProyeccion.objects.create(nombre='Sintética por sección')
+        agrupaciones = AgrupacionCircuitos.objects.bulk_create(
+            AgrupacionCircuitos(nombre=seccion.nombre, proyeccion=self.tecnica, minimo_mesas=10)
+            for seccion in self.secciones
+        )
+        agrupacion_de_seccion = {
+            seccion.id: agrupacion for seccion, agrupacion in zip(self.secciones, agrupaciones)
+        }
+        AgrupacionCircuito.objects.bulk_create(
+            (
+                AgrupacionCircuito(circuito=circuito, agrupacion=agrupacion_de_seccion[circuito.seccion_id])
+                for circuito in self.circuitos
+            ),
+            batch_size=TAMANIO_LOTE
+        )
@@ -0,0 +1,82 @@
+from django.db import transaction
+
+from .arbol_resultados import ArbolDeResultados
+from .cache_resultados import epoca_consolidacion
+from .models import (
+    Categoria,
+    SnapshotResultados,
+    NIVELES_DE_AGREGACION,
+    OPCIONES_A_CONSIDERAR,
+    TIPOS_DE_AGREGACIONES,
+)
+
+CAMPOS_EVOLUCION = [
+    'momento',
+    'total_mesas',
+    'mesas_escrutadas',
+    'electores',
+    'electores_en_mesas_escrutadas',
+    'votos',
+]
+
+
+def tomar_snapshots(categorias=None, tipo_de_agregacion=TIPOS_DE_AGREGACIONES.todas_las_cargas):
+    """
+    Guarda un snapshot del país y de cada distrito para cada categoría activa.
+    Las categorías cuyo último snapshot es de la época de consolidación vigente se saltean,
+    porque sus resultados no cambiaron.
+
+    Devuelve la cantidad de snapshots creados.
+    """
+    epoca = epoca_consolidacion()
+    categorias = Categoria.objects.filter(activa=True) if categorias is None else categorias
+    creados = 0
+    for categoria in categorias:
+        ultimo = ultimo_snapshot(categoria, tipo_de_agregacion=tipo_de_agregacion)
+        if ultimo and ultimo.epoca_consolidacion == epoca:
+            continue
+
+        arbol = ArbolDeResultados(tipo_de_agregacion, OPCIONES_A_CONSIDERAR.todas)
+        arbol.calcular_arbol(categoria)
+        nodos = [
+            nodo for nodo in arbol.nodos.values()
+            if nodo.nivel in (None, NIVELES_DE_AGREGACION.distrito)
+        ]
+        with transaction.atomic():
+            SnapshotResultados.objects.bulk_create(
+                SnapshotResultados(
+                    categoria=categoria,
+                    distrito_id=nodo.id,
+                    tipo_de_agregacion=tipo_de_agregacion,
+                    epoca_consolidacion=epoca,
+                    total_mesas=nodo.resultados.total_mesas(),
+                    mesas_escrutadas=nodo.resultados.total_mesas_escrutadas(),
+                    electores=nodo.resultados.electores(),
+                    electores_en_mesas_escrutadas=nodo.resultados.electores_en_mesas_escrutadas(),
+                    votos={str(id_opcion): votos for id_opcion, votos in nodo.votos_por_opcion.items()},
+                ) for nodo in nodos
+            )
+        creados += len(nodos)
+    return creados
+
+
+def snapshots(categoria, distrito=None, tipo_de_agregacion=TIPOS_DE_AGREGACIONES.todas_las_cargas):
+    return SnapshotResultados.objects.filter(
+        categoria=categoria,
+        distrito=distrito,
+        tipo_de_agregacion=tipo_de_agregacion,
+    )
+
+
+def ultimo_snapshot(categoria, distrito=None, tipo_de_agregacion=TIPOS_DE_AGREGACIONES.todas_las_cargas):
+    """
+    Último resultado conocido, útil para mostrar algo si el cálculo en vivo no está disponible.
+    """
+    return snapshots(categoria, distrito, tipo_de_agregacion).last()
+
+
+def evolucion(categoria, distrito=None, tipo_de_agregacion=TIPOS_DE_AGREGACIONES.todas_las_cargas):
+    """
+    Serie temporal de los snapshots de la categoría, lista para serializar.
+    """
+    return list(snapshots(categoria, distrito, tipo_de_agregacion).values(*CAMPOS_EVOLUCION))
@@ -0,0 +1,59 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from elecciones.benchmark import ESCENARIOS, METRICAS, comparar, correr
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide tiempo, consultas y memoria del sumarizador, las proyecciones, el avance de carga "
+        "y el scheduler, y opcionalmente los compara contra una línea de base."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--escenarios", nargs='+', choices=list(ESCENARIOS.keys()),
+            help="Escenarios a correr (default: todos)."
+        )
+        parser.add_argument(
+            "--repeticiones", type=int, default=3,
+            help="Corridas de cada escenario (default %(default)s)."
+        )
+        parser.add_argument(
+            "--guardar", help="Archivo JSON donde guardar los resultados como línea de base."
+        )
+        parser.add_argument(
+            "--comparar", help="Archivo JSON con una línea de base contra la cual comparar."
+        )
+        parser.add_argument(
+            "--tolerancia", type=float, default=0.2,
+            help="Empeoramiento relativo a partir del cual se considera regresión (default %(default)s)."
+        )
+
+    def handle(self, *args, **options):
+        resultados = correr(options['escenarios'], options['repeticiones'])
+        for nombre, metricas in resultados.items():
+            self.stdout.write(
+                f'{nombre:<30}' + ''.join(f'{metrica}={metricas[metrica]:<12}' for metrica in METRICAS)
+            )
+
+        if options['guardar']:
+            with open(options['guardar'], 'w') as archivo:
+                json.dump(resultados, archivo, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Línea de base guardada en {options['guardar']}."))
+
+        if options['comparar']:
+            with open(options['comparar']) as archivo:
+                linea_de_base = json.load(archivo)
+            regresiones = []
+            for nombre, metricas in comparar(resultados, linea_de_base, options['tolerancia']).items():
+                for metrica, (cociente, es_regresion) in metricas.items():
+                    mensaje = f'{nombre} {metrica}: x{cociente:.2f}'
+                    if es_regresion:
+                        regresiones.append(mensaje)
+                        self.stdout.write(self.style.ERROR(mensaje))
+                    else:
+                        self.stdout.write(mensaje)
+            if regresiones:
+                raise CommandError(f'{len(regresiones)} regresiones respecto de la línea de base.')
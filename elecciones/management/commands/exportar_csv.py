@@ -1,20 +1,31 @@
-from django.core.management.base import BaseCommand
+import csv
+import gzip
+from itertools import groupby
+from operator import itemgetter
+
+from django.core.management.base import BaseCommand, CommandError
 
 from elecciones.models import (
-    Distrito, Seccion, Circuito, Categoria, VotoMesaReportado,
+    Distrito, Seccion, Circuito, Categoria,
     TIPOS_DE_AGREGACIONES, NIVELES_DE_AGREGACION, OPCIONES_A_CONSIDERAR
 )
 from elecciones.sumarizador import Sumarizador
 from escrutinio_social import settings
 
+FORMATO_LARGO = 'largo'
+FORMATO_ANCHO = 'ancho'
 
-class Command(BaseCommand):
-    help = "Exporta por CSV."
+ENCABEZADO_MESA = ['distrito', 'seccion', 'circuito', 'mesa', 'categoria']
 
-    def __init__(self, stdout=None, stderr=None, no_color=False, force_color=False):
-        super().__init__(stdout=None, stderr=None, no_color=False, force_color=False)
+# Las primeras cinco columnas de cada voto identifican a la mesa y la categoría.
+mesa_y_categoria = itemgetter(0, 1, 2, 3, 4)
 
-        self.headers = "'distrito', 'seccion', 'circuito', 'mesa', 'opcion', 'votos'"
+
+class Command(BaseCommand):
+    help = (
+        "Exporta por CSV. Lee los votos en lotes con un cursor del lado del servidor y escribe "
+        "a medida que lee, así que la memoria no crece con el tamaño de la exportación."
+    )
 
     def add_arguments(self, parser):
         # Nivel de agregación a exportar
@@ -24,12 +35,21 @@ class Command(BaseCommand):
                             help="Exportar sólo el circuito indicado (default %(default)s).", default=None)
         parser.add_argument("--solo_distrito", type=int, dest="solo_distrito",
                             help="Exportar sólo el distrito indicado (default %(default)s).", default=None)
-        parser.add_argument("--categoria", type=str, dest="categoria",
-                            help="Slug categoría a exportar (default %(default)s).",
-                            default=settings.SLUG_CATEGORIA_PRESI_Y_VICE)
+        parser.add_argument("--categoria", type=str, dest="categorias", nargs='+',
+                            help="Slugs de las categorías a exportar (default %(default)s).",
+                            default=[settings.SLUG_CATEGORIA_PRESI_Y_VICE])
 
         parser.add_argument("--file", type=str, default='/tmp/exportacion.csv',
                             help="Archivo de salida (default %(default)s)")
+        parser.add_argument("--formato", type=str, choices=[FORMATO_LARGO, FORMATO_ANCHO],
+                            default=FORMATO_LARGO,
+                            help=f"{FORMATO_LARGO}: una fila por mesa y opción; "
+                            f"{FORMATO_ANCHO}: una fila por mesa con una columna por opción "
+                            "(default %(default)s).")
+        parser.add_argument("--comprimir", action="store_true",
+                            help="Comprimir la salida con gzip (también si el archivo termina en .gz).")
+        parser.add_argument("--tamanio_lote", type=int, default=5000,
+                            help="Votos leídos de la base por lote (default %(default)s).")
 
         # Opciones a considerar
         parser.add_argument("--tipo_de_agregacion",
@@ -44,19 +64,24 @@ class Command(BaseCommand):
                             )
 
     def handle(self, *args, **kwargs):
-        """
-        """
         self.tipo_de_agregacion = kwargs['tipo_de_agregacion']
         self.filename = kwargs['file']
-
-        nombre_categoria = kwargs['categoria']
-        self.categoria = Categoria.objects.get(slug=nombre_categoria)
-        print("Vamos a exportar la categoría:", self.categoria)
+        self.formato = kwargs['formato']
+        self.comprimir = kwargs['comprimir'] or self.filename.endswith('.gz')
+        self.tamanio_lote = kwargs['tamanio_lote']
+
+        slugs = kwargs['categorias']
+        categorias = {categoria.slug: categoria for categoria in Categoria.objects.filter(slug__in=slugs)}
+        faltantes = [slug for slug in slugs if slug not in categorias]
+        if faltantes:
+            raise CommandError(f"No existen las categorías: {', '.join(faltantes)}")
+        self.categorias = [categorias[slug] for slug in slugs]
+        self.status(f"Vamos a exportar las categorías: {', '.join(str(c) for c in self.categorias)}")
 
         filtro_nivel_agregacion = self.get_filtro_nivel_agregacion(kwargs)
-        #print(filtro_nivel_agregacion)
         votos = self.get_votos(filtro_nivel_agregacion)
-        self.exportar(votos)
+        filas = self.exportar(votos)
+        self.status_green(f"Se exportaron {filas} filas a {self.filename}.")
 
     def get_filtro_nivel_agregacion(self, kwargs):
         # Analizar resultados de acuerdo a los niveles de agregación
@@ -102,20 +127,53 @@ class Command(BaseCommand):
             **filtro_nivel_agregacion,
         )
 
-        return sumarizador.votos_csv_export(self.categoria)
+        # En Postgres `iterator` usa un cursor del lado del servidor: sólo hay un lote en memoria.
+        votos = sumarizador.votos_csv_export_categorias(self.categorias)
+        return votos.iterator(chunk_size=self.tamanio_lote)
 
-    def exportar(self, votos):
-        self.file = open(self.filename, 'w+')
-        self.file.write(self.headers)
-        self.file.write("\n")
-        self.exportar_votos(votos)
-        self.file.close()
+    def abrir_archivo(self):
+        if self.comprimir:
+            return gzip.open(self.filename, 'wt', newline='')
+        return open(self.filename, 'w', newline='')
 
-    def exportar_votos(self, votos):
+    def exportar(self, votos):
+        """
+        Escribe los votos y devuelve la cantidad de filas exportadas.
+        """
+        with self.abrir_archivo() as archivo:
+            writer = csv.writer(archivo)
+            if self.formato == FORMATO_ANCHO:
+                return self.exportar_ancho(writer, votos)
+            return self.exportar_largo(writer, votos)
+
+    def exportar_largo(self, writer, votos):
+        writer.writerow(ENCABEZADO_MESA + ['opcion', 'votos'])
+        filas = 0
         for voto in votos:
-            fila = ", ".join(str(n) for n in voto)
-            # print(fila[0])
-            self.file.write(f"{fila}\n")
+            writer.writerow(voto)
+            filas += 1
+        return filas
+
+    def exportar_ancho(self, writer, votos):
+        codigos = self.codigos_de_opciones()
+        writer.writerow(ENCABEZADO_MESA + codigos)
+        filas = 0
+        for mesa, votos_de_mesa in groupby(votos, key=mesa_y_categoria):
+            votos_por_codigo = {voto[5]: voto[6] for voto in votos_de_mesa}
+            writer.writerow(list(mesa) + [votos_por_codigo.get(codigo, '') for codigo in codigos])
+            filas += 1
+        return filas
+
+    def codigos_de_opciones(self):
+        """
+        Códigos de las opciones de todas las categorías exportadas, en el orden del acta.
+        """
+        codigos = []
+        for categoria in self.categorias:
+            for opcion in categoria.opciones_actuales():
+                if opcion.codigo not in codigos:
+                    codigos.append(opcion.codigo)
+        return codigos
 
     def status(self, texto):
         self.stdout.write(f"{texto}")
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from elecciones.dataset_sintetico import GeneradorDatasetSintetico
+from elecciones.models import Categoria
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera un padrón y un escrutinio sintéticos a escala nacional para correr el benchmark. "
+        "¡Usar sólo en una base de pruebas!"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--mesas", type=int, default=100000, help="Cantidad de mesas (default %(default)s)."
+        )
+        parser.add_argument(
+            "--distritos", type=int, default=24, help="Cantidad de distritos (default %(default)s)."
+        )
+        parser.add_argument(
+            "--secciones_por_distrito", type=int, default=20,
+            help="Secciones por distrito (default %(default)s)."
+        )
+        parser.add_argument(
+            "--circuitos_por_seccion", type=int, default=8,
+            help="Circuitos por sección (default %(default)s)."
+        )
+        parser.add_argument(
+            "--categorias", type=int, default=5, help="Cantidad de categorías (default %(default)s)."
+        )
+        parser.add_argument(
+            "--opciones", type=int, default=20,
+            help="Opciones por categoría, incluyendo las no positivas (default %(default)s)."
+        )
+        parser.add_argument(
+            "--semilla", type=int, default=42, help="Semilla aleatoria (default %(default)s)."
+        )
+
+    def handle(self, *args, **options):
+        if Categoria.objects.filter(slug__startswith='sintetica-').exists():
+            raise CommandError('Ya hay un dataset sintético en la base.')
+
+        GeneradorDatasetSintetico(
+            cant_mesas=options['mesas'],
+            cant_distritos=options['distritos'],
+            secciones_por_distrito=options['secciones_por_distrito'],
+            circuitos_por_seccion=options['circuitos_por_seccion'],
+            cant_categorias=options['categorias'],
+            cant_opciones=options['opciones'],
+            semilla=options['semilla'],
+            log=self.stdout.write,
+        ).generar()
+        self.stdout.write(self.style.SUCCESS('Dataset sintético generado.'))
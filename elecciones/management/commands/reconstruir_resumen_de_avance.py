@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from elecciones.models import ResumenAvanceCarga, ResumenFotosSeccion
+
+
+class Command(BaseCommand):
+    """
+    Regenera los resúmenes que leen los tableros de avance de carga (``ResumenAvanceCarga`` y
+    ``ResumenFotosSeccion``) a partir de las mesas, sus fotos y sus cargas.
+
+    Los resúmenes se mantienen solos a medida que se identifican fotos y se consolidan cargas,
+    pero hay que reconstruirlos después de importar mesas o categorías en forma masiva, de borrar
+    mesas o de cambiar la geografía de mesas ya cargadas.
+    """
+    help = "Reconstruye los resúmenes de avance de carga."
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        ResumenAvanceCarga.reconstruir()
+        ResumenFotosSeccion.reconstruir()
+        self.stdout.write(self.style.SUCCESS(
+            f'{ResumenAvanceCarga.objects.count()} filas de avance de carga y '
+            f'{ResumenFotosSeccion.objects.count()} filas de fotos por sección generadas.'
+        ))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from elecciones.cache_resultados import avanzar_epoca_consolidacion
+from elecciones.models import VotosCircuito, MesasEscrutadasCircuito, MesasIdentificadasCircuito
+
+
+class Command(BaseCommand):
+    """
+    Regenera los totales pre-agregados por circuito (``VotosCircuito`` y ``MesasEscrutadasCircuito``)
+    a partir de las cargas testigo, y los contadores de mesas identificadas (``MesasIdentificadasCircuito``).
+
+    Los totales se mantienen solos a medida que se consolida y cuando cambian el circuito o los
+    electores de una mesa o se borran mesas o cargas testigo. Hay que reconstruirlos si se
+    modifican datos en forma masiva sin pasar por los modelos (por ejemplo, con ``update()``)
+    o se agregan mesas a circuitos en los que ya se identificaron otras.
+    """
+    help = "Reconstruye los totales de votos y mesas escrutadas por circuito."
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        VotosCircuito.reconstruir()
+        MesasEscrutadasCircuito.reconstruir()
+        MesasIdentificadasCircuito.reconstruir()
+        avanzar_epoca_consolidacion()
+        self.stdout.write(self.style.SUCCESS(
+            f'{VotosCircuito.objects.count()} totales de votos y '
+            f'{MesasEscrutadasCircuito.objects.count()} totales de mesas escrutadas y '
+            f'{MesasIdentificadasCircuito.objects.count()} contadores de mesas identificadas generados.'
+        ))
@@ -3,8 +3,12 @@ from django.db import transaction, connection
 from django.core.management.base import BaseCommand
 from adjuntos.models import Attachment, PreIdentificacion, CSVTareaDeImportacion
 from problemas.models import Problema
-from elecciones.models import (VotoMesaReportado, Carga, MesaCategoria)
-from fiscales.models import Fiscal
+from elecciones.cache_resultados import avanzar_epoca_consolidacion
+from elecciones.models import (
+    VotoMesaReportado, Carga, MesaCategoria, VotosCircuito, MesasEscrutadasCircuito,
+    MesasIdentificadasCircuito, ResumenAvanceCarga, ResumenFotosSeccion
+)
+from fiscales.models import Fiscal, FiscalesActivosPorMinuto, TareasDeFiscal
 from scheduling.models import ColaCargasPendientes
 
 class Command(BaseCommand):
@@ -31,10 +35,31 @@ class Command(BaseCommand):
         Problema.objects.all().delete()
         tablas_a_resetear_secuencias.append('problemas_problema')
         tablas_a_resetear_secuencias.append('problemas_reportedeproblema')
+        # Sin cargas testigo, al borrar las cargas no hay nada que descontar de los totales.
+        MesaCategoria.objects.all().update(
+            percentil=None,
+            orden_de_llegada=None,
+            coeficiente_para_orden_de_carga=None,
+            cant_fiscales_asignados=0,
+            cant_asignaciones_realizadas=0,
+            status=MesaCategoria.STATUS.sin_cargar,
+            carga_testigo=None,
+        )
         VotoMesaReportado.objects.all().delete()
         tablas_a_resetear_secuencias.append('elecciones_votomesareportado')
         Carga.objects.all().delete()
         tablas_a_resetear_secuencias.append('elecciones_carga')
+        VotosCircuito.objects.all().delete()
+        tablas_a_resetear_secuencias.append('elecciones_votoscircuito')
+        MesasEscrutadasCircuito.objects.all().delete()
+        tablas_a_resetear_secuencias.append('elecciones_mesasescrutadascircuito')
+        MesasIdentificadasCircuito.objects.all().delete()
+        tablas_a_resetear_secuencias.append('elecciones_mesasidentificadascircuito')
+        # Sin fotos ni cargas, los resúmenes de avance se rehacen con todas las mesas sin cargar.
+        ResumenAvanceCarga.reconstruir()
+        tablas_a_resetear_secuencias.append('elecciones_resumenavancecarga')
+        ResumenFotosSeccion.reconstruir()
+        tablas_a_resetear_secuencias.append('elecciones_resumenfotosseccion')
         Fiscal.objects.all().update(
             last_seen=None,
             ingreso_alguna_vez=False,
@@ -44,16 +69,12 @@ class Command(BaseCommand):
             distrito_afin=None,
             puntaje_scoring_troll=0,
         )
-        MesaCategoria.objects.all().update(
-            percentil=None,
-            orden_de_llegada=None,
-            coeficiente_para_orden_de_carga=None,
-            cant_fiscales_asignados=0,
-            cant_asignaciones_realizadas=0,
-            status=MesaCategoria.STATUS.sin_cargar,
-        )
+        TareasDeFiscal.objects.all().delete()
+        FiscalesActivosPorMinuto.objects.all().delete()
         ColaCargasPendientes.objects.all().delete()
         tablas_a_resetear_secuencias.append('scheduling_colacargaspendientes')
+        # Sin cargas, los resultados cacheados dejan de valer.
+        avanzar_epoca_consolidacion()
 
         with connection.cursor() as cursor:
             for tabla in tablas_a_resetear_secuencias:
@@ -0,0 +1,78 @@
+"""
+Memoización de métodos acotada a cada instancia.
+
+``functools.lru_cache`` aplicado a un método guarda sus valores en un cache global al proceso,
+cuya clave incluye a ``self``: retiene a cada sumarizador (y a sus categorías y querysets) durante
+toda la vida del worker y no hay forma de invalidarlo. Acá lo memoizado vive en la instancia:
+dura lo que dura el cómputo y se libera con él.
+"""
+from collections import OrderedDict
+from functools import wraps
+
+ATRIBUTO_MEMO = '_memo'
+
+
+class MemoDeMetodo():
+    """
+    Valores memoizados de un método para una instancia, con contadores de aciertos y fallos.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.valores = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def estadisticas(self):
+        return {'aciertos': self.aciertos, 'fallos': self.fallos, 'tamanio': len(self.valores)}
+
+
+def memo_de_metodo(instancia, nombre, maxsize):
+    memo = instancia.__dict__.setdefault(ATRIBUTO_MEMO, {})
+    if nombre not in memo:
+        memo[nombre] = MemoDeMetodo(maxsize)
+    return memo[nombre]
+
+
+def memoizar(maxsize=128):
+    """
+    Decorador para métodos. Memoiza por instancia según los argumentos (que deben ser hashables),
+    descartando los usados hace más tiempo cuando se superan ``maxsize`` valores.
+    """
+    def decorador(metodo):
+        @wraps(metodo)
+        def metodo_memoizado(self, *args, **kwargs):
+            memo = memo_de_metodo(self, metodo.__name__, maxsize)
+            clave = (args, tuple(sorted(kwargs.items()))) if kwargs else args
+            if clave in memo.valores:
+                memo.aciertos += 1
+                memo.valores.move_to_end(clave)
+                return memo.valores[clave]
+
+            memo.fallos += 1
+            valor = metodo(self, *args, **kwargs)
+            memo.valores[clave] = valor
+            if len(memo.valores) > memo.maxsize:
+                memo.valores.popitem(last=False)
+            return valor
+
+        return metodo_memoizado
+
+    return decorador
+
+
+def estadisticas_memoizacion(instancia):
+    """
+    Aciertos, fallos y cantidad de valores guardados de cada método memoizado de la instancia.
+    """
+    return {
+        nombre: memo.estadisticas()
+        for nombre, memo in instancia.__dict__.get(ATRIBUTO_MEMO, {}).items()
+    }
+
+
+def olvidar_memoizacion(instancia):
+    """
+    Descarta todo lo memoizado por la instancia.
+    """
+    instancia.__dict__.pop(ATRIBUTO_MEMO, None)
@@ -0,0 +1,68 @@
+# Generated by Django 2.2.2 on 2019-10-21 10:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Inicializa los totales con las cargas testigo que ya existen (como VotosCircuito.reconstruir y
+# MesasEscrutadasCircuito.reconstruir).
+COMPLETAR_VOTOS = """
+INSERT INTO elecciones_votoscircuito (circuito_id, categoria_id, opcion_id, status, votos)
+SELECT mesa.circuito_id, mc.categoria_id, voto.opcion_id, mc.status, sum(voto.votos)
+FROM elecciones_votomesareportado voto
+JOIN elecciones_mesacategoria mc ON mc.carga_testigo_id = voto.carga_id
+JOIN elecciones_mesa mesa ON mesa.id = mc.mesa_id
+WHERE mesa.circuito_id IS NOT NULL
+GROUP BY mesa.circuito_id, mc.categoria_id, voto.opcion_id, mc.status
+"""
+
+COMPLETAR_MESAS_ESCRUTADAS = """
+INSERT INTO elecciones_mesasescrutadascircuito (circuito_id, categoria_id, status, cant_mesas, electores)
+SELECT mesa.circuito_id, mc.categoria_id, mc.status, count(*), COALESCE(sum(mesa.electores), 0)
+FROM elecciones_mesacategoria mc JOIN elecciones_mesa mesa ON mesa.id = mc.mesa_id
+WHERE mc.carga_testigo_id IS NOT NULL AND mesa.circuito_id IS NOT NULL
+GROUP BY mesa.circuito_id, mc.categoria_id, mc.status
+"""
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elecciones', '0063_cat_activa_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VotosCircuito',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('parcial_en_conflicto', 'parcial en conflicto'), ('parcial_sin_consolidar', 'parcial sin consolidar'), ('sin_cargar', 'sin cargar'), ('parcial_consolidada_csv', 'parcial consolidada CSV'), ('parcial_consolidada_dc', 'parcial consolidada doble carga'), ('total_sin_consolidar', 'total sin consolidar'), ('total_en_conflicto', 'total en conflicto'), ('total_consolidada_csv', 'total consolidada CSV'), ('total_consolidada_dc', 'total consolidada doble carga'), ('con_problemas', 'con problemas')], max_length=100)),
+                ('votos', models.IntegerField(default=0)),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='elecciones.Categoria')),
+                ('circuito', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='votos_totales', to='elecciones.Circuito')),
+                ('opcion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='elecciones.Opcion')),
+            ],
+            options={
+                'verbose_name': 'Votos por circuito',
+                'verbose_name_plural': 'Votos por circuito',
+                'unique_together': {('circuito', 'categoria', 'opcion', 'status')},
+            },
+        ),
+        migrations.CreateModel(
+            name='MesasEscrutadasCircuito',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('parcial_en_conflicto', 'parcial en conflicto'), ('parcial_sin_consolidar', 'parcial sin consolidar'), ('sin_cargar', 'sin cargar'), ('parcial_consolidada_csv', 'parcial consolidada CSV'), ('parcial_consolidada_dc', 'parcial consolidada doble carga'), ('total_sin_consolidar', 'total sin consolidar'), ('total_en_conflicto', 'total en conflicto'), ('total_consolidada_csv', 'total consolidada CSV'), ('total_consolidada_dc', 'total consolidada doble carga'), ('con_problemas', 'con problemas')], max_length=100)),
+                ('cant_mesas', models.IntegerField(default=0)),
+                ('electores', models.IntegerField(default=0)),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='elecciones.Categoria')),
+                ('circuito', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mesas_escrutadas', to='elecciones.Circuito')),
+            ],
+            options={
+                'verbose_name': 'Mesas escrutadas por circuito',
+                'verbose_name_plural': 'Mesas escrutadas por circuito',
+                'unique_together': {('circuito', 'categoria', 'status')},
+            },
+        ),
+        migrations.RunSQL(COMPLETAR_VOTOS, migrations.RunSQL.noop),
+        migrations.RunSQL(COMPLETAR_MESAS_ESCRUTADAS, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 2.2.2 on 2019-10-22 09:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import OuterRef, Subquery
+
+
+def completar_geografia(apps, schema_editor):
+    Circuito = apps.get_model('elecciones', 'Circuito')
+    Mesa = apps.get_model('elecciones', 'Mesa')
+    MesaCategoria = apps.get_model('elecciones', 'MesaCategoria')
+
+    circuito = Circuito.objects.filter(id=OuterRef('circuito_id'))
+    Mesa.objects.update(
+        distrito_id=Subquery(circuito.values('seccion__distrito_id')[:1]),
+        seccion_id=Subquery(circuito.values('seccion_id')[:1]),
+        seccion_politica_id=Subquery(circuito.values('seccion__seccion_politica_id')[:1]),
+    )
+    mesa = Mesa.objects.filter(id=OuterRef('mesa_id'))
+    MesaCategoria.objects.update(
+        distrito_id=Subquery(mesa.values('distrito_id')[:1]),
+        seccion_id=Subquery(mesa.values('seccion_id')[:1]),
+        seccion_politica_id=Subquery(mesa.values('seccion_politica_id')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elecciones', '0064_votoscircuito_mesasescrutadascircuito'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mesa',
+            name='distrito',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='elecciones.Distrito'),
+        ),
+        migrations.AddField(
+            model_name='mesa',
+            name='seccion',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='elecciones.Seccion'),
+        ),
+        migrations.AddField(
+            model_name='mesa',
+            name='seccion_politica',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='elecciones.SeccionPolitica'),
+        ),
+        migrations.AddField(
+            model_name='mesacategoria',
+            name='distrito',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='elecciones.Distrito'),
+        ),
+        migrations.AddField(
+            model_name='mesacategoria',
+            name='seccion',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='elecciones.Seccion'),
+        ),
+        migrations.AddField(
+            model_name='mesacategoria',
+            name='seccion_politica',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='elecciones.SeccionPolitica'),
+        ),
+        migrations.RunPython(completar_geografia, migrations.RunPython.noop),
+    ]
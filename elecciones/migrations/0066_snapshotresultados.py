@@ -0,0 +1,41 @@
+# Generated by Django 2.2.2 on 2019-10-22 11:05
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elecciones', '0065_geografia_denormalizada_mesas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotResultados',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo_de_agregacion', models.CharField(choices=[('todas_las_cargas', 'Todas'), ('solo_consolidados', 'Consolidadas'), ('solo_consolidados_doble_carga', 'Consolidadas con doble Carga')], max_length=30)),
+                ('momento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('epoca_consolidacion', models.PositiveIntegerField(default=0)),
+                ('total_mesas', models.PositiveIntegerField(default=0)),
+                ('mesas_escrutadas', models.PositiveIntegerField(default=0)),
+                ('electores', models.PositiveIntegerField(default=0)),
+                ('electores_en_mesas_escrutadas', models.PositiveIntegerField(default=0)),
+                ('votos', django.contrib.postgres.fields.jsonb.JSONField(default=dict)),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots_resultados', to='elecciones.Categoria')),
+                ('distrito', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='elecciones.Distrito')),
+            ],
+            options={
+                'verbose_name': 'Snapshot de resultados',
+                'verbose_name_plural': 'Snapshots de resultados',
+                'ordering': ('momento',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='snapshotresultados',
+            index=models.Index(fields=['categoria', 'tipo_de_agregacion', 'distrito', 'momento'], name='snapshot_evolucion'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 2.2.2 on 2019-10-22 18:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Completa los resúmenes con las mesas que ya existen (como ResumenAvanceCarga.reconstruir y
+# ResumenFotosSeccion.reconstruir).
+COMPLETAR_RESUMEN_AVANCE = """
+INSERT INTO elecciones_resumenavancecarga (categoria_id, distrito_id, seccion_id, status, con_fotos, cant_mesas)
+SELECT mc.categoria_id, mc.distrito_id, mc.seccion_id, mc.status,
+       EXISTS (SELECT 1 FROM adjuntos_attachment foto WHERE foto.mesa_id = mc.mesa_id), count(*)
+FROM elecciones_mesacategoria mc
+GROUP BY 1, 2, 3, 4, 5
+"""
+
+COMPLETAR_RESUMEN_FOTOS = """
+INSERT INTO elecciones_resumenfotosseccion
+    (distrito_id, seccion_id, cant_mesas, mesas_con_foto_identificada, mesas_con_carga_sin_foto)
+SELECT distrito_id, seccion_id, count(*),
+       count(*) FILTER (WHERE con_fotos), count(*) FILTER (WHERE NOT con_fotos AND con_cargas)
+FROM (
+    SELECT mesa.distrito_id, mesa.seccion_id,
+           EXISTS (SELECT 1 FROM adjuntos_attachment foto WHERE foto.mesa_id = mesa.id) AS con_fotos,
+           EXISTS (
+               SELECT 1 FROM elecciones_mesacategoria mc
+               WHERE mc.mesa_id = mesa.id AND mc.status <> 'sin_cargar'
+           ) AS con_cargas
+    FROM elecciones_mesa mesa
+) mesas
+GROUP BY distrito_id, seccion_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elecciones', '0066_snapshotresultados'),
+        ('adjuntos', '0002_attachment_mesa'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenFotosSeccion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cant_mesas', models.IntegerField(default=0)),
+                ('mesas_con_foto_identificada', models.IntegerField(default=0)),
+                ('mesas_con_carga_sin_foto', models.IntegerField(default=0)),
+                ('distrito', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='elecciones.Distrito')),
+                ('seccion', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='elecciones.Seccion')),
+            ],
+            options={
+                'verbose_name': 'Resumen de fotos por sección',
+                'verbose_name_plural': 'Resumen de fotos por sección',
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenAvanceCarga',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('parcial_en_conflicto', 'parcial en conflicto'), ('parcial_sin_consolidar', 'parcial sin consolidar'), ('sin_cargar', 'sin cargar'), ('parcial_consolidada_csv', 'parcial consolidada CSV'), ('parcial_consolidada_dc', 'parcial consolidada doble carga'), ('total_sin_consolidar', 'total sin consolidar'), ('total_en_conflicto', 'total en conflicto'), ('total_consolidada_csv', 'total consolidada CSV'), ('total_consolidada_dc', 'total consolidada doble carga'), ('con_problemas', 'con problemas')], max_length=100)),
+                ('con_fotos', models.BooleanField(default=False)),
+                ('cant_mesas', models.IntegerField(default=0)),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='elecciones.Categoria')),
+                ('distrito', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='elecciones.Distrito')),
+                ('seccion', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='elecciones.Seccion')),
+            ],
+            options={
+                'verbose_name': 'Resumen de avance de carga',
+                'verbose_name_plural': 'Resumen de avance de carga',
+            },
+        ),
+        migrations.RunSQL(COMPLETAR_RESUMEN_AVANCE, migrations.RunSQL.noop),
+        migrations.RunSQL(COMPLETAR_RESUMEN_FOTOS, migrations.RunSQL.noop),
+    ]
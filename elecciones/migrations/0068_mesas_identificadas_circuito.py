@@ -0,0 +1,39 @@
+# Generated by Django 2.2.2 on 2019-10-22 20:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Inicializa los contadores con las MesaCategoria que ya tienen orden de llegada.
+COMPLETAR_MESAS_IDENTIFICADAS = """
+INSERT INTO elecciones_mesasidentificadascircuito (circuito_id, categoria_id, total, identificadas)
+SELECT mesa.circuito_id, mc.categoria_id, count(*), count(mc.orden_de_llegada)
+FROM elecciones_mesacategoria mc JOIN elecciones_mesa mesa ON mesa.id = mc.mesa_id
+WHERE mesa.circuito_id IS NOT NULL
+GROUP BY mesa.circuito_id, mc.categoria_id
+"""
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elecciones', '0067_resumen_avance_carga'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MesasIdentificadasCircuito',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.IntegerField(default=0)),
+                ('identificadas', models.IntegerField(default=0)),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='elecciones.Categoria')),
+                ('circuito', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mesas_identificadas', to='elecciones.Circuito')),
+            ],
+            options={
+                'verbose_name': 'Mesas identificadas por circuito',
+                'verbose_name_plural': 'Mesas identificadas por circuito',
+                'unique_together': {('circuito', 'categoria')},
+            },
+        ),
+        migrations.RunSQL(COMPLETAR_MESAS_IDENTIFICADAS, migrations.RunSQL.noop),
+    ]
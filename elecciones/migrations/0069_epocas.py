@@ -0,0 +1,24 @@
+# Generated by Django 2.2.2 on 2019-10-22 20:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elecciones', '0068_mesas_identificadas_circuito'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Epoca',
+            fields=[
+                ('clave', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('valor', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Época',
+                'verbose_name_plural': 'Épocas',
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.2 on 2019-10-22 20:45
+
+from django.db import migrations
+
+
+# Los resúmenes de avance se actualizan con upserts, por lo que sus filas tienen que ser únicas
+# (tomando como iguales a los distritos y secciones nulos).
+INDICES = """
+CREATE UNIQUE INDEX elecciones_resumenavancecarga_unico ON elecciones_resumenavancecarga
+    (categoria_id, COALESCE(distrito_id, 0), COALESCE(seccion_id, 0), status, con_fotos);
+CREATE UNIQUE INDEX elecciones_resumenfotosseccion_unico ON elecciones_resumenfotosseccion
+    (COALESCE(distrito_id, 0), COALESCE(seccion_id, 0));
+"""
+
+BORRAR_INDICES = """
+DROP INDEX elecciones_resumenavancecarga_unico;
+DROP INDEX elecciones_resumenfotosseccion_unico;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elecciones', '0069_epocas'),
+    ]
+
+    operations = [
+        migrations.RunSQL(INDICES, BORRAR_INDICES),
+    ]
@@ -1,13 +1,13 @@
-import math
 from datetime import timedelta
 from collections import defaultdict
 
 from django.dispatch import receiver
 from django.conf import settings
+from django.contrib.postgres.fields import JSONField
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models, transaction
-from django.db.models import Sum, Count, Q, F
-from django.db.models.signals import pre_save, post_save
+from django.db import models, transaction, connection
+from django.db.models import Sum, Count, Q, F, Exists, OuterRef, Subquery
+from django.db.models.signals import pre_delete, pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.urls import reverse
 from django.utils import timezone
@@ -163,14 +163,16 @@ class Seccion(models.Model):
         default=None, null=True, blank=True, validators=[MaxValueValidator(1000), MinValueValidator(1)]
     )
 
-    # Tracker de cambios en los atributos relacionados con la prioridad,
-    # usado en la función que dispara en el post_save
+    # Tracker de cambios en los atributos relacionados con la prioridad y con la ubicación
+    # de la sección, usado en las funciones que disparan en el post_save
     tracker = FieldTracker(
         fields=[
             'prioridad_hasta_2',
             'cantidad_minima_prioridad_hasta_2',
             'prioridad_2_a_10',
-            'prioridad_10_a_100'
+            'prioridad_10_a_100',
+            'distrito',
+            'seccion_politica',
         ]
     )
 
@@ -222,6 +224,9 @@ class Circuito(models.Model):
     nombre = models.CharField(max_length=100)
     electores = models.PositiveIntegerField(default=0)
 
+    # Tracker de cambios de sección, usado para mantener la geografía denormalizada de las mesas.
+    tracker = FieldTracker(fields=['seccion'])
+
     class Meta:
         verbose_name = 'Circuito electoral'
         verbose_name_plural = 'Circuitos electorales'
@@ -518,10 +523,26 @@ class MesaCategoria(models.Model):
         STATUS.parcial_consolidada_csv
     ]
 
+    # Al recalcular coeficientes en masa, cuántas combinaciones de sección, categoría, percentil
+    # y orden de llegada se actualizan en cada UPDATE.
+    COMBINACIONES_POR_UPDATE = 2000
+
     status = StatusField(default=STATUS.sin_cargar)
     mesa = models.ForeignKey('Mesa', on_delete=models.CASCADE)
     categoria = models.ForeignKey('Categoria', on_delete=models.CASCADE)
 
+    # Denormalizaciones de la geografía de la mesa, para filtrar sin joins.
+    # Se copian de la mesa al crear la MesaCategoria y se mantienen con Mesa.sincronizar_geografia.
+    distrito = models.ForeignKey(
+        'Distrito', null=True, blank=True, editable=False, related_name='+', on_delete=models.SET_NULL
+    )
+    seccion = models.ForeignKey(
+        'Seccion', null=True, blank=True, editable=False, related_name='+', on_delete=models.SET_NULL
+    )
+    seccion_politica = models.ForeignKey(
+        'SeccionPolitica', null=True, blank=True, editable=False, related_name='+', on_delete=models.SET_NULL
+    )
+
     # Carga que es representativa del estado actual.
     carga_testigo = models.ForeignKey(
         'Carga', related_name='es_testigo', null=True, blank=True, on_delete=models.SET_NULL
@@ -566,6 +587,14 @@ class MesaCategoria(models.Model):
         null=False
     )
 
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.mesa_id and self.distrito_id is None:
+            mesa = self.mesa
+            self.distrito_id = mesa.distrito_id
+            self.seccion_id = mesa.seccion_id
+            self.seccion_politica_id = mesa.seccion_politica_id
+        super().save(*args, **kwargs)
+
     def asignar_a_fiscal(self):
         self.cant_fiscales_asignados += 1
         self.cant_asignaciones_realizadas += 1
@@ -582,18 +611,12 @@ class MesaCategoria(models.Model):
         """
         Actualiza `self.coeficiente_para_orden_de_carga` a partir de las prioridades
         por sección y categoría.
+        Si todavía no tenía orden de llegada se le asigna, junto con el percentil,
+        a partir de los contadores de su circuito (ver ``MesasIdentificadasCircuito``).
         """
-        # evitar import circular
-        from scheduling.models import mapa_prioridades_para_mesa_categoria
-
-        en_circuito = MesaCategoria.objects.filter(
-            categoria=self.categoria, mesa__circuito=self.mesa.circuito
-        )
-        total = en_circuito.count()
-        identificadas = en_circuito.identificadas().count()
-
-        self.orden_de_llegada = identificadas + 1
-        self.percentil = math.floor((identificadas * 100) / total) + 1
+        if self.orden_de_llegada is None:
+            MesasIdentificadasCircuito.sumar_mesa(self.mesa_id, mesa_categoria_id=self.id)
+            self.refresh_from_db(fields=['orden_de_llegada', 'percentil'])
         self.recalcular_coeficiente_para_orden_de_carga()
         logger.info(
             'actualizar orden',
@@ -613,8 +636,14 @@ class MesaCategoria(models.Model):
         from scheduling.models import mapa_prioridades_para_mesa_categoria
 
         prioridades = mapa_prioridades_para_mesa_categoria(self)
-        valor_para = prioridades.valor_para(self.percentil - 1, self.orden_de_llegada)
-        self.coeficiente_para_orden_de_carga = min(valor_para * self.percentil, MAX_INT_DB)
+        self.coeficiente_para_orden_de_carga = self.coeficiente_segun(
+            prioridades, self.percentil, self.orden_de_llegada
+        )
+
+    @staticmethod
+    def coeficiente_segun(prioridades, percentil, orden_de_llegada):
+        valor_para = prioridades.valor_para(percentil - 1, orden_de_llegada)
+        return min(valor_para * percentil, MAX_INT_DB)
 
     def invalidar_cargas(self):
         """
@@ -673,7 +702,123 @@ class MesaCategoria(models.Model):
         self.status = status
         self.carga_testigo = carga_testigo
         logger.info('mc status', id=self.id, status=status, testigo=getattr(carga_testigo, 'id', None))
-        self.save(update_fields=['status', 'carga_testigo'])
+        tabla = MesaCategoria._meta.db_table
+        with connection.cursor() as cursor:
+            # Guarda el status y devuelve el anterior en una sola consulta. Bloquea la MesaCategoria
+            # y su mesa (en ese orden, como ResumenFotosSeccion.sumar_foto), porque el resumen de
+            # fotos cuenta las mesas según el status de todas sus categorías.
+            cursor.execute(
+                f'UPDATE "{tabla}" SET status = %s, carga_testigo_id = %s '
+                f'FROM (SELECT mc.id, mc.status, mc.carga_testigo_id FROM "{tabla}" mc '
+                f'JOIN "{Mesa._meta.db_table}" mesa ON mesa.id = mc.mesa_id '
+                f'WHERE mc.id = %s FOR UPDATE) anterior '
+                f'WHERE "{tabla}".id = anterior.id '
+                f'RETURNING anterior.status, anterior.carga_testigo_id',
+                [status, self.carga_testigo_id, self.id]
+            )
+            status_anterior, carga_testigo_anterior_id = cursor.fetchone()
+        if (status_anterior, carga_testigo_anterior_id) != (status, self.carga_testigo_id):
+            self.actualizar_totales_por_circuito(status_anterior, carga_testigo_anterior_id)
+        if status_anterior != status:
+            self.actualizar_resumen_de_avance(status_anterior)
+
+    def actualizar_resumen_de_avance(self, status_anterior=None):
+        """
+        Pasa la MesaCategoria de su status anterior (si no lo tiene, es nueva) al actual en el
+        ``ResumenAvanceCarga``. Si con eso la mesa, sin fotos, pasa a tener alguna categoría
+        cargada o deja de tenerla, actualiza también las mesas con carga sin foto del
+        ``ResumenFotosSeccion``. Todo en una única consulta.
+        """
+        from adjuntos.models import Attachment
+
+        cambios = [(self.status, 1)]
+        if status_anterior is not None:
+            cambios.insert(0, (status_anterior, -1))
+        sin_cargar = MesaCategoria.STATUS.sin_cargar
+        carga_sin_foto = int(self.status != sin_cargar) - int(status_anterior not in (None, sin_cargar))
+
+        avance = ResumenAvanceCarga._meta.db_table
+        fotos = ResumenFotosSeccion._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'WITH datos_mesa AS ('
+                f'SELECT mesa.distrito_id, mesa.seccion_id, '
+                f'EXISTS (SELECT 1 FROM "{Attachment._meta.db_table}" foto '
+                f'WHERE foto.mesa_id = mesa.id) AS con_fotos, '
+                f'EXISTS (SELECT 1 FROM "{MesaCategoria._meta.db_table}" otra '
+                f'WHERE otra.mesa_id = mesa.id AND otra.id <> %s AND otra.status <> %s) AS otra_cargada '
+                f'FROM "{Mesa._meta.db_table}" mesa WHERE mesa.id = %s'
+                f'), avance AS ('
+                f'INSERT INTO "{avance}" '
+                f'(categoria_id, distrito_id, seccion_id, status, con_fotos, cant_mesas) '
+                f'SELECT %s, %s, %s, cambio.status, datos_mesa.con_fotos, cambio.cant_mesas '
+                f'FROM datos_mesa, (VALUES {", ".join(["(%s, %s)"] * len(cambios))}) '
+                f'AS cambio (status, cant_mesas) '
+                f'ON CONFLICT {ResumenAvanceCarga.CONFLICTO} '
+                f'DO UPDATE SET cant_mesas = "{avance}".cant_mesas + EXCLUDED.cant_mesas'
+                f') '
+                f'INSERT INTO "{fotos}" '
+                f'(distrito_id, seccion_id, cant_mesas, '
+                f'mesas_con_foto_identificada, mesas_con_carga_sin_foto) '
+                f'SELECT distrito_id, seccion_id, 0, 0, %s FROM datos_mesa '
+                f'WHERE %s <> 0 AND NOT con_fotos AND NOT otra_cargada '
+                f'ON CONFLICT {ResumenFotosSeccion.CONFLICTO} '
+                f'DO UPDATE SET mesas_con_carga_sin_foto = '
+                f'"{fotos}".mesas_con_carga_sin_foto + EXCLUDED.mesas_con_carga_sin_foto',
+                [self.id, sin_cargar, self.mesa_id, self.categoria_id, self.distrito_id, self.seccion_id]
+                + [valor for cambio in cambios for valor in cambio]
+                + [carga_sin_foto, carga_sin_foto]
+            )
+
+    def actualizar_totales_por_circuito(self, status_anterior, carga_testigo_anterior_id):
+        """
+        Descuenta de los totales por circuito lo aportado por la carga testigo anterior
+        y suma lo que aporta la actual.
+        """
+        circuito_id, electores = self.mesa.circuito_id, self.mesa.electores
+        if carga_testigo_anterior_id is not None:
+            self.sumar_a_totales_por_circuito(
+                circuito_id, electores, self.categoria_id, status_anterior, carga_testigo_anterior_id,
+                signo=-1
+            )
+        if self.carga_testigo_id is not None:
+            self.sumar_a_totales_por_circuito(
+                circuito_id, electores, self.categoria_id, self.status, self.carga_testigo_id
+            )
+
+    @staticmethod
+    def sumar_a_totales_por_circuito(
+        circuito_id, electores, categoria_id, status, carga_testigo_id, signo=1
+    ):
+        """
+        Suma (o descuenta) a los totales del circuito los votos de la carga testigo y la mesa
+        con sus electores.
+        """
+        if circuito_id is None:
+            return
+        VotosCircuito.sumar_carga(circuito_id, categoria_id, status, carga_testigo_id, signo)
+        MesasEscrutadasCircuito.sumar_mesa(circuito_id, categoria_id, status, electores, signo)
+
+    @classmethod
+    def descontar_de_totales_por_circuito(cls, **filtro):
+        """
+        Descuenta de los totales por circuito lo que aportan las mesa-categorías que cumplen el
+        filtro y les quita la carga testigo. Se usa antes de borrar la carga testigo o la mesa.
+
+        La carga testigo se lee bloqueando la fila: si se borran la carga y la mesa a la vez,
+        la que llega segunda ya no la encuentra y no se descuenta dos veces.
+        """
+        escrutadas = list(cls.objects.select_for_update(of=('self',)).filter(
+            carga_testigo__isnull=False, **filtro
+        ).values_list(
+            'id', 'mesa__circuito_id', 'mesa__electores', 'categoria_id', 'status', 'carga_testigo_id'
+        ))
+        for _, circuito_id, electores, categoria_id, status, carga_testigo_id in escrutadas:
+            cls.sumar_a_totales_por_circuito(
+                circuito_id, electores, categoria_id, status, carga_testigo_id, signo=-1
+            )
+        if escrutadas:
+            cls.objects.filter(id__in=[escrutada[0] for escrutada in escrutadas]).update(carga_testigo=None)
 
     def actualizar_parcial_oficial(self, parcial_oficial):
         self.parcial_oficial = parcial_oficial
@@ -698,14 +843,65 @@ class MesaCategoria(models.Model):
         Se usa como acción derivada del cambio de prioridades en la categoría.
         """
         mesa_cats_a_actualizar = cls.objects.identificadas().sin_problemas() \
-            .sin_consolidar_por_doble_carga().filter(mesa__circuito__seccion=seccion)
+            .sin_consolidar_por_doble_carga().filter(seccion=seccion)
         cls.recalcular_coeficiente_para_orden_de_carga_mesas(mesa_cats_a_actualizar)
 
+    @classmethod
+    def asignar_orden_de_carga(cls, mesa_id):
+        """
+        Asigna orden de llegada, percentil y coeficiente_para_orden_de_carga a las MesaCategoria
+        de la mesa que todavía no los tienen (es decir, cuando se identifica la mesa).
+        """
+        ids = MesasIdentificadasCircuito.sumar_mesa(mesa_id)
+        if ids:
+            cls.recalcular_coeficiente_para_orden_de_carga_mesas(cls.objects.filter(id__in=ids))
+            logger.info('actualizar orden', mesa=mesa_id, mesa_categorias=ids)
+
     @classmethod
     def recalcular_coeficiente_para_orden_de_carga_mesas(cls, mesa_cats):
-        for mesa_cat in mesa_cats:
-            mesa_cat.recalcular_coeficiente_para_orden_de_carga()
-        cls.objects.bulk_update(mesa_cats, ['coeficiente_para_orden_de_carga'])
+        """
+        Recalcula el coeficiente_para_orden_de_carga de las MesaCategoria del queryset `mesa_cats`.
+
+        El coeficiente depende sólo de la sección, la categoría, el percentil y el orden de llegada,
+        así que se calcula una vez por cada combinación presente y se actualizan todas las
+        MesaCategoria con un UPDATE por cada lote de combinaciones.
+        """
+        # evitar import circular
+        from scheduling.models import mapas_prioridades_vigentes, mapa_prioridades_para_seccion_y_categoria
+
+        combinaciones = mesa_cats.filter(
+            percentil__isnull=False, orden_de_llegada__isnull=False
+        ).values_list('seccion_id', 'categoria_id', 'percentil', 'orden_de_llegada').distinct().order_by()
+
+        mapas = mapas_prioridades_vigentes()
+        prioridades = {}
+        filas = []
+        for seccion_id, categoria_id, percentil, orden_de_llegada in combinaciones:
+            if (seccion_id, categoria_id) not in prioridades:
+                prioridades[(seccion_id, categoria_id)] = mapa_prioridades_para_seccion_y_categoria(
+                    seccion_id, categoria_id, mapas
+                )
+            coeficiente = cls.coeficiente_segun(
+                prioridades[(seccion_id, categoria_id)], percentil, orden_de_llegada
+            )
+            filas.append((seccion_id, categoria_id, percentil, orden_de_llegada, coeficiente))
+
+        tabla = cls._meta.db_table
+        sql_ids, params_ids = mesa_cats.order_by().values('id').query.sql_with_params()
+        with connection.cursor() as cursor:
+            for desde in range(0, len(filas), cls.COMBINACIONES_POR_UPDATE):
+                lote = filas[desde:desde + cls.COMBINACIONES_POR_UPDATE]
+                valores = ', '.join([f"({', '.join(['%s::integer'] * 5)})"] * len(lote))
+                cursor.execute(f"""
+                    UPDATE "{tabla}" SET coeficiente_para_orden_de_carga = v.coeficiente
+                    FROM (VALUES {valores})
+                        AS v (seccion_id, categoria_id, percentil, orden_de_llegada, coeficiente)
+                    WHERE "{tabla}".seccion_id IS NOT DISTINCT FROM v.seccion_id
+                        AND "{tabla}".categoria_id = v.categoria_id
+                        AND "{tabla}".percentil = v.percentil
+                        AND "{tabla}".orden_de_llegada = v.orden_de_llegada
+                        AND "{tabla}".id IN ({sql_ids})
+                """, [valor for fila in lote for valor in fila] + list(params_ids))
 
     def __str__(self):
         return f'Mesa {self.mesa} - cat {self.categoria} (id {self.id})'
@@ -728,6 +924,17 @@ class Mesa(models.Model):
     numero = models.CharField(max_length=10)
     es_testigo = models.BooleanField(default=False)
     circuito = models.ForeignKey(Circuito, null=True, related_name='mesas', on_delete=models.SET_NULL)
+    # Denormalizaciones de la geografía del circuito, para filtrar sin joins.
+    # Se completan al guardar la mesa y se mantienen al cambiar un circuito o una sección de lugar.
+    distrito = models.ForeignKey(
+        Distrito, null=True, blank=True, editable=False, related_name='+', on_delete=models.SET_NULL
+    )
+    seccion = models.ForeignKey(
+        Seccion, null=True, blank=True, editable=False, related_name='+', on_delete=models.SET_NULL
+    )
+    seccion_politica = models.ForeignKey(
+        SeccionPolitica, null=True, blank=True, editable=False, related_name='+', on_delete=models.SET_NULL
+    )
     lugar_votacion = models.ForeignKey(
         LugarVotacion,
         verbose_name='Lugar de votacion',
@@ -741,9 +948,62 @@ class Mesa(models.Model):
     electores = models.PositiveIntegerField(null=True, blank=True)
     extranjeros = models.BooleanField(default=False)
 
+    # Tracker de cambios de circuito y electores, usado para mantener los totales por circuito.
+    tracker = FieldTracker(fields=['circuito', 'electores'])
+
+    CAMPOS_GEOGRAFIA = ['distrito', 'seccion', 'seccion_politica']
+
     class Meta:
         unique_together = ('circuito', 'numero')
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        actualiza_geografia = update_fields is None or 'circuito' in update_fields
+        if actualiza_geografia:
+            self.completar_geografia()
+            if update_fields is not None:
+                kwargs['update_fields'] = [*update_fields, *self.CAMPOS_GEOGRAFIA]
+        super().save(*args, **kwargs)
+        if actualiza_geografia:
+            self.mesacategoria_set.exclude(
+                distrito_id=self.distrito_id,
+                seccion_id=self.seccion_id,
+                seccion_politica_id=self.seccion_politica_id,
+            ).update(
+                distrito_id=self.distrito_id,
+                seccion_id=self.seccion_id,
+                seccion_politica_id=self.seccion_politica_id,
+            )
+
+    def completar_geografia(self):
+        """
+        Copia en la mesa el distrito, la sección y la sección política de su circuito.
+        """
+        geografia = Seccion.objects.filter(circuitos=self.circuito_id).values_list(
+            'distrito_id', 'id', 'seccion_politica_id'
+        ).first() if self.circuito_id else None
+        self.distrito_id, self.seccion_id, self.seccion_politica_id = geografia or (None, None, None)
+
+    @classmethod
+    def sincronizar_geografia(cls, mesas=None):
+        """
+        Recalcula la geografía denormalizada de las mesas indicadas (todas si no se indica ninguna)
+        y de sus MesaCategoria. Se usa cuando un circuito o una sección cambian de lugar.
+        """
+        mesas = cls.objects.all() if mesas is None else mesas
+        circuito = Circuito.objects.filter(id=OuterRef('circuito_id'))
+        mesas.update(
+            distrito_id=Subquery(circuito.values('seccion__distrito_id')[:1]),
+            seccion_id=Subquery(circuito.values('seccion_id')[:1]),
+            seccion_politica_id=Subquery(circuito.values('seccion__seccion_politica_id')[:1]),
+        )
+        mesa = cls.objects.filter(id=OuterRef('mesa_id'))
+        MesaCategoria.objects.filter(mesa__in=mesas).update(
+            distrito_id=Subquery(mesa.values('distrito_id')[:1]),
+            seccion_id=Subquery(mesa.values('seccion_id')[:1]),
+            seccion_politica_id=Subquery(mesa.values('seccion_politica_id')[:1]),
+        )
+
     def categoria_add(self, categoria):
         MesaCategoria.objects.get_or_create(mesa=self, categoria=categoria)
 
@@ -790,6 +1050,7 @@ class Mesa(models.Model):
         para que no se tengan en cuenta en el scheduling
         """
         logger.info('invalidar asignacion attachment', mesa=self.id)
+        MesasIdentificadasCircuito.restar_mesa(self.id)
         for mc in MesaCategoria.objects.filter(mesa=self):
             mc.coeficiente_para_orden_de_carga = None
             mc.percentil = None
@@ -820,14 +1081,6 @@ class Mesa(models.Model):
     def nombre_completo(self):
         return self.lugar_votacion.nombre_completo() + " - Mesa N°" + self.numero
 
-    @property
-    def distrito(self):
-        return self.circuito.seccion.distrito
-
-    @property
-    def seccion(self):
-        return self.circuito.seccion
-
 
 class Partido(models.Model):
     """
@@ -1279,6 +1532,520 @@ class VotoMesaReportado(models.Model):
         return f"{self.carga} - {self.opcion}: {self.votos}"
 
 
+class VotosCircuito(models.Model):
+    """
+    Totales pre-agregados de los votos de las cargas testigo, por circuito, categoría,
+    opción y status de la MesaCategoria.
+
+    Se mantiene en forma incremental desde ``MesaCategoria.actualizar_status`` (y desde las
+    señales que mueven o borran mesas y cargas testigo), de manera que el cómputo de resultados
+    no tenga que recorrer todos los ``VotoMesaReportado``.
+    """
+    circuito = models.ForeignKey(Circuito, related_name='votos_totales', on_delete=models.CASCADE)
+    categoria = models.ForeignKey('Categoria', on_delete=models.CASCADE)
+    opcion = models.ForeignKey('Opcion', on_delete=models.CASCADE)
+    status = models.CharField(max_length=100, choices=settings.MC_STATUS_CHOICE)
+    votos = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('circuito', 'categoria', 'opcion', 'status')
+        verbose_name = 'Votos por circuito'
+        verbose_name_plural = 'Votos por circuito'
+
+    def __str__(self):
+        return f"{self.circuito} - {self.categoria} - {self.opcion} ({self.status}): {self.votos}"
+
+    @classmethod
+    def sumar_carga(cls, circuito_id, categoria_id, status, carga_id, signo=1):
+        """
+        Suma los votos de la carga a los totales del circuito, en un único upsert.
+        Si el signo es -1 los resta, sólo de los totales que existen: si faltan (porque no se
+        reconstruyeron) no se crean totales negativos.
+        """
+        tabla = cls._meta.db_table
+        tabla_votos = VotoMesaReportado._meta.db_table
+        with connection.cursor() as cursor:
+            if signo < 0:
+                cursor.execute(
+                    f'UPDATE "{tabla}" SET votos = "{tabla}".votos - voto.votos '
+                    f'FROM "{tabla_votos}" voto WHERE voto.carga_id = %s '
+                    f'AND "{tabla}".opcion_id = voto.opcion_id AND "{tabla}".circuito_id = %s '
+                    f'AND "{tabla}".categoria_id = %s AND "{tabla}".status = %s',
+                    [carga_id, circuito_id, categoria_id, status]
+                )
+                return
+            cursor.execute(
+                f'INSERT INTO "{tabla}" (circuito_id, categoria_id, opcion_id, status, votos) '
+                f'SELECT %s, %s, opcion_id, %s, votos FROM "{tabla_votos}" WHERE carga_id = %s '
+                f'ON CONFLICT (circuito_id, categoria_id, opcion_id, status) '
+                f'DO UPDATE SET votos = "{tabla}".votos + EXCLUDED.votos',
+                [circuito_id, categoria_id, status, carga_id]
+            )
+
+    @classmethod
+    def reconstruir(cls):
+        """
+        Regenera todos los totales a partir de las cargas testigo.
+        """
+        votos = VotoMesaReportado.objects.filter(
+            carga__es_testigo__isnull=False,
+            carga__mesa_categoria__mesa__circuito__isnull=False,
+        ).values_list(
+            'carga__mesa_categoria__mesa__circuito',
+            'carga__mesa_categoria__categoria',
+            'opcion',
+            'carga__mesa_categoria__status',
+        ).annotate(
+            sum_votos=Sum('votos')
+        ).order_by()
+
+        cls.objects.all().delete()
+        cls.objects.bulk_create((
+            cls(circuito_id=circuito_id, categoria_id=categoria_id, opcion_id=opcion_id,
+                status=status, votos=sum_votos)
+            for circuito_id, categoria_id, opcion_id, status, sum_votos in votos
+        ), batch_size=5000)
+
+
+class MesasEscrutadasCircuito(models.Model):
+    """
+    Cantidad de mesas escrutadas (es decir, con carga testigo) y sus electores,
+    por circuito, categoría y status de la MesaCategoria.
+
+    Se mantiene junto con ``VotosCircuito``.
+    """
+    circuito = models.ForeignKey(Circuito, related_name='mesas_escrutadas', on_delete=models.CASCADE)
+    categoria = models.ForeignKey('Categoria', on_delete=models.CASCADE)
+    status = models.CharField(max_length=100, choices=settings.MC_STATUS_CHOICE)
+    cant_mesas = models.IntegerField(default=0)
+    electores = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('circuito', 'categoria', 'status')
+        verbose_name = 'Mesas escrutadas por circuito'
+        verbose_name_plural = 'Mesas escrutadas por circuito'
+
+    def __str__(self):
+        return f"{self.circuito} - {self.categoria} ({self.status}): {self.cant_mesas}"
+
+    @classmethod
+    def sumar_mesa(cls, circuito_id, categoria_id, status, electores, signo=1):
+        """
+        Suma la mesa y sus electores a los totales del circuito. Si el signo es -1 los resta,
+        sólo si el total existe.
+        """
+        tabla = cls._meta.db_table
+        electores = electores or 0
+        with connection.cursor() as cursor:
+            if signo < 0:
+                cursor.execute(
+                    f'UPDATE "{tabla}" SET cant_mesas = cant_mesas - 1, electores = electores - %s '
+                    f'WHERE circuito_id = %s AND categoria_id = %s AND status = %s',
+                    [electores, circuito_id, categoria_id, status]
+                )
+                return
+            cursor.execute(
+                f'INSERT INTO "{tabla}" (circuito_id, categoria_id, status, cant_mesas, electores) '
+                f'VALUES (%s, %s, %s, %s, %s) '
+                f'ON CONFLICT (circuito_id, categoria_id, status) '
+                f'DO UPDATE SET cant_mesas = "{tabla}".cant_mesas + EXCLUDED.cant_mesas, '
+                f'electores = "{tabla}".electores + EXCLUDED.electores',
+                [circuito_id, categoria_id, status, 1, electores]
+            )
+
+    @classmethod
+    def reconstruir(cls):
+        """
+        Regenera todos los totales a partir del estado actual de las MesaCategoria.
+        """
+        escrutadas = MesaCategoria.objects.filter(
+            carga_testigo__isnull=False,
+            mesa__circuito__isnull=False,
+        ).values_list(
+            'mesa__circuito', 'categoria', 'status'
+        ).annotate(
+            cant_mesas=Count('id'),
+            electores=Sum('mesa__electores'),
+        ).order_by()
+
+        cls.objects.all().delete()
+        cls.objects.bulk_create((
+            cls(circuito_id=circuito_id, categoria_id=categoria_id, status=status,
+                cant_mesas=cant_mesas, electores=electores or 0)
+            for circuito_id, categoria_id, status, cant_mesas, electores in escrutadas
+        ), batch_size=5000)
+
+
+class MesasIdentificadasCircuito(models.Model):
+    """
+    Cantidad de MesaCategoria por circuito y categoría, y cuántas de ellas ya tienen orden
+    de llegada (es decir, se identificó su mesa). Con esto se asignan orden_de_llegada y percentil
+    sin contar las mesas del circuito en cada identificación.
+
+    Cada fila se inicializa contando la primera vez que se identifica una mesa de su circuito
+    y categoría; ``reconstruir`` la vuelve a contar (por ejemplo, si se agregan mesas después).
+    """
+    circuito = models.ForeignKey(Circuito, related_name='mesas_identificadas', on_delete=models.CASCADE)
+    categoria = models.ForeignKey('Categoria', on_delete=models.CASCADE)
+    total = models.IntegerField(default=0)
+    identificadas = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('circuito', 'categoria')
+        verbose_name = 'Mesas identificadas por circuito'
+        verbose_name_plural = 'Mesas identificadas por circuito'
+
+    def __str__(self):
+        return f"{self.circuito} - {self.categoria}: {self.identificadas} de {self.total}"
+
+    @classmethod
+    def sumar_mesa(cls, mesa_id, mesa_categoria_id=None):
+        """
+        Cuenta como identificadas a las MesaCategoria de la mesa (o sólo a `mesa_categoria_id`)
+        que no tenían orden de llegada, y les asigna orden_de_llegada y percentil según los
+        contadores de su circuito, todo en la base. Devuelve los ids de las MesaCategoria actualizadas.
+        """
+        tabla = cls._meta.db_table
+        tabla_mc = MesaCategoria._meta.db_table
+        tabla_mesa = Mesa._meta.db_table
+        params = {'mesa_id': mesa_id, 'mesa_categoria_id': mesa_categoria_id}
+        nuevas = f"""
+            SELECT mc.id, mc.categoria_id, mesa.circuito_id
+            FROM "{tabla_mc}" mc JOIN "{tabla_mesa}" mesa ON mesa.id = mc.mesa_id
+            WHERE mc.mesa_id = %(mesa_id)s AND mc.orden_de_llegada IS NULL AND mesa.circuito_id IS NOT NULL
+                AND (%(mesa_categoria_id)s::integer IS NULL OR mc.id = %(mesa_categoria_id)s::integer)
+        """
+        with connection.cursor() as cursor:
+            # Se crean los contadores que falten, contando las mesas del circuito.
+            cursor.execute(f"""
+                INSERT INTO "{tabla}" (circuito_id, categoria_id, total, identificadas)
+                SELECT nuevas.circuito_id, nuevas.categoria_id, count(*), count(otra.orden_de_llegada)
+                FROM ({nuevas}) nuevas
+                    JOIN "{tabla_mesa}" mesa ON mesa.circuito_id = nuevas.circuito_id
+                    JOIN "{tabla_mc}" otra
+                        ON otra.mesa_id = mesa.id AND otra.categoria_id = nuevas.categoria_id
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM "{tabla}" contador
+                    WHERE contador.circuito_id = nuevas.circuito_id
+                        AND contador.categoria_id = nuevas.categoria_id
+                )
+                GROUP BY nuevas.circuito_id, nuevas.categoria_id
+                ON CONFLICT (circuito_id, categoria_id) DO NOTHING
+            """, params)
+            # Se incrementan y se asigna el valor resultante como orden de llegada.
+            cursor.execute(f"""
+                WITH nuevas AS ({nuevas} FOR UPDATE OF mc),
+                contadores AS (
+                    UPDATE "{tabla}" contador SET identificadas = contador.identificadas + 1
+                    FROM nuevas
+                    WHERE contador.circuito_id = nuevas.circuito_id
+                        AND contador.categoria_id = nuevas.categoria_id
+                    RETURNING contador.categoria_id, contador.total, contador.identificadas
+                )
+                UPDATE "{tabla_mc}" mc SET
+                    orden_de_llegada = contadores.identificadas,
+                    percentil = LEAST((contadores.identificadas - 1) * 100 / contadores.total + 1, 100)
+                FROM nuevas JOIN contadores ON contadores.categoria_id = nuevas.categoria_id
+                WHERE mc.id = nuevas.id
+                RETURNING mc.id
+            """, params)
+            return [id for id, in cursor.fetchall()]
+
+    @classmethod
+    def restar_mesa(cls, mesa_id):
+        """
+        Descuenta de las identificadas a las MesaCategoria de la mesa que tenían orden de llegada.
+        Se invoca antes de borrárselo.
+        """
+        cls.objects.filter(
+            circuito__mesas=mesa_id,
+            categoria__in=MesaCategoria.objects.filter(
+                mesa_id=mesa_id, orden_de_llegada__isnull=False
+            ).values('categoria_id')
+        ).update(identificadas=F('identificadas') - 1)
+
+    @classmethod
+    def reconstruir(cls):
+        """
+        Regenera todos los contadores a partir del estado actual de las MesaCategoria.
+        """
+        por_circuito = MesaCategoria.objects.filter(
+            mesa__circuito__isnull=False,
+        ).values_list(
+            'mesa__circuito', 'categoria'
+        ).annotate(
+            total=Count('id'),
+            identificadas=Count('orden_de_llegada'),
+        ).order_by()
+
+        cls.objects.all().delete()
+        cls.objects.bulk_create((
+            cls(circuito_id=circuito_id, categoria_id=categoria_id, total=total, identificadas=identificadas)
+            for circuito_id, categoria_id, total, identificadas in por_circuito
+        ), batch_size=5000)
+
+
+class ResumenAvanceCarga(models.Model):
+    """
+    Cantidad de MesaCategoria por categoría, sección y status, distinguiendo si la mesa
+    tiene fotos. Es lo que leen los resúmenes de avance de carga (ver resultados_resumen.py),
+    así los tableros no compiten con la carga por la base.
+
+    Se mantiene en forma incremental: al crearse una MesaCategoria, cuando la consolidación le
+    cambia el status (ver ``MesaCategoria.actualizar_status``) y cuando su mesa pasa a tener o deja
+    de tener fotos. Las altas masivas, las bajas y los cambios de geografía no se siguen: después
+    de ellos hay que correr el comando ``reconstruir_resumen_de_avance``.
+    """
+    # Las filas son únicas por (categoria, distrito, seccion, status, con_fotos), tomando los nulos
+    # como iguales; el índice se crea en la migración 0070.
+    CONFLICTO = '(categoria_id, COALESCE(distrito_id, 0), COALESCE(seccion_id, 0), status, con_fotos)'
+
+    categoria = models.ForeignKey('Categoria', related_name='+', on_delete=models.CASCADE)
+    distrito = models.ForeignKey(Distrito, null=True, related_name='+', on_delete=models.CASCADE)
+    seccion = models.ForeignKey(Seccion, null=True, related_name='+', on_delete=models.CASCADE)
+    status = models.CharField(max_length=100, choices=settings.MC_STATUS_CHOICE)
+    con_fotos = models.BooleanField(default=False)
+    cant_mesas = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Resumen de avance de carga'
+        verbose_name_plural = 'Resumen de avance de carga'
+
+    def __str__(self):
+        return f"{self.categoria} - {self.seccion} ({self.status}): {self.cant_mesas}"
+
+    @classmethod
+    def sumar(cls, categoria_id, distrito_id, seccion_id, status, con_fotos, signo=1):
+        """
+        Suma (o resta, si el signo es -1) una MesaCategoria al resumen, en un único upsert.
+        """
+        tabla = cls._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO "{tabla}" '
+                f'(categoria_id, distrito_id, seccion_id, status, con_fotos, cant_mesas) '
+                f'VALUES (%s, %s, %s, %s, %s, %s) '
+                f'ON CONFLICT {cls.CONFLICTO} '
+                f'DO UPDATE SET cant_mesas = "{tabla}".cant_mesas + EXCLUDED.cant_mesas',
+                [categoria_id, distrito_id, seccion_id, status, con_fotos, signo]
+            )
+
+    @classmethod
+    def sumar_mesa(cls, mesa_id, con_fotos, signo=1):
+        """
+        Suma (o resta) todas las MesaCategoria de la mesa, con su status actual.
+        """
+        tabla = cls._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO "{tabla}" '
+                f'(categoria_id, distrito_id, seccion_id, status, con_fotos, cant_mesas) '
+                f'SELECT categoria_id, distrito_id, seccion_id, status, %s, %s * count(*) '
+                f'FROM "{MesaCategoria._meta.db_table}" WHERE mesa_id = %s '
+                f'GROUP BY categoria_id, distrito_id, seccion_id, status '
+                f'ON CONFLICT {cls.CONFLICTO} '
+                f'DO UPDATE SET cant_mesas = "{tabla}".cant_mesas + EXCLUDED.cant_mesas',
+                [con_fotos, signo, mesa_id]
+            )
+
+    @classmethod
+    def reconstruir(cls):
+        from adjuntos.models import Attachment
+
+        resumen = MesaCategoria.objects.annotate(
+            con_fotos=Exists(Attachment.objects.filter(mesa=OuterRef('mesa')))
+        ).values_list(
+            'categoria', 'distrito', 'seccion', 'status', 'con_fotos'
+        ).annotate(
+            cant_mesas=Count('id')
+        ).order_by()
+
+        cls.objects.all().delete()
+        cls.objects.bulk_create((
+            cls(categoria_id=categoria_id, distrito_id=distrito_id, seccion_id=seccion_id,
+                status=status, con_fotos=con_fotos, cant_mesas=cant_mesas)
+            for categoria_id, distrito_id, seccion_id, status, con_fotos, cant_mesas in resumen
+        ), batch_size=5000)
+
+
+class ResumenFotosSeccion(models.Model):
+    """
+    Cantidad de mesas de cada sección, de mesas con foto identificada y de mesas con cargas
+    pero sin foto. Una mesa cuenta como "con cargas" si alguna de sus categorías dejó de estar
+    sin cargar, así se actualiza en la misma consulta que el ``ResumenAvanceCarga`` cuando la
+    consolidación le cambia el status a una MesaCategoria.
+
+    Se mantiene en forma incremental al crearse una mesa, cuando una mesa pasa a tener o deja de
+    tener fotos y cuando cambia el status de sus categorías; igual que ``ResumenAvanceCarga``,
+    se reconstruye con el comando ``reconstruir_resumen_de_avance``.
+    """
+    # Las filas son únicas por (distrito, seccion), tomando los nulos como iguales.
+    CONFLICTO = '(COALESCE(distrito_id, 0), COALESCE(seccion_id, 0))'
+
+    distrito = models.ForeignKey(Distrito, null=True, related_name='+', on_delete=models.CASCADE)
+    seccion = models.ForeignKey(Seccion, null=True, related_name='+', on_delete=models.CASCADE)
+    cant_mesas = models.IntegerField(default=0)
+    mesas_con_foto_identificada = models.IntegerField(default=0)
+    mesas_con_carga_sin_foto = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Resumen de fotos por sección'
+        verbose_name_plural = 'Resumen de fotos por sección'
+
+    def __str__(self):
+        return f"{self.seccion}: {self.mesas_con_foto_identificada} / {self.cant_mesas}"
+
+    @classmethod
+    def sumar(cls, distrito_id, seccion_id, cant_mesas=0, mesas_con_foto_identificada=0,
+              mesas_con_carga_sin_foto=0):
+        tabla = cls._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO "{tabla}" '
+                f'(distrito_id, seccion_id, cant_mesas, '
+                f'mesas_con_foto_identificada, mesas_con_carga_sin_foto) '
+                f'VALUES (%s, %s, %s, %s, %s) '
+                f'ON CONFLICT {cls.CONFLICTO} '
+                f'DO UPDATE SET cant_mesas = "{tabla}".cant_mesas + EXCLUDED.cant_mesas, '
+                f'mesas_con_foto_identificada = '
+                f'"{tabla}".mesas_con_foto_identificada + EXCLUDED.mesas_con_foto_identificada, '
+                f'mesas_con_carga_sin_foto = '
+                f'"{tabla}".mesas_con_carga_sin_foto + EXCLUDED.mesas_con_carga_sin_foto',
+                [distrito_id, seccion_id, cant_mesas, mesas_con_foto_identificada, mesas_con_carga_sin_foto]
+            )
+
+    @classmethod
+    def sumar_foto(cls, mesa_id, signo=1):
+        """
+        Se invoca cuando la mesa recibe (signo 1) o pierde (signo -1) una foto. Si era la primera
+        o la última, actualiza este resumen y pasa sus MesaCategoria de un lado al otro del
+        ``ResumenAvanceCarga``.
+
+        Se bloquean las MesaCategoria de la mesa y la mesa (en ese orden, como la consolidación)
+        para contar las fotos y las categorías cargadas sin competir con otras fotos de la misma
+        mesa ni con ``MesaCategoria.actualizar_status``.
+        """
+        from adjuntos.models import Attachment
+
+        list(MesaCategoria.objects.select_for_update().filter(mesa_id=mesa_id).order_by('id').values('id'))
+        geografia = Mesa.objects.select_for_update().filter(id=mesa_id).values_list(
+            'distrito_id', 'seccion_id'
+        ).first()
+        if geografia is None:
+            return
+        if Attachment.objects.filter(mesa_id=mesa_id).count() != (1 if signo > 0 else 0):
+            return
+
+        con_cargas = MesaCategoria.objects.filter(mesa_id=mesa_id).exclude(
+            status=MesaCategoria.STATUS.sin_cargar
+        ).exists()
+        cls.sumar(
+            *geografia,
+            mesas_con_foto_identificada=signo,
+            mesas_con_carga_sin_foto=-signo if con_cargas else 0,
+        )
+        ResumenAvanceCarga.sumar_mesa(mesa_id, con_fotos=signo < 0, signo=-1)
+        ResumenAvanceCarga.sumar_mesa(mesa_id, con_fotos=signo > 0)
+
+    @classmethod
+    def reconstruir(cls):
+        from adjuntos.models import Attachment
+
+        grupos = Mesa.objects.annotate(
+            con_foto=Exists(Attachment.objects.filter(mesa=OuterRef('pk'))),
+            con_cargas=Exists(MesaCategoria.objects.filter(mesa=OuterRef('pk')).exclude(
+                status=MesaCategoria.STATUS.sin_cargar
+            )),
+        ).values_list(
+            'distrito', 'seccion', 'con_foto', 'con_cargas'
+        ).annotate(
+            cant_mesas=Count('id')
+        ).order_by()
+
+        resumen = {}
+        for distrito_id, seccion_id, con_foto, con_cargas, cant_mesas in grupos:
+            fila = resumen.setdefault(
+                (distrito_id, seccion_id), cls(distrito_id=distrito_id, seccion_id=seccion_id)
+            )
+            fila.cant_mesas += cant_mesas
+            if con_foto:
+                fila.mesas_con_foto_identificada += cant_mesas
+            elif con_cargas:
+                fila.mesas_con_carga_sin_foto += cant_mesas
+
+        cls.objects.all().delete()
+        cls.objects.bulk_create(resumen.values(), batch_size=5000)
+
+
+class Epoca(models.Model):
+    """
+    Contador que identifica una versión de datos de los que dependen cálculos cacheados
+    (ver elecciones/cache_resultados.py). Se guarda en una tabla propia, y no en un cache,
+    para que no se pierda y se incremente en forma atómica.
+    """
+    CONSOLIDACION = 'epoca-consolidacion'
+
+    clave = models.CharField(max_length=50, primary_key=True)
+    valor = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Época'
+        verbose_name_plural = 'Épocas'
+
+    @classmethod
+    def actual(cls, clave):
+        return cls.objects.filter(clave=clave).values_list('valor', flat=True).first() or 0
+
+    @classmethod
+    def avanzar(cls, clave):
+        """
+        Incrementa la época y devuelve el nuevo valor.
+        """
+        tabla = cls._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                INSERT INTO {tabla} (clave, valor) VALUES (%s, 1)
+                ON CONFLICT (clave) DO UPDATE SET valor = {tabla}.valor + 1
+                RETURNING valor
+            """, [clave])
+            return cursor.fetchone()[0]
+
+    def __str__(self):
+        return f'{self.clave}: {self.valor}'
+
+
+class SnapshotResultados(models.Model):
+    """
+    Foto de los resultados de una categoría, en todo el país (distrito nulo) o en un distrito,
+    tomada periódicamente para mostrar la evolución del escrutinio sin recalcular nada.
+    """
+    categoria = models.ForeignKey('Categoria', related_name='snapshots_resultados', on_delete=models.CASCADE)
+    distrito = models.ForeignKey(Distrito, null=True, blank=True, on_delete=models.CASCADE)
+    tipo_de_agregacion = models.CharField(max_length=30, choices=TIPOS_DE_AGREGACIONES)
+    momento = models.DateTimeField(default=timezone.now)
+    # Época de consolidación en la que se tomó (ver elecciones/cache_resultados.py).
+    epoca_consolidacion = models.PositiveIntegerField(default=0)
+    total_mesas = models.PositiveIntegerField(default=0)
+    mesas_escrutadas = models.PositiveIntegerField(default=0)
+    electores = models.PositiveIntegerField(default=0)
+    electores_en_mesas_escrutadas = models.PositiveIntegerField(default=0)
+    # Votos por opción: {id de opción: votos}.
+    votos = JSONField(default=dict)
+
+    class Meta:
+        ordering = ('momento', )
+        verbose_name = 'Snapshot de resultados'
+        verbose_name_plural = 'Snapshots de resultados'
+        indexes = [
+            models.Index(
+                fields=['categoria', 'tipo_de_agregacion', 'distrito', 'momento'], name='snapshot_evolucion'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.categoria} - {self.distrito or "País"} ({self.momento})'
+
+
 class TecnicaProyeccion(models.Model):
     """
     Representa una estrategia para agrupar circuitos para hacer proyecciones.
@@ -1417,6 +2184,85 @@ def actualizar_electores(sender, instance=None, created=False, **kwargs):
         distrito.save(update_fields=['electores'])
 
 
+@receiver(post_save, sender=Mesa)
+def mover_mesa_en_totales_por_circuito(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Si la mesa cambia de circuito o de cantidad de electores, pasa lo que aportan sus
+    mesa-categorías escrutadas de los totales por circuito anteriores a los actuales.
+    """
+    if created or (update_fields is not None and not {'circuito', 'electores'} & set(update_fields)):
+        return
+    circuito_anterior_id = instance.tracker.previous('circuito')
+    electores_anterior = instance.tracker.previous('electores')
+    if (circuito_anterior_id, electores_anterior) == (instance.circuito_id, instance.electores):
+        return
+    escrutadas = MesaCategoria.objects.select_for_update().filter(
+        mesa=instance, carga_testigo__isnull=False
+    ).values_list('categoria_id', 'status', 'carga_testigo_id')
+    for categoria_id, status, carga_testigo_id in escrutadas:
+        MesaCategoria.sumar_a_totales_por_circuito(
+            circuito_anterior_id, electores_anterior, categoria_id, status, carga_testigo_id, signo=-1
+        )
+        MesaCategoria.sumar_a_totales_por_circuito(
+            instance.circuito_id, instance.electores, categoria_id, status, carga_testigo_id
+        )
+
+
+@receiver(pre_delete, sender=MesaCategoria)
+def descontar_mesa_categoria_de_totales_por_circuito(sender, instance, **kwargs):
+    # Al borrar la mesa se borran en cascada sus mesa-categorías.
+    MesaCategoria.descontar_de_totales_por_circuito(id=instance.id)
+
+
+@receiver(pre_delete, sender=Carga)
+def descontar_carga_testigo_de_totales_por_circuito(sender, instance, **kwargs):
+    # La mesa-categoría se queda sin carga testigo (on_delete=SET_NULL).
+    MesaCategoria.descontar_de_totales_por_circuito(carga_testigo_id=instance.id)
+
+
+@receiver(post_save, sender=Mesa)
+def sumar_mesa_al_resumen_de_fotos(sender, instance, created, **kwargs):
+    if created:
+        ResumenFotosSeccion.sumar(instance.distrito_id, instance.seccion_id, cant_mesas=1)
+
+
+@receiver(post_save, sender=MesaCategoria)
+def sumar_mesa_categoria_al_resumen_de_avance(sender, instance, created, **kwargs):
+    if created:
+        instance.actualizar_resumen_de_avance()
+
+
+@receiver(post_save, sender='adjuntos.Attachment')
+def actualizar_resumenes_por_fotos(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Cuando una foto cambia de mesa (al identificarse o al perder la identificación)
+    se actualizan los resúmenes de avance de la mesa anterior y de la nueva.
+    """
+    if update_fields is not None and 'mesa' not in update_fields:
+        return
+    mesa_anterior_id = None if created else instance.tracker.previous('mesa')
+    if mesa_anterior_id == instance.mesa_id:
+        return
+    if mesa_anterior_id is not None:
+        ResumenFotosSeccion.sumar_foto(mesa_anterior_id, signo=-1)
+    if instance.mesa_id is not None:
+        ResumenFotosSeccion.sumar_foto(instance.mesa_id)
+
+
+@receiver(post_save, sender=Circuito)
+def actualizar_geografia_circuito(sender, instance, created, **kwargs):
+    if not created and instance.tracker.has_changed('seccion'):
+        Mesa.sincronizar_geografia(Mesa.objects.filter(circuito=instance))
+
+
+@receiver(post_save, sender=Seccion)
+def actualizar_geografia_seccion(sender, instance, created, **kwargs):
+    if not created and (
+        instance.tracker.has_changed('distrito') or instance.tracker.has_changed('seccion_politica')
+    ):
+        Mesa.sincronizar_geografia(Mesa.objects.filter(circuito__seccion=instance))
+
+
 @receiver(post_save, sender=Categoria)
 def actualizar_prioridades_categoria(sender, instance, created, **kwargs):
     from scheduling.models import registrar_prioridad_categoria
@@ -1438,6 +2284,35 @@ def actualizar_prioridades_seccion(sender, instance, created, **kwargs):
         MesaCategoria.recalcular_coeficiente_para_orden_de_carga_para_seccion(instance)
 
 
+@receiver(post_save, sender=TecnicaProyeccion)
+@receiver(post_save, sender=AgrupacionCircuitos)
+@receiver(post_save, sender=AgrupacionCircuito)
+@receiver(post_save, sender=ConfiguracionComputo)
+@receiver(post_save, sender=ConfiguracionComputoDistrito)
+@receiver(post_delete, sender=TecnicaProyeccion)
+@receiver(post_delete, sender=AgrupacionCircuitos)
+@receiver(post_delete, sender=AgrupacionCircuito)
+@receiver(post_delete, sender=ConfiguracionComputo)
+@receiver(post_delete, sender=ConfiguracionComputoDistrito)
+def invalidar_resultados_por_configuracion(sender, **kwargs):
+    """
+    Los resultados cacheados dependen de las proyecciones y configuraciones de cómputo.
+    """
+    Epoca.avanzar(Epoca.CONSOLIDACION)
+
+
+@receiver(post_save, sender=Mesa)
+@receiver(post_delete, sender=Mesa)
+def invalidar_resultados_por_mesa(sender, instance, created=False, **kwargs):
+    """
+    Los resultados dependen de los electores y del circuito de cada mesa: las altas, las bajas
+    y los cambios de esos datos invalidan lo cacheado.
+    """
+    if kwargs['signal'] is post_save and not created and not instance.tracker.changed():
+        return
+    Epoca.avanzar(Epoca.CONSOLIDACION)
+
+
 @receiver(pre_save, sender=Distrito)
 @receiver(pre_save, sender=Seccion)
 @receiver(pre_save, sender=Circuito)
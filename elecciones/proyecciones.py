@@ -1,5 +1,9 @@
-from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from django.conf import settings
+from django.db import connections
 from django.db.models import Q, F, Sum, Subquery, OuterRef, Count
+from .memoizacion import memoizar
 from .models import (
     Categoria,
     Mesa,
@@ -60,6 +64,9 @@ class Proyecciones(Sumarizador):
         self.cache_cant_mesas_totales_por_agrupacion = None
         self.cache_cant_mesas_escrutadas_por_agrupacion = None
 
+    def parametros_de_computo(self):
+        return super().parametros_de_computo() + (self.tecnica.id, )
+
     def circuito_subquery(self, id_agrupacion):
         """
         Construye un subquery que permite filtrar mesas por id_agrupacion
@@ -119,7 +126,7 @@ class Proyecciones(Sumarizador):
         # return self.total_electores(id_agrupacion) / self.electores_en    _mesas_escrutadas(id_agrupacion)
         return self.total_mesas(id_agrupacion) / self.cant_mesas_escrutadas(id_agrupacion)
 
-    @lru_cache(128)
+    @memoizar()
     def agrupaciones_no_consideradas(self):
         """
         Devuelve la lista de agrupaciones que fueron descartadas por no tener el mínimo de mesas exigido.
@@ -227,52 +234,54 @@ class Proyecciones(Sumarizador):
         correspondientes a agrupaciones que llegaron al mínimo de mesas requerido.
         """
 
+        if self.usa_totales_por_circuito():
+            votos = self.votos_por_circuito(categoria)
+            circuito_lookup = 'circuito__agrupaciones'
+        else:
+            votos = self.votos_reportados(categoria, mesas)
+            circuito_lookup = 'carga__mesa_categoria__mesa__circuito__agrupaciones'
+
         agrupaciones_subquery = AgrupacionCircuitos.objects.filter(
             id__in=self.agrupaciones_a_considerar()
-        ).filter(id__in=(OuterRef('carga__mesa_categoria__mesa__circuito__agrupaciones'))
+        ).filter(id__in=(OuterRef(circuito_lookup))
                  ).values_list('id', flat=True)
 
-        return self.votos_reportados(categoria, mesas).values_list('opcion__id').annotate(
+        return votos.values_list('opcion__id').annotate(
             id_agrupacion=Subquery(agrupaciones_subquery)
         ).exclude(id_agrupacion__isnull=True).annotate(
             sum_votos=Sum('votos')
         ).values_list('opcion__id', 'id_agrupacion', 'sum_votos')
 
-    def votos_por_agrupacion(self, votos_a_procesar):
+    def agrupar_votos(self, votos_a_procesar):
         """
-        Dada una lista de tuplas (id_opcion, id_agrupacion, sum_votos) los agrupa en un dictionary
-        con key id_agrupacion y value = lista de tuplas (id_opcion, sum_votos)
+        Proyecta los votos de todas las agrupaciones de una vez: arma una matriz
+        (agrupaciones x opciones) con los votos escrutados y la multiplica por el vector de
+        coeficientes de proyección de cada agrupación. Cada celda se redondea antes de sumar
+        por opción, igual que si se proyectara agrupación por agrupación.
         """
-        votos_por_agrupacion = {}
-        for id_opcion, id_agrupacion, sum_votos in votos_a_procesar:
-            votos_por_agrupacion.setdefault(id_agrupacion, []).append((id_opcion, sum_votos))
-
-        return votos_por_agrupacion
+        votos_a_procesar = [
+            (id_opcion, id_agrupacion, sum_votos or 0)
+            for id_opcion, id_agrupacion, sum_votos in votos_a_procesar
+        ]
+        if not votos_a_procesar:
+            return {}, {}
 
-    def agrupar_votos(self, votos_a_procesar):
-        coeficientes = self.coeficientes_para_proyeccion()
-        votos_positivos_proyectados = {}
-        votos_no_positivos_proyectados = {}
+        id_opciones, id_agrupaciones, votos = (np.array(columna) for columna in zip(*votos_a_procesar))
+        opciones, indice_opcion = np.unique(id_opciones, return_inverse=True)
+        agrupaciones, indice_agrupacion = np.unique(id_agrupaciones, return_inverse=True)
 
-        for id_agrupacion, votos_de_agrupacion in self.votos_por_agrupacion(votos_a_procesar).items():
-            votos_positivos, votos_no_positivos = super().agrupar_votos(votos_de_agrupacion)
+        matriz_votos = np.zeros((len(agrupaciones), len(opciones)))
+        np.add.at(matriz_votos, (indice_agrupacion, indice_opcion), votos)
 
-            # Votos positivos
-            for partido, votos_por_opcion in votos_positivos.items():
-                votos_partido = votos_positivos_proyectados.setdefault(partido, {})
-                for opcion, votos in votos_por_opcion.items():
-                    votos_partido[opcion] = (
-                        votos_partido.setdefault(opcion, 0) + round(votos * coeficientes[id_agrupacion])
-                    )
+        coeficientes = self.coeficientes_para_proyeccion()
+        vector_coeficientes = np.array([coeficientes[id_agrupacion] for id_agrupacion in agrupaciones])
 
-            # Votos no positivos[opcion.nombre] = sum_votos if sum_votos else 0
-            for nombre_opcion, votos in votos_no_positivos.items():
-                votos_no_positivos_proyectados[nombre_opcion] = (
-                    votos_no_positivos_proyectados.setdefault(nombre_opcion, 0) +
-                    round(votos * coeficientes[id_agrupacion])
-                )
+        votos_proyectados = np.rint(matriz_votos * vector_coeficientes[:, np.newaxis]).sum(axis=0)
 
-        return votos_positivos_proyectados, votos_no_positivos_proyectados
+        return super().agrupar_votos(
+            (int(id_opcion), int(votos_opcion))
+            for id_opcion, votos_opcion in zip(opciones, votos_proyectados)
+        )
 
     def calcular(self, categoria, mesas):
         """
@@ -295,6 +304,9 @@ class SumarizadorCombinado():
     def __init__(self, configuracion):
         self.configuracion = configuracion
 
+    def parametros_de_computo(self):
+        return (type(self).__name__, self.configuracion.id)
+
     @property
     def filtros(self):
         """
@@ -308,11 +320,44 @@ class SumarizadorCombinado():
         """
         return Mesa.objects.filter(categorias=categoria).distinct()
 
+    def configuraciones_distrito(self):
+        return list(self.configuracion.configuraciones.select_related('distrito', 'proyeccion'))
+
+    def resultados_de_distrito(self, configuracion_distrito, categoria):
+        return create_sumarizador(configuracion_distrito=configuracion_distrito).get_resultados(categoria)
+
+    def resultados_de_distrito_en_hilo(self, configuracion_distrito, categoria):
+        """
+        Calcula los resultados de un distrito desde un hilo del pool. Django abre las conexiones
+        por hilo, así que hay que cerrarlas al terminar para no dejarlas colgadas.
+        """
+        try:
+            return self.resultados_de_distrito(configuracion_distrito, categoria)
+        finally:
+            connections.close_all()
+
     def get_resultados(self, categoria):
-        return sum((
-            create_sumarizador(configuracion_distrito=configuracion_distrito).get_resultados(categoria)
-            for configuracion_distrito in self.configuracion.configuraciones.all()
-        ), ResultadoCombinado())
+        """
+        Suma los resultados de cada distrito según su configuración. Si hay hilos configurados,
+        los distritos se calculan en paralelo y la demora total es la del distrito más lento.
+        """
+        configuraciones = self.configuraciones_distrito()
+        hilos = min(settings.HILOS_SUMARIZADOR_COMBINADO, len(configuraciones))
+        if hilos > 1:
+            with ThreadPoolExecutor(max_workers=hilos) as pool:
+                resultados = list(pool.map(
+                    lambda configuracion_distrito: self.resultados_de_distrito_en_hilo(
+                        configuracion_distrito, categoria
+                    ),
+                    configuraciones
+                ))
+        else:
+            resultados = [
+                self.resultados_de_distrito(configuracion_distrito, categoria)
+                for configuracion_distrito in configuraciones
+            ]
+        # Se suman en el orden de las configuraciones, igual que en el cálculo secuencial.
+        return sum(resultados, ResultadoCombinado())
 
     def categorias(self):
         return Categoria.objects.filter(distrito__isnull=True, activa=True)
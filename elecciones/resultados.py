@@ -1,7 +1,7 @@
 from django.conf import settings
-from functools import lru_cache
 from attrdict import AttrDict
 from collections import OrderedDict
+from .memoizacion import memoizar
 from .models import (
     Opcion,
     OPCIONES_A_CONSIDERAR,
@@ -45,7 +45,7 @@ class ResultadosBase():
     def __str__(self):
         return f"Resultados: ({self.tabla_positivos()}, {self.tabla_no_positivos()})"
 
-    @lru_cache(128)
+    @memoizar()
     def tabla_positivos(self):
         """
         Devuelve toda la información sobre los votos positivos para mostrar.
@@ -87,7 +87,7 @@ class ResultadosBase():
             sorted(votos_positivos.items(), key=lambda partido: float(partido[1]["votos"]), reverse=True)
         )
 
-    @lru_cache(128)
+    @memoizar()
     def tabla_no_positivos(self):
         """
         Devuelve un diccionario con la cantidad de votos para cada una de las opciones no positivas.
@@ -111,7 +111,7 @@ class ResultadosBase():
 
         return tabla_no_positivos
 
-    @lru_cache(128)
+    @memoizar()
     def votantes(self):
         """
         Total de personas que votaron.
@@ -172,7 +172,7 @@ class Resultados(ResultadosBase):
         super().__init__(resultados)
         self.opciones_a_considerar = opciones_a_considerar
 
-    @lru_cache(128)
+    @memoizar()
     def total_positivos(self):
         """
         Devuelve el total de votos positivos, sumando los votos de cada una de las opciones de cada partido
@@ -194,7 +194,7 @@ class Resultados(ResultadosBase):
 
         return total_positivos
 
-    @lru_cache(128)
+    @memoizar()
     def total_no_positivos(self):
         """
         Devuelve el total de votos no positivos, sumando los votos a cada opción no partidaria
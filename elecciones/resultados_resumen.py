@@ -1,9 +1,9 @@
-from django.db.models import Count
-
-from functools import reduce
+from django.db.models import Sum
 
 from escrutinio_social import settings
-from elecciones.models import Mesa, MesaCategoria, Seccion, Distrito, Categoria
+from elecciones.models import (
+    MesaCategoria, Seccion, Distrito, Categoria, ResumenAvanceCarga, ResumenFotosSeccion
+)
 from adjuntos.models import Attachment, PreIdentificacion
 
 
@@ -32,10 +32,10 @@ class RestriccionPorDistrito():
         return 'Distrito-' + str(self.distrito_id)
 
     def aplicar_restriccion_mesas(self, query):
-        return query.filter(circuito__seccion__distrito__id=self.distrito_id)
+        return query.filter(distrito_id=self.distrito_id)
 
     def aplicar_restriccion_mesacats(self, query):
-        return query.filter(mesa__circuito__seccion__distrito__id=self.distrito_id)
+        return query.filter(distrito_id=self.distrito_id)
 
     def aplicar_restriccion_preidentificaciones(self, query):
         return query.filter(distrito__id=self.distrito_id)
@@ -60,10 +60,10 @@ class RestriccionPorSeccion():
         return 'Seccion-' + str(self.seccion_id)
 
     def aplicar_restriccion_mesas(self, query):
-        return query.filter(circuito__seccion__id=self.seccion_id)
+        return query.filter(seccion_id=self.seccion_id)
 
     def aplicar_restriccion_mesacats(self, query):
-        return query.filter(mesa__circuito__seccion__id=self.seccion_id)
+        return query.filter(seccion_id=self.seccion_id)
 
     def aplicar_restriccion_preidentificaciones(self, query):
         return query.filter(seccion__id=self.seccion_id)
@@ -83,20 +83,20 @@ class GeneradorDatosFotos():
 
     def calcular(self):
         if (self.cantidad_mesas == None):
-            self.cantidad_mesas = self.query_inicial_mesas().count()
-            self.mesas_con_foto_identificada = self.query_inicial_mesas().exclude(attachments=None).count()
-            # self.mesas_con_carga_sin_foto = self.query_inicial_mesas().filter(attachments=None).exclude(mesacategoria__cargas=None).count()
-            self.mesas_con_carga_sin_foto = self.query_inicial_mesacats().exclude(
-                cargas=None).filter(mesa__attachments=None).values('mesa__id').distinct().count()
+            totales = self.query_inicial_resumen().aggregate(
+                cantidad_mesas=Sum('cant_mesas'),
+                mesas_con_foto_identificada=Sum('mesas_con_foto_identificada'),
+                mesas_con_carga_sin_foto=Sum('mesas_con_carga_sin_foto'),
+            )
+            self.cantidad_mesas = totales['cantidad_mesas'] or 0
+            self.mesas_con_foto_identificada = totales['mesas_con_foto_identificada'] or 0
+            self.mesas_con_carga_sin_foto = totales['mesas_con_carga_sin_foto'] or 0
             self.mesas_activas = self.mesas_con_foto_identificada + self.mesas_con_carga_sin_foto
 
 
 class GeneradorDatosFotosNacional(GeneradorDatosFotos):
-    def query_inicial_mesas(self):
-        return Mesa.objects
-
-    def query_inicial_mesacats(self):
-        return MesaCategoria.objects
+    def query_inicial_resumen(self):
+        return ResumenFotosSeccion.objects
 
     def calcular(self):
         super().calcular()
@@ -117,11 +117,8 @@ class GeneradorDatosFotosDistrital(GeneradorDatosFotos):
         super().__init__()
         self.distrito = distrito
 
-    def query_inicial_mesas(self):
-        return Mesa.objects.filter(circuito__seccion__distrito__numero=self.distrito)
-
-    def query_inicial_mesacats(self):
-        return MesaCategoria.objects.filter(mesa__circuito__seccion__distrito__numero=self.distrito)
+    def query_inicial_resumen(self):
+        return ResumenFotosSeccion.objects.filter(distrito__numero=self.distrito)
 
 
 class GeneradorDatosFotosConRestriccion(GeneradorDatosFotos):
@@ -129,11 +126,8 @@ class GeneradorDatosFotosConRestriccion(GeneradorDatosFotos):
         super().__init__()
         self.restriccion = restriccion
 
-    def query_inicial_mesas(self):
-        return self.restriccion.aplicar_restriccion_mesas(Mesa.objects)
-
-    def query_inicial_mesacats(self):
-        return self.restriccion.aplicar_restriccion_mesacats(MesaCategoria.objects)
+    def query_inicial_resumen(self):
+        return self.restriccion.aplicar_restriccion_mesas(ResumenFotosSeccion.objects)
 
 
 class NoGeneradorDatosFotos():
@@ -201,27 +195,31 @@ class GeneradorDatosFotosConsolidado():
 
 
 
+def mesas_con_foto_agrupadas(resumen, campo_nombre):
+    """
+    Mesas con foto identificada de cada grupo (distrito o sección) del resumen, en una sola
+    consulta agrupada. Se omiten los grupos sin mesas con foto.
+    """
+    return resumen.exclude(**{campo_nombre: None}).values(campo_nombre).annotate(
+        cantidad=Sum('mesas_con_foto_identificada')
+    ).filter(cantidad__gt=0).values_list(campo_nombre, 'cantidad').order_by()
+
+
 class GeneradorDatosFotosPorDistrito():
     def __init__(self):
         self.data = None
 
     def calcular(self):
         if self.data == None:
-            raw_data = Mesa.objects.exclude(attachments=None).values('circuito__seccion__distrito__nombre').annotate(
-                cant_por_distrito=Count('circuito__seccion__distrito__nombre'))
-            sorted_data = sorted(raw_data, key=lambda elem: elem['cant_por_distrito'] * (-1))
-            final_data = [{
-                'nombre': datum['circuito__seccion__distrito__nombre'], 
-                'cantidad': datum['cant_por_distrito']} 
-            for datum in sorted_data]
-            self.data = final_data
+            raw_data = mesas_con_foto_agrupadas(ResumenFotosSeccion.objects, 'distrito__nombre')
+            sorted_data = sorted(raw_data, key=lambda elem: elem[1] * (-1))
+            self.data = [{'nombre': nombre, 'cantidad': cantidad} for nombre, cantidad in sorted_data]
 
     def datos(self):
         self.calcular()
         return self.data
 
 
-
 class GeneradorDatosFotosDistritoPorSeccion():
     def __init__(self, distrito):
         super().__init__()
@@ -230,22 +228,17 @@ class GeneradorDatosFotosDistritoPorSeccion():
 
     def calcular(self):
         if self.data == None:
-            raw_data = Mesa.objects.filter(circuito__seccion__distrito__numero=self.distrito).exclude(
-                attachments=None).values('circuito__seccion__nombre').annotate(
-                cant_por_seccion=Count('circuito__seccion__nombre'))
-            sorted_data = sorted(raw_data, key=lambda elem: elem['circuito__seccion__nombre'])
-            final_data = [{
-                'nombre': datum['circuito__seccion__nombre'], 
-                'cantidad': datum['cant_por_seccion']} 
-            for datum in sorted_data]
-            self.data = final_data
+            raw_data = mesas_con_foto_agrupadas(
+                ResumenFotosSeccion.objects.filter(distrito__numero=self.distrito), 'seccion__nombre'
+            )
+            sorted_data = sorted(raw_data, key=lambda elem: elem[0])
+            self.data = [{'nombre': nombre, 'cantidad': cantidad} for nombre, cantidad in sorted_data]
 
     def datos(self):
         self.calcular()
         return self.data
 
 
-
 class GeneradorDatosPreidentificaciones():
     def __init__(self, query_inicial=PreIdentificacion.objects):
         self.cantidad_total = None
@@ -308,22 +301,19 @@ class GeneradorDatosCarga():
 
     def calcular(self):
         if (self.dato_total == None):
-            self.dato_total = self.crear_dato(self.query_inicial)
-            self.dato_carga_confirmada = self.crear_dato(self.restringir_por_statuses(self.statuses_carga_confirmada()))
-            self.dato_carga_csv = self.crear_dato(self.restringir_por_statuses(self.statuses_carga_csv()))
-            self.dato_carga_en_proceso = self.crear_dato(self.restringir_por_statuses(self.statuses_carga_en_proceso()))
-            self.dato_carga_sin_carga = self.crear_dato(self.restringir_por_statuses(self.statuses_sin_carga()))
-            self.dato_carga_con_problemas=self.crear_dato(self.restringir_por_statuses(self.statuses_con_problemas()))
-            
-    def restringir_por_statuses(self, statuses):
-        if len(statuses) == 0:
-            return self.query_inicial
-
-        queries_por_status = [self.query_inicial.filter(status=status) for status in statuses]
-        return reduce(lambda x,y: x | y, queries_por_status)
-
-    def crear_dato(self, query):
-        return query.count()
+            # Un solo query al resumen: cantidad de mesas por status.
+            self.mesas_por_status = dict(
+                self.query_inicial.values_list('status').annotate(cant_mesas=Sum('cant_mesas')).order_by()
+            )
+            self.dato_total = sum(self.mesas_por_status.values())
+            self.dato_carga_confirmada = self.contar(self.statuses_carga_confirmada())
+            self.dato_carga_csv = self.contar(self.statuses_carga_csv())
+            self.dato_carga_en_proceso = self.contar(self.statuses_carga_en_proceso())
+            self.dato_carga_sin_carga = self.contar(self.statuses_sin_carga())
+            self.dato_carga_con_problemas = self.contar(self.statuses_con_problemas())
+
+    def contar(self, statuses):
+        return sum(self.mesas_por_status.get(status, 0) for status in statuses)
 
     def statuses_con_problemas(self):
         return [MesaCategoria.STATUS.con_problemas]
@@ -385,7 +375,7 @@ class GeneradorDatosCargaTotal(GeneradorDatosCarga):
 class GeneradorDatosCargaConsolidado():
     def __init__(self, restriccion, categoria):
         super().__init__()
-        self.query_base = MesaCategoria.objects
+        self.query_base = ResumenAvanceCarga.objects
         self.restriccion = restriccion
         self.categoria = categoria
         self.crear_categorias()
@@ -396,6 +386,9 @@ class GeneradorDatosCargaConsolidado():
     def set_query_base(self, query):
         self.query_base = query
         self.crear_categorias()
+
+    def solo_mesas_con_fotos(self):
+        self.set_query_base(ResumenAvanceCarga.objects.filter(con_fotos=True))
         
     def calcular(self):
         self.pv.calcular()
@@ -457,12 +450,12 @@ class GeneradorDatosCargaParcialDiscriminada():
         self.discriminador = discriminador
 
     def query_inicial(self):
-        print(self.categoria)
-        return self.restringir_por_statuses(MesaCategoria.objects.filter(categoria__slug=self.categoria))
+        return ResumenAvanceCarga.objects.filter(categoria__slug=self.categoria, status__in=self.statuses)
 
     def calcular(self):
         if self.data == None:
-            raw_data = self.query_inicial().values(self.discriminador).annotate(cant_discriminada=Count(self.discriminador))
+            raw_data = self.query_inicial().values(self.discriminador).annotate(
+                cant_discriminada=Sum('cant_mesas')).order_by()
             sorted_data = sorted(raw_data, key=lambda elem: elem['cant_discriminada'] * (-1))
             final_data = [{
                 'nombre': datum[self.discriminador],
@@ -474,12 +467,6 @@ class GeneradorDatosCargaParcialDiscriminada():
         self.calcular()
         return self.data
 
-    def restringir_por_statuses(self, query):
-        if len(self.statuses) == 0:
-            return query
-        queries_por_status = [query.filter(status=status) for status in self.statuses]
-        return reduce(lambda x, y: x | y, queries_por_status)
-
     def para_carga_confirmada(self):
         self.statuses = [
                 MesaCategoria.STATUS.parcial_consolidada_dc,
@@ -1,6 +1,6 @@
-from functools import lru_cache
 from attrdict import AttrDict
 from django.db.models import Q, Sum, Subquery
+from .memoizacion import memoizar
 from .models import (
     Distrito,
     SeccionPolitica,
@@ -8,6 +8,8 @@ from .models import (
     Circuito,
     Opcion,
     VotoMesaReportado,
+    VotosCircuito,
+    MesasEscrutadasCircuito,
     LugarVotacion,
     Categoria,
     MesaCategoria,
@@ -60,7 +62,19 @@ class Sumarizador():
 
         self.cache_opciones = None
 
-    @lru_cache(128)
+    def parametros_de_computo(self):
+        """
+        Parámetros que determinan el resultado del cómputo, para identificarlo en el cache.
+        """
+        return (
+            type(self).__name__,
+            self.tipo_de_agregacion,
+            self.opciones_a_considerar,
+            self.nivel_de_agregacion,
+            tuple(sorted(str(id) for id in self.ids_a_considerar or [])),
+        )
+
+    @memoizar()
     def cargas_a_considerar_status_filter(self, categoria, prefix='carga__mesa_categoria__'):
         """
         Esta función devuelve los filtros que indican qué cargas se consideran para hacer el
@@ -116,16 +130,20 @@ class Sumarizador():
             return modelo.objects.filter(id__in=self.ids_a_considerar)
 
     def lookups_de_mesas(self, prefix=""):
+        """
+        Lookups para filtrar mesas. Distrito, sección y sección política
+        están denormalizados en la mesa, así que se filtran sin joins.
+        """
         lookups = dict()
         if self.filtros:
             if self.filtros.model is Distrito:
-                lookups[f'{prefix}circuito__seccion__distrito__in'] = self.filtros
+                lookups[f'{prefix}distrito__in'] = self.filtros
 
             if self.filtros.model is SeccionPolitica:
-                lookups[f'{prefix}circuito__seccion__seccion_politica__in'] = self.filtros
+                lookups[f'{prefix}seccion_politica__in'] = self.filtros
 
             elif self.filtros.model is Seccion:
-                lookups[f'{prefix}circuito__seccion__in'] = self.filtros
+                lookups[f'{prefix}seccion__in'] = self.filtros
 
             elif self.filtros.model is Circuito:
                 lookups[f'{prefix}circuito__in'] = self.filtros
@@ -137,6 +155,34 @@ class Sumarizador():
                 lookups[f'{prefix}id__in'] = self.filtros
         return lookups
 
+    def lookups_de_circuitos(self, prefix=""):
+        """
+        Lookups para filtrar los totales pre-agregados por circuito.
+        Sólo tiene sentido si ``usa_totales_por_circuito()``.
+        """
+        lookups = dict()
+        if self.filtros:
+            if self.filtros.model is Distrito:
+                lookups[f'{prefix}circuito__seccion__distrito__in'] = self.filtros
+
+            elif self.filtros.model is SeccionPolitica:
+                lookups[f'{prefix}circuito__seccion__seccion_politica__in'] = self.filtros
+
+            elif self.filtros.model is Seccion:
+                lookups[f'{prefix}circuito__seccion__in'] = self.filtros
+
+            elif self.filtros.model is Circuito:
+                lookups[f'{prefix}circuito__in'] = self.filtros
+        return lookups
+
+    def usa_totales_por_circuito(self):
+        """
+        Indica si el cómputo puede hacerse a partir de los totales pre-agregados por circuito
+        (``VotosCircuito`` y ``MesasEscrutadasCircuito``), lo que es posible siempre que el nivel
+        de agregación no sea más fino que el circuito.
+        """
+        return not self.filtros or self.filtros.model in (Distrito, SeccionPolitica, Seccion, Circuito)
+
     def categorias(self):
         """
         Devuelve la lista de categorías posibles de acuerdo al model recibido.
@@ -184,7 +230,7 @@ class Sumarizador():
 
         return Categoria.objects.filter(lookups, activa=True)
 
-    @lru_cache(128)
+    @memoizar()
     def mesas(self, categoria):
         """
         Considerando los filtros posibles, devuelve el conjunto de mesas
@@ -204,7 +250,25 @@ class Sumarizador():
             **self.cargas_a_considerar_status_filter(self.categoria, 'mesacategoria__')
         ).distinct()
 
-    @lru_cache(128)
+    def totales_mesas_escrutadas(self):
+        """
+        Devuelve la cantidad de mesas escrutadas y la cantidad de electores en ellas.
+        """
+        if not self.usa_totales_por_circuito():
+            mesas_escrutadas = self.mesas_escrutadas()
+            return (
+                mesas_escrutadas.count(),
+                mesas_escrutadas.aggregate(v=Sum('electores'))['v'] or 0
+            )
+
+        totales = MesasEscrutadasCircuito.objects.filter(
+            categoria=self.categoria,
+            **self.cargas_a_considerar_status_filter(self.categoria, ''),
+            **self.lookups_de_circuitos()
+        ).aggregate(cant_mesas=Sum('cant_mesas'), electores=Sum('electores'))
+        return totales['cant_mesas'] or 0, totales['electores'] or 0
+
+    @memoizar()
     def electores(self, categoria):
         """
         Devuelve el número de electores para :meth:`~.mesas`
@@ -230,6 +294,17 @@ class Sumarizador():
 
         return votos_reportados
 
+    def votos_por_circuito(self, categoria):
+        """
+        Equivalente a ``votos_reportados``, pero a partir de los totales pre-agregados por circuito.
+        """
+        return VotosCircuito.objects.filter(
+            categoria=categoria,
+            opcion__in=self.opciones(),
+            **self.cargas_a_considerar_status_filter(categoria, ''),
+            **self.lookups_de_circuitos()
+        )
+
     def opciones_dict(self):
         if self.cache_opciones is None:
             self.cache_opciones = {
@@ -274,6 +349,34 @@ class Sumarizador():
             "carga__mesa_categoria__mesa__numero"
         )
 
+    def votos_csv_export_categorias(self, categorias):
+        """
+        Como `votos_csv_export`, pero para varias categorías en una sola consulta.
+        Agrega el slug de la categoría después del número de mesa, y garantiza que
+        los votos de cada mesa y categoría vengan contiguos.
+        """
+        return VotoMesaReportado.objects.filter(
+            carga__mesa_categoria__categoria__in=categorias,
+            carga__es_testigo__isnull=False,
+            **self.cargas_a_considerar_status_filter(None),
+            **self.lookups_de_mesas("carga__mesa_categoria__mesa__")
+        ).values_list(
+            'carga__mesa_categoria__distrito__numero',
+            'carga__mesa_categoria__seccion__numero',
+            'carga__mesa_categoria__mesa__circuito__numero',
+            'carga__mesa_categoria__mesa__numero',
+            'carga__mesa_categoria__categoria__slug',
+            'opcion__codigo',
+            'votos',
+        ).order_by(
+            'carga__mesa_categoria__distrito__numero',
+            'carga__mesa_categoria__seccion__numero',
+            'carga__mesa_categoria__mesa__circuito__numero',
+            'carga__mesa_categoria__mesa__numero',
+            'carga__mesa_categoria__mesa_id',
+            'carga__mesa_categoria__categoria_id',
+        )
+
     def votos_por_opcion(self, categoria, mesas):
         """
         Dada una categoría y un conjunto de mesas, devuelve una tabla de resultados con la cantidad de
@@ -281,9 +384,14 @@ class Sumarizador():
         """
 
         # Obtener los votos reportados
-        votos_reportados = self.votos_reportados(categoria, mesas).values_list('opcion__id').annotate(
-            sum_votos=Sum('votos')
-        )
+        if self.usa_totales_por_circuito():
+            votos_reportados = self.votos_por_circuito(categoria).values_list('opcion__id').annotate(
+                sum_votos=Sum('votos')
+            )
+        else:
+            votos_reportados = self.votos_reportados(categoria, mesas).values_list('opcion__id').annotate(
+                sum_votos=Sum('votos')
+            )
 
         # Diccionario inicial, opciones completas, todas en 0 (por si alguna opción no viene reportada).
         votos_por_opcion = {opcion.id: 0 for opcion in self.opciones()}
@@ -324,13 +432,11 @@ class Sumarizador():
         # 1) Mesas.
         # Me quedo con las mesas que corresponden de acuerdo a los parámetros
         # y la categoría, que tengan la carga testigo para esa categoría.
-        mesas_escrutadas = self.mesas_escrutadas()
-        total_mesas_escrutadas = mesas_escrutadas.count()
+        total_mesas_escrutadas, electores_en_mesas_escrutadas = self.totales_mesas_escrutadas()
         total_mesas = mesas.count()
 
         # 2) Electores.
         electores = mesas.filter(categorias=categoria).aggregate(v=Sum('electores'))['v'] or 0
-        electores_en_mesas_escrutadas = mesas_escrutadas.aggregate(v=Sum('electores'))['v'] or 0
 
         # 3) Votos
         votos_por_opcion = self.votos_por_opcion(categoria, mesas)
@@ -345,7 +451,7 @@ class Sumarizador():
             "votos_no_positivos": votos_no_positivos,
         })
 
-    @lru_cache(128)
+    @memoizar()
     def get_resultados(self, categoria):
         """
         Realiza la contabilidad para la categoría, invocando al método ``calcular``.
@@ -468,3 +468,16 @@ def test_avance_de_carga_mesas_con_varias_fotos(db, settings):
     identificar(attachs[10], mesas_1[2], fiscal_1)
     identificar(attachs[10], mesas_1[2], fiscal_2)
     consumir_novedades_identificacion()
+
+
+def test_avance_de_carga_en_un_solo_query(db, django_assert_num_queries):
+    pv = nueva_categoria(["a1", "a2"], ["b1"])
+    seccion, circuito, lugar_votacion = crear_seccion("Luján este")
+    crear_mesas([lugar_votacion], [pv], 3)
+
+    # Un query para las preidentificaciones y otro para todos los datos de las mesas.
+    with django_assert_num_queries(2):
+        resultados = AvanceDeCarga(NIVELES_DE_AGREGACION.seccion, [seccion.id]).get_resultados(pv)
+    verificar_resultado(resultados.total(), 3, 300, 100, 100)
+    verificar_resultado(resultados.sin_identificar_sin_cargas(), 3, 300, 100, 100)
+    verificar_resultado(resultados.sin_cargar(), 0, 0, 0, 0)
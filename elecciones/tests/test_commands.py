@@ -1,8 +1,14 @@
-from elecciones.tests.factories import CategoriaFactory
-from elecciones.models import Opcion
+import csv
+import gzip
+
+from elecciones.tests.factories import CargaFactory, CategoriaFactory, OpcionFactory
+from elecciones.models import Carga, Opcion, TIPOS_DE_AGREGACIONES
 from django.conf import settings
 from django.core.management import call_command
 
+from .test_models import consumir_novedades_y_actualizar_objetos
+from .utils import cargar_votos
+
 
 def test_setup_opciones(db):
     assert not Opcion.objects.exists()
@@ -16,3 +22,41 @@ def test_setup_opciones(db):
     assert Opcion.objects.get(**settings.OPCION_ID_IMPUGNADA)
     assert Opcion.objects.get(**settings.OPCION_COMANDO_ELECTORAL)
     assert c.opciones.count() == 7
+
+
+def test_exportar_csv_ancho_comprimido_varias_categorias(carta_marina, tmp_path):
+    m1, m2, *_ = carta_marina
+    a = OpcionFactory(nombre='A', codigo='1')
+    b = OpcionFactory(nombre='B', codigo='2')
+    diputados = CategoriaFactory(nombre='diputados', opciones=[a, b])
+    senadores = CategoriaFactory(nombre='senadores', opciones=[b])
+    blanco = Opcion.blancos()
+
+    for mesa, categoria, votos in [
+        (m1, diputados, {a: 10, b: 20, blanco: 1}),
+        (m1, senadores, {b: 25}),
+        (m2, diputados, {a: 30}),
+    ]:
+        carga = CargaFactory(
+            mesa_categoria__mesa=mesa, mesa_categoria__categoria=categoria, tipo=Carga.TIPOS.parcial
+        )
+        cargar_votos(carga, votos)
+    consumir_novedades_y_actualizar_objetos()
+
+    archivo = tmp_path / 'votos.csv.gz'
+    call_command(
+        'exportar_csv', '--categoria', 'diputados', 'senadores', '--formato', 'ancho',
+        '--file', str(archivo), '--tipo_de_agregacion', TIPOS_DE_AGREGACIONES.todas_las_cargas,
+    )
+
+    with gzip.open(archivo, 'rt') as f:
+        encabezado, *filas = list(csv.reader(f))
+    codigos = encabezado[5:]
+    # Las opciones de ambas categorías, sin repetir.
+    assert codigos[:2] == ['1', '2'] and codigos.count('2') == 1
+    filas = {(fila[3], fila[4]): dict(zip(codigos, fila[5:])) for fila in filas}
+    assert len(filas) == 3
+    assert filas[(str(m1.numero), 'diputados')]['1'] == '10'
+    assert filas[(str(m1.numero), 'diputados')][blanco.codigo] == '1'
+    assert filas[(str(m1.numero), 'senadores')]['2'] == '25'
+    assert filas[(str(m2.numero), 'diputados')]['2'] == ''
@@ -9,6 +9,7 @@ from elecciones.models import (
     TIPOS_DE_AGREGACIONES,
     OPCIONES_A_CONSIDERAR,
 )
+from elecciones.proyecciones import SumarizadorCombinado
 from .factories import (
     MesaCategoriaFactory,
     CargaFactory,
@@ -142,3 +143,42 @@ def test_configuracion_combinada(db, fiscal_client, url_resultados_computo):
 
     # Todos los positivos suman 100
     assert sum(float(v['porcentaje_positivos']) for v in positivos.values()) == 100.0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_configuracion_combinada_en_paralelo(settings):
+    # Los hilos usan sus propias conexiones, así que los datos tienen que estar commiteados.
+    settings.HILOS_SUMARIZADOR_COMBINADO = 2
+
+    Distrito.objects.all().delete()
+    mesas = create_carta_marina(create_distritos=3)
+    categoria = Categoria.objects.first()
+    for mesa in mesas:
+        MesaCategoriaFactory(mesa=mesa, categoria=categoria)
+
+    o1, o2, *_ = categoria.opciones.filter(partido__isnull=False)
+    blancos = Opcion.blancos()
+    nulos = Opcion.nulos()
+    total = Opcion.total_votos()
+
+    configuracion_combinada = ConfiguracionComputoFactory()
+    for distrito in Distrito.objects.all():
+        mc, *_ = MesaCategoria.objects.filter(mesa__lugar_votacion__circuito__seccion__distrito=distrito)
+        carga = CargaFactory(mesa_categoria=mc, tipo=Carga.TIPOS.total)
+        cargar_votos(carga, {o1: 60, o2: 30, blancos: 10, nulos: 0, total: 100})
+        ConfiguracionComputoDistritoFactory(
+            configuracion=configuracion_combinada,
+            distrito=distrito,
+            agregacion=TIPOS_DE_AGREGACIONES.todas_las_cargas,
+            opciones=OPCIONES_A_CONSIDERAR.todas,
+        )
+    consumir_novedades_y_actualizar_objetos()
+
+    # Tres distritos repartidos en dos hilos.
+    resultados = SumarizadorCombinado(configuracion_combinada).get_resultados(categoria)
+
+    assert resultados.total_mesas() == 24
+    assert resultados.total_votos() == 300
+    positivos = resultados.tabla_positivos()
+    assert positivos[o1.partido]['votos'] == 180
+    assert positivos[o2.partido]['votos'] == 90
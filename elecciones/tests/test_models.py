@@ -454,6 +454,30 @@ def test_obtener_mesa_por_distrito_circuito_seccion_nro_encontrada(db):
     assert mesa.circuito.seccion.distrito.numero == '1'
 
 
+def test_geografia_denormalizada_sigue_al_circuito(db):
+    s1 = SeccionFactory(distrito=DistritoFactory(numero='1'))
+    s2 = SeccionFactory(distrito=DistritoFactory(numero='2'))
+    c1 = CircuitoFactory(seccion=s1)
+    mesa = MesaFactory(lugar_votacion__circuito=c1, circuito=c1)
+    mc = MesaCategoriaFactory(mesa=mesa)
+    assert (mesa.distrito, mesa.seccion) == (s1.distrito, s1)
+    assert (mc.distrito_id, mc.seccion_id) == (s1.distrito_id, s1.id)
+
+    # El circuito pasa a otra sección: mesas y mesa-categorías lo acompañan.
+    c1.seccion = s2
+    c1.save()
+    mesa.refresh_from_db()
+    mc.refresh_from_db()
+    assert (mesa.distrito, mesa.seccion) == (s2.distrito, s2)
+    assert (mc.distrito_id, mc.seccion_id) == (s2.distrito_id, s2.id)
+
+    # Y también si la sección cambia de distrito.
+    d3 = DistritoFactory(numero='3')
+    s2.distrito = d3
+    s2.save()
+    assert MesaCategoria.objects.get(id=mc.id).distrito == d3
+
+
 def test_metadata_de_mesa(db, settings):
     settings.MIN_COINCIDENCIAS_CARGAS = 1
     o1 = OpcionFactory(tipo=Opcion.TIPOS.metadata)
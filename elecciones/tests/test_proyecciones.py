@@ -1,5 +1,9 @@
 from django.urls import reverse
-from elecciones.models import Categoria, Carga, Seccion, Opcion, CategoriaOpcion
+from elecciones.models import (
+    Categoria, Carga, Seccion, Opcion, CategoriaOpcion, OPCIONES_A_CONSIDERAR, TIPOS_DE_AGREGACIONES
+)
+from elecciones.proyecciones import Proyecciones, SumarizadorCombinado
+from elecciones.resultados import ResultadoCombinado
 
 from .factories import (
     CategoriaFactory,
@@ -8,6 +12,9 @@ from .factories import (
     MesaFactory,
     MesaCategoriaFactory,
     CargaFactory,
+    ConfiguracionComputoFactory,
+    ConfiguracionComputoDistritoFactory,
+    DistritoFactory,
 )
 from .test_models import consumir_novedades_y_actualizar_objetos
 from .utils import tecnica_proyeccion, cargar_votos
@@ -225,3 +232,55 @@ def test_proyeccion_con_agrupaciones_no_consideradas(carta_marina, fiscal_client
     assert mesas_escrutadas == 1
 
 
+def test_agrupar_votos_proyecta_y_redondea_por_agrupacion(db, mocker):
+    o1, o2 = OpcionFactory.create_batch(2)
+    categoria = CategoriaFactory(opciones=[o1, o2])
+    blanco = Opcion.blancos()
+
+    proyecciones = Proyecciones(None, 'todas_las_cargas', OPCIONES_A_CONSIDERAR.todas)
+    proyecciones.categoria = categoria
+    mocker.patch.object(proyecciones, 'coeficientes_para_proyeccion', return_value={1: 1.5, 2: 2.5})
+
+    votos_positivos, votos_no_positivos = proyecciones.agrupar_votos([
+        (o1.id, 1, 3),
+        (o2.id, 1, 10),
+        (blanco.id, 1, 1),
+        (o1.id, 2, 5),
+        (blanco.id, 2, 3),
+    ])
+
+    # Cada celda se redondea antes de sumar: round(3 * 1.5) + round(5 * 2.5) = 4 + 12
+    assert votos_positivos[o1.partido][o1] == 16
+    assert votos_positivos[o2.partido][o2] == 15
+    # round(1 * 1.5) + round(3 * 2.5) = 2 + 8
+    assert votos_no_positivos[blanco.nombre_corto] == 10
+
+    assert proyecciones.agrupar_votos([]) == ({}, {})
+
+
+def test_sumarizador_combinado_en_paralelo_suma_igual_que_secuencial(db, settings, mocker):
+    configuracion = ConfiguracionComputoFactory(nombre='combinada')
+    for numero in range(1, 5):
+        ConfiguracionComputoDistritoFactory(
+            configuracion=configuracion,
+            distrito=DistritoFactory(numero=str(numero)),
+            agregacion=TIPOS_DE_AGREGACIONES.todas_las_cargas,
+            opciones=OPCIONES_A_CONSIDERAR.todas,
+        )
+
+    def resultados_de_distrito(configuracion_distrito, categoria):
+        resultado = ResultadoCombinado()
+        resultado.resultados.total_mesas = int(configuracion_distrito.distrito.numero)
+        resultado.resultados.electores = 100 * int(configuracion_distrito.distrito.numero)
+        return resultado
+
+    mocker.patch.object(SumarizadorCombinado, 'resultados_de_distrito', side_effect=resultados_de_distrito)
+    categoria = CategoriaFactory()
+
+    settings.HILOS_SUMARIZADOR_COMBINADO = 0
+    secuencial = SumarizadorCombinado(configuracion).get_resultados(categoria)
+    settings.HILOS_SUMARIZADOR_COMBINADO = 4
+    paralelo = SumarizadorCombinado(configuracion).get_resultados(categoria)
+
+    assert paralelo.total_mesas() == secuencial.total_mesas() == 10
+    assert paralelo.electores() == secuencial.electores() == 1000
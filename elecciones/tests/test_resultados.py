@@ -1,10 +1,23 @@
+import csv
+import gc
+import io
+import weakref
+
 from django.conf import settings
+from django.http import FileResponse
 from django.urls import reverse
 from django.contrib.auth.models import Group
 from http import HTTPStatus
 from elecciones.models import (
-    Categoria, MesaCategoria, Carga, Seccion, Opcion, CategoriaOpcion, OPCIONES_A_CONSIDERAR
+    Categoria, MesaCategoria, Carga, Seccion, Opcion, CategoriaOpcion, OPCIONES_A_CONSIDERAR,
+    VotosCircuito, MesasEscrutadasCircuito, Distrito, Circuito,
+    TIPOS_DE_AGREGACIONES, NIVELES_DE_AGREGACION,
 )
+from elecciones.arbol_resultados import ArbolDeResultados
+from elecciones.cache_resultados import clave_resultados, epoca_consolidacion, obtener_resultados
+from elecciones.evolucion_resultados import tomar_snapshots
+from elecciones.memoizacion import estadisticas_memoizacion
+from elecciones.sumarizador import Sumarizador
 
 from .factories import (
     UserFactory,
@@ -17,11 +30,15 @@ from .factories import (
     IdentificacionFactory,
     VotoMesaReportadoFactory,
     CargaFactory,
+    CategoriaOpcionFactory,
+    TecnicaProyeccionFactory,
+    AgrupacionCircuitosFactory,
+    CircuitoFactory,
 )
 from adjuntos.models import Identificacion
 from adjuntos.consolidacion import consumir_novedades_identificacion
 from .test_models import consumir_novedades_y_actualizar_objetos
-from .utils import tecnica_proyeccion, cargar_votos
+from .utils import create_carta_marina, tecnica_proyeccion, cargar_votos
 from elecciones.tests.conftest import setup_groups, fiscal_client_from_fiscal    # noqa
 
 
@@ -749,3 +766,302 @@ def test_categorias_sensible(setup_groups, client):
     # El usuario visualizador sensible puede ver resultado no sensible.
     response = client.get(c_url, {'opcionaConsiderar': 'todas'})
     assert response.status_code == 200
+
+
+def test_totales_por_circuito_siguen_a_la_carga_testigo(carta_marina):
+    m1, m2, *_ = carta_marina
+    categoria = m1.categorias.get()
+    blanco = Opcion.blancos()
+    circuito = m1.circuito
+
+    c1 = CargaFactory(mesa_categoria__mesa=m1, mesa_categoria__categoria=categoria, tipo=Carga.TIPOS.total)
+    VotoMesaReportadoFactory(carga=c1, opcion=blanco, votos=20)
+    c2 = CargaFactory(mesa_categoria__mesa=m2, mesa_categoria__categoria=categoria, tipo=Carga.TIPOS.total)
+    VotoMesaReportadoFactory(carga=c2, opcion=blanco, votos=5)
+    consumir_novedades_y_actualizar_objetos()
+
+    votos = VotosCircuito.objects.get(circuito=circuito, opcion=blanco)
+    assert votos.status == MesaCategoria.STATUS.total_sin_consolidar
+    assert votos.votos == 25
+    escrutadas = MesasEscrutadasCircuito.objects.get(circuito=circuito)
+    assert escrutadas.cant_mesas == 2
+    assert escrutadas.electores == 200
+
+    # Una segunda carga coincidente cambia el status: los totales se mueven de status.
+    c3 = CargaFactory(mesa_categoria__mesa=m1, mesa_categoria__categoria=categoria, tipo=Carga.TIPOS.total)
+    VotoMesaReportadoFactory(carga=c3, opcion=blanco, votos=20)
+    consumir_novedades_y_actualizar_objetos()
+
+    totales = dict(
+        VotosCircuito.objects.filter(circuito=circuito, opcion=blanco).values_list('status', 'votos')
+    )
+    assert totales == {
+        MesaCategoria.STATUS.total_sin_consolidar: 5,
+        MesaCategoria.STATUS.total_consolidada_dc: 20,
+    }
+
+    # Si se invalidan las cargas, la mesa deja de aportar.
+    c1.invalidar()
+    c3.invalidar()
+    consumir_novedades_y_actualizar_objetos()
+    totales = dict(
+        VotosCircuito.objects.filter(circuito=circuito, opcion=blanco).values_list('status', 'votos')
+    )
+    assert totales[MesaCategoria.STATUS.total_consolidada_dc] == 0
+    assert totales[MesaCategoria.STATUS.total_sin_consolidar] == 5
+
+    # La reconstrucción completa llega a los mismos números.
+    VotosCircuito.reconstruir()
+    MesasEscrutadasCircuito.reconstruir()
+    assert list(
+        VotosCircuito.objects.filter(circuito=circuito, opcion=blanco).values_list('status', 'votos')
+    ) == [(MesaCategoria.STATUS.total_sin_consolidar, 5)]
+    assert list(
+        MesasEscrutadasCircuito.objects.filter(circuito=circuito).values_list('status', 'cant_mesas')
+    ) == [(MesaCategoria.STATUS.total_sin_consolidar, 1)]
+
+
+def test_totales_por_circuito_siguen_a_mesas_y_cargas(carta_marina):
+    m1, m2, *_ = carta_marina
+    categoria = m1.categorias.get()
+    blanco = Opcion.blancos()
+    circuito = m1.circuito
+    sin_consolidar = MesaCategoria.STATUS.total_sin_consolidar
+
+    def totales():
+        votos = VotosCircuito.objects.filter(votos__gt=0, opcion=blanco)
+        escrutadas = MesasEscrutadasCircuito.objects.filter(cant_mesas__gt=0)
+        return (
+            sorted(votos.values_list('circuito', 'status', 'votos')),
+            sorted(escrutadas.values_list('circuito', 'status', 'cant_mesas', 'electores')),
+        )
+
+    c1 = CargaFactory(mesa_categoria__mesa=m1, mesa_categoria__categoria=categoria, tipo=Carga.TIPOS.total)
+    VotoMesaReportadoFactory(carga=c1, opcion=blanco, votos=20)
+    c2 = CargaFactory(mesa_categoria__mesa=m2, mesa_categoria__categoria=categoria, tipo=Carga.TIPOS.total)
+    VotoMesaReportadoFactory(carga=c2, opcion=blanco, votos=5)
+    consumir_novedades_y_actualizar_objetos()
+
+    # Cambian los electores de una mesa y la otra pasa a otro circuito.
+    m1.electores = 150
+    m1.save()
+    otro_circuito = CircuitoFactory(seccion=circuito.seccion)
+    m2.circuito = otro_circuito
+    m2.save()
+    assert totales() == (
+        sorted([(circuito.id, sin_consolidar, 20), (otro_circuito.id, sin_consolidar, 5)]),
+        sorted([(circuito.id, sin_consolidar, 1, 150), (otro_circuito.id, sin_consolidar, 1, 100)]),
+    )
+
+    # Se borran la carga testigo de una mesa y la otra mesa.
+    c2.delete()
+    m1.delete()
+    assert totales() == ([], [])
+
+    # Las restas no crean totales que no existían.
+    assert not VotosCircuito.objects.filter(votos__lt=0).exists()
+    VotosCircuito.reconstruir()
+    MesasEscrutadasCircuito.reconstruir()
+    assert totales() == ([], [])
+
+
+def test_arbol_de_resultados_coincide_con_sumarizador(db):
+    mesas = create_carta_marina(create_distritos=2)
+    categoria = mesas[0].categorias.get()
+    blanco = Opcion.blancos()
+    opcion = OpcionFactory()
+    CategoriaOpcionFactory(categoria=categoria, opcion=opcion, prioritaria=True)
+
+    for i, mesa in enumerate(mesas[::3]):
+        carga = CargaFactory(
+            mesa_categoria__mesa=mesa, mesa_categoria__categoria=categoria, tipo=Carga.TIPOS.total
+        )
+        cargar_votos(carga, {opcion: 10 * i, blanco: i})
+    consumir_novedades_y_actualizar_objetos()
+
+    arbol = ArbolDeResultados(TIPOS_DE_AGREGACIONES.todas_las_cargas, OPCIONES_A_CONSIDERAR.todas)
+    raiz = arbol.calcular_arbol(categoria)
+    assert len(raiz.hijos) == 2
+    assert all(len(distrito.hijos) == 2 for distrito in raiz.hijos)
+
+    unidades = [(None, None)] + [
+        (nivel, unidad.id) for nivel, modelo in [
+            (NIVELES_DE_AGREGACION.distrito, Distrito),
+            (NIVELES_DE_AGREGACION.seccion, Seccion),
+            (NIVELES_DE_AGREGACION.circuito, Circuito),
+        ] for unidad in modelo.objects.all()
+    ]
+    for nivel, id_unidad in unidades:
+        esperado = Sumarizador(
+            TIPOS_DE_AGREGACIONES.todas_las_cargas,
+            OPCIONES_A_CONSIDERAR.todas,
+            nivel,
+            [id_unidad] if id_unidad else None
+        ).get_resultados(categoria)
+        obtenido = arbol.resultados_para(nivel, id_unidad)
+
+        assert obtenido.total_mesas() == esperado.total_mesas()
+        assert obtenido.total_mesas_escrutadas() == esperado.total_mesas_escrutadas()
+        assert obtenido.electores() == esperado.electores()
+        assert obtenido.electores_en_mesas_escrutadas() == esperado.electores_en_mesas_escrutadas()
+        assert dict(obtenido.tabla_positivos()) == dict(esperado.tabla_positivos())
+        assert obtenido.tabla_no_positivos() == esperado.tabla_no_positivos()
+
+
+def test_cache_de_resultados_se_invalida_al_consolidar(carta_marina, settings):
+    settings.CACHEAR_RESULTADOS = True
+    m1, m2, *_ = carta_marina
+    categoria = m1.categorias.get()
+    blanco = Opcion.blancos()
+    calculos = []
+
+    def calcular():
+        calculos.append(1)
+        return len(calculos)
+
+    clave = clave_resultados(categoria.id, 'prueba')
+    assert obtener_resultados(clave, calcular) == 1
+    # Sin novedades se reutiliza lo calculado.
+    assert obtener_resultados(clave, calcular) == 1
+
+    c1 = CargaFactory(mesa_categoria__mesa=m1, mesa_categoria__categoria=categoria, tipo=Carga.TIPOS.total)
+    VotoMesaReportadoFactory(carga=c1, opcion=blanco, votos=20)
+    epoca = epoca_consolidacion()
+    consumir_novedades_y_actualizar_objetos()
+    assert epoca_consolidacion() == epoca + 1
+    assert obtener_resultados(clave, calcular) == 2
+
+    # Una carga que no cambia el status ni la testigo de la mesa no invalida el cache.
+    c2 = CargaFactory(mesa_categoria__mesa=m1, mesa_categoria__categoria=categoria, tipo=Carga.TIPOS.parcial)
+    VotoMesaReportadoFactory(carga=c2, opcion=blanco, votos=20)
+    consumir_novedades_y_actualizar_objetos()
+    assert epoca_consolidacion() == epoca + 1
+    assert obtener_resultados(clave, calcular) == 2
+
+
+def test_cache_de_resultados_se_invalida_al_cambiar_la_configuracion(db):
+    epoca = epoca_consolidacion()
+    tecnica = TecnicaProyeccionFactory()
+    assert epoca_consolidacion() == epoca + 1
+    AgrupacionCircuitosFactory(proyeccion=tecnica)
+    assert epoca_consolidacion() == epoca + 2
+    tecnica.delete()
+    # Se borran la técnica y, en cascada, su agrupación.
+    assert epoca_consolidacion() == epoca + 4
+
+
+def test_cache_de_resultados_se_invalida_al_cambiar_las_mesas(db):
+    epoca = epoca_consolidacion()
+    mesa = MesaFactory()
+    assert epoca_consolidacion() == epoca + 1
+
+    # Un cambio que no afecta los resultados no invalida el cache.
+    mesa.url = 'https://acta.com'
+    mesa.save()
+    assert epoca_consolidacion() == epoca + 1
+
+    mesa.electores = 200
+    mesa.save(update_fields=['electores'])
+    assert epoca_consolidacion() == epoca + 2
+    mesa.circuito = CircuitoFactory()
+    mesa.save()
+    assert epoca_consolidacion() == epoca + 3
+    mesa.delete()
+    assert epoca_consolidacion() == epoca + 4
+
+
+def test_evolucion_de_resultados_desde_snapshots(carta_marina, fiscal_client):
+    m1, *_ = carta_marina
+    categoria = m1.categorias.get()
+    blanco = Opcion.blancos()
+
+    # Un snapshot para el país y otro para el único distrito.
+    assert tomar_snapshots([categoria]) == 2
+    # Si la consolidación no avanzó, no se repiten.
+    assert tomar_snapshots([categoria]) == 0
+
+    c1 = CargaFactory(mesa_categoria__mesa=m1, mesa_categoria__categoria=categoria, tipo=Carga.TIPOS.total)
+    VotoMesaReportadoFactory(carga=c1, opcion=blanco, votos=20)
+    consumir_novedades_y_actualizar_objetos()
+    assert tomar_snapshots([categoria]) == 2
+
+    response = fiscal_client.get(reverse('resultados-evolucion', args=[categoria.id]))
+    assert response.status_code == 200
+    snapshots = response.json()['snapshots']
+    assert [snapshot['mesas_escrutadas'] for snapshot in snapshots] == [0, 1]
+    assert [snapshot['total_mesas'] for snapshot in snapshots] == [8, 8]
+    assert snapshots[-1]['votos'][str(blanco.id)] == 20
+
+    response = fiscal_client.get(
+        reverse('resultados-evolucion', args=[categoria.id]), {'distrito': m1.distrito.id}
+    )
+    assert len(response.json()['snapshots']) == 2
+
+    url = reverse('resultados-evolucion', args=[categoria.id])
+    assert fiscal_client.get(url, {'distrito': 'uno'}).status_code == 400
+    assert fiscal_client.get(url, {'distrito': 999999}).status_code == 404
+    assert fiscal_client.get(url, {'tipoDeAgregacion': 'otro'}).status_code == 400
+
+
+def test_resultado_parcial_categoria_csv(carta_marina, client, settings, tmp_path):
+    settings.CACHEAR_RESULTADOS = True
+    settings.MEDIA_ROOT = str(tmp_path)
+    m1, m2, *_ = carta_marina
+    categoria = m1.categorias.get()
+    blanco = Opcion.blancos()
+    url = reverse('resultado-parcial-categoria', args=[categoria.slug, 'csv'])
+
+    def leer(response):
+        contenido = b''.join(response.streaming_content) if response.streaming else response.content
+        return list(csv.reader(io.StringIO(contenido.decode())))
+
+    def cargar(mesa, votos):
+        carga = CargaFactory(
+            mesa_categoria__mesa=mesa, mesa_categoria__categoria=categoria, tipo=Carga.TIPOS.total
+        )
+        cargar_votos(carga, {blanco: votos})
+        consumir_novedades_y_actualizar_objetos()
+
+    cargar(m1, 20)
+    cargar(m2, 30)
+
+    descarga = f"attachment; filename={categoria.slug}.csv;filename*=utf-8''{categoria.slug}.csv"
+    response = client.get(url)
+    assert response.streaming and not isinstance(response, FileResponse)
+    assert response['Content-Disposition'] == descarga
+    encabezado, *filas = leer(response)
+    assert len(filas) == 2
+    filas = {fila[5]: dict(zip(encabezado, fila)) for fila in filas}
+    assert filas[str(m1.numero)][blanco.nombre] == '20'
+    assert filas[str(m2.numero)][blanco.nombre] == '30'
+    assert filas[str(m1.numero)]['circuito'] == m1.circuito.nombre
+
+    # Mientras no haya datos nuevos se sirve lo generado.
+    response = client.get(url)
+    assert isinstance(response, FileResponse)
+    assert response['Content-Disposition'] == descarga
+    assert len(leer(response)) == 3
+
+    cargar(m1, 20)
+    assert not isinstance(client.get(url), FileResponse)
+
+
+def test_memoizacion_por_instancia_del_sumarizador(carta_marina):
+    categoria = carta_marina[0].categorias.get()
+    sumarizador = Sumarizador()
+
+    resultados = sumarizador.get_resultados(categoria)
+    assert sumarizador.get_resultados(categoria) is resultados
+    assert resultados.votantes() == resultados.votantes()
+    un_acierto = {'aciertos': 1, 'fallos': 1, 'tamanio': 1}
+    assert estadisticas_memoizacion(sumarizador)['get_resultados'] == un_acierto
+    assert estadisticas_memoizacion(resultados)['votantes'] == un_acierto
+
+    # Otro sumarizador no comparte lo memoizado.
+    assert Sumarizador().get_resultados(categoria) is not resultados
+
+    # Lo memoizado no retiene al sumarizador una vez que deja de usarse.
+    referencia = weakref.ref(sumarizador)
+    del sumarizador, resultados
+    gc.collect()
+    assert referencia() is None
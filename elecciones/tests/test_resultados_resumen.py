@@ -1,5 +1,7 @@
 import pytest
 
+from django.db.models import Sum
+
 from elecciones.tests.factories import (
     MesaFactory, AttachmentFactory, PreidentificacionFactory,
     DistritoFactory, SeccionFactory, CircuitoFactory, LugarVotacionFactory,
@@ -10,11 +12,12 @@ from elecciones.tests.utils_para_test import (
     nuevo_fiscal, identificar, reportar_problema_attachment
 )
 from adjuntos.consolidacion import consumir_novedades
-from elecciones.models import Mesa, Carga, MesaCategoria
+from elecciones.models import Mesa, Carga, ResumenAvanceCarga, ResumenFotosSeccion
 from adjuntos.models import Attachment, PreIdentificacion
 from elecciones.resultados_resumen import (
     GeneradorDatosFotosNacional, GeneradorDatosFotosDistrital, GeneradorDatosPreidentificaciones,
     GeneradorDatosCargaParcialConsolidado, GeneradorDatosCargaTotalConsolidado,
+    GeneradorDatosFotosPorDistrito, GeneradorDatosFotosDistritoPorSeccion,
     SinRestriccion
 )
 
@@ -419,7 +422,7 @@ def test_carga_datos(db, settings):
     assert carga_parcial_todas_las_mesas.gv.dato_carga_con_problemas == 0
 
     # carga parcial - sobre mesas con fotos
-    carga_parcial_todas_las_mesas.set_query_base(MesaCategoria.objects.exclude(mesa__attachments=None))
+    carga_parcial_todas_las_mesas.solo_mesas_con_fotos()
     carga_parcial_todas_las_mesas.calcular()
     # presidente y vice
     assert carga_parcial_todas_las_mesas.pv.dato_total == 39
@@ -455,7 +458,7 @@ def test_carga_datos(db, settings):
     assert carga_total_todas_las_mesas.gv.dato_carga_con_problemas == 0
 
     # carga parcial - sobre mesas con fotos
-    carga_total_todas_las_mesas.set_query_base(MesaCategoria.objects.exclude(mesa__attachments=None))
+    carga_total_todas_las_mesas.solo_mesas_con_fotos()
     carga_total_todas_las_mesas.calcular()
     # presidente y vice
     assert carga_total_todas_las_mesas.pv.dato_total == 39
@@ -471,3 +474,61 @@ def test_carga_datos(db, settings):
     assert carga_total_todas_las_mesas.gv.dato_carga_en_proceso == 2
     assert carga_total_todas_las_mesas.gv.dato_carga_sin_carga == 12
     assert carga_total_todas_las_mesas.gv.dato_carga_con_problemas == 0
+
+
+def resumenes_de_avance():
+    avance = ResumenAvanceCarga.objects.values_list(
+        'categoria', 'distrito', 'seccion', 'status', 'con_fotos'
+    ).annotate(cant=Sum('cant_mesas')).filter(cant__gt=0).order_by()
+    fotos = ResumenFotosSeccion.objects.values_list(
+        'distrito', 'seccion', 'cant_mesas', 'mesas_con_foto_identificada', 'mesas_con_carga_sin_foto'
+    ).exclude(cant_mesas=0, mesas_con_foto_identificada=0, mesas_con_carga_sin_foto=0)
+    return set(avance), set(fotos)
+
+
+def test_resumen_de_avance_incremental_coincide_con_reconstruir(db, settings):
+    settings.MIN_COINCIDENCIAS_IDENTIFICACION = 2
+    settings.MIN_COINCIDENCIAS_CARGAS = 2
+    settings.SLUG_CATEGORIA_PRESI_Y_VICE = 'PV'
+    settings.SLUG_CATEGORIA_GOB_Y_VICE_PBA = 'GB_PBA'
+    Cargas.crear_cargas()
+    data = DataTresDistritos('2')
+    data.agregar_mesacats(settings)
+    mesa = data.mesas_pba[0]
+    assert ResumenFotosSeccion.objects.get(seccion=mesa.seccion).cant_mesas == len(data.mesas_pba)
+
+    # Mesas con foto, una con carga sin foto, y una carga consolidada.
+    for otra_mesa in data.mesas_pba[:3] + data.mesas_caba[:1]:
+        asociar_foto_a_mesa(otra_mesa, data)
+    agregar_cargas_mesa(data.mesacats_gv_pba[0], [Cargas.total_web, Cargas.total_web])
+    agregar_cargas_mesa(data.mesacats_gv_pba[5], [Cargas.parcial_web])
+    consumir_novedades()
+    assert ResumenFotosSeccion.objects.get(seccion=mesa.seccion).mesas_con_foto_identificada == 3
+
+    # Una foto que cambia de mesa.
+    foto = Attachment.objects.filter(mesa=data.mesas_pba[1]).get()
+    foto.mesa = data.mesas_pba[4]
+    foto.save(update_fields=['mesa'])
+
+    incremental = resumenes_de_avance()
+    ResumenAvanceCarga.reconstruir()
+    ResumenFotosSeccion.reconstruir()
+    assert incremental == resumenes_de_avance()
+
+
+def test_datos_fotos_por_distrito_y_por_seccion(db, django_assert_num_queries):
+    data = DataTresDistritos('2')
+    for mesa in data.mesas_pba[:4] + data.mesas_caba[:2]:
+        asociar_foto_a_mesa(mesa, data)
+    consumir_novedades()
+
+    with django_assert_num_queries(1):
+        datos = GeneradorDatosFotosPorDistrito().datos()
+    assert datos == [
+        {'nombre': data.distrito_pba.nombre, 'cantidad': 4},
+        {'nombre': data.distrito_caba.nombre, 'cantidad': 2},
+    ]
+
+    with django_assert_num_queries(1):
+        datos = GeneradorDatosFotosDistritoPorSeccion('2').datos()
+    assert datos == [{'nombre': data.seccion_pba.nombre, 'cantidad': 4}]
@@ -3,12 +3,9 @@ from django.conf.urls import url
 from . import views, data_views
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.cache import cache_page
-from django.conf import settings
 
 cached = cache_page(300)
 
-multiplicador_testing = 0 if settings.TESTING else 1
-
 urlpatterns = [
     url('^escuelas.geojson$', cached(
         views.LugaresVotacionGeoJSON.as_view()), name='geojson'),
@@ -17,12 +14,12 @@ urlpatterns = [
     url('^mapa/$', login_required(cached(views.Mapa.as_view())), name='mapa'),
     url(
         r'^avance_carga/(?P<pk>\d+)?$',
-        cache_page(multiplicador_testing * 5 * 60)(views.AvanceDeCargaCategoria.as_view()),
+        views.AvanceDeCargaCategoria.as_view(),
         name='avance-carga'
     ),
     url(
         r'^avance-carga-cuerpo-central/(?P<pk>\d+)?$',
-        cache_page(multiplicador_testing * 5 * 60)(views.AvanceDeCargaCategoriaCuerpoCentral.as_view()),
+        views.AvanceDeCargaCategoriaCuerpoCentral.as_view(),
         name='avance-carga-cuerpo-central'
     ),
     url(
@@ -51,12 +48,12 @@ urlpatterns = [
     ),
     url(
         r'^resultados/(?P<pk>\d+)?$',
-        cache_page(multiplicador_testing * 5 * 60)(views.ResultadosCategoria.as_view()),
+        views.ResultadosCategoria.as_view(),
         name='resultados-categoria'
     ),
     url(
         r'^resultados-cuerpo-central/(?P<pk>\d+)?$',
-        cache_page(multiplicador_testing * 5 * 60)(views.ResultadosCategoriaCuerpoCentral.as_view()),
+        views.ResultadosCategoriaCuerpoCentral.as_view(),
         name='resultados-categoria-cuerpo-central'
     ),
     url(
@@ -74,7 +71,12 @@ urlpatterns = [
     ),
     url(
         r'^resultados-en-base-a-configuracion/(?P<pk>\d+)?$',
-        cache_page(multiplicador_testing * 5 * 60)(views.ResultadosComputoCategoria.as_view()),
+        views.ResultadosComputoCategoria.as_view(),
         name='resultados-en-base-a-configuracion'
     ),
+    url(
+        r'^resultados-evolucion/(?P<pk>\d+)$',
+        views.EvolucionResultados.as_view(),
+        name='resultados-evolucion'
+    ),
 ]
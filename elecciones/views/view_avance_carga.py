@@ -1,6 +1,4 @@
 from django.conf import settings
-from django.utils import timezone
-from datetime import timedelta
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils.text import get_text_list
 from django.views.generic.base import TemplateView
@@ -9,7 +7,7 @@ from .definiciones import VisualizadoresOnlyMixin
 
 from escrutinio_social import settings
 
-from fiscales.models import Fiscal
+from fiscales.models import FiscalesActivosPorMinuto
 
 from elecciones.models import (
     Distrito,
@@ -18,13 +16,13 @@ from elecciones.models import (
     Categoria,
     LugarVotacion,
     Mesa,
-    MesaCategoria,
     OPCIONES_A_CONSIDERAR,
     TIPOS_DE_AGREGACIONES,
     NIVELES_AGREGACION,
 )
 from elecciones.proyecciones import Proyecciones
 from elecciones.avance_carga import AvanceDeCarga
+from elecciones.cache_resultados import clave_resultados, obtener_resultados
 from elecciones.busquedas import BusquedaDistritoOSeccion
 
 from elecciones.resultados_resumen import (
@@ -69,7 +67,10 @@ class AvanceDeCargaCategoria(VisualizadoresOnlyMixin, TemplateView):
         return [self.kwargs.get("template_name", self.template_name)]
 
     def get_resultados(self, categoria):
-        return self.sumarizador.get_resultados(categoria)
+        return obtener_resultados(
+            clave_resultados(categoria.id, *self.sumarizador.parametros_de_computo()),
+            lambda: self.sumarizador.get_resultados(categoria)
+        )
 
     def get_tipo_de_agregacion(self):
         # TODO el default también está en Sumarizador.__init__
@@ -177,9 +178,7 @@ class AvanceDeCargaResumen(TemplateView):
         context['categoria_elegida'] = self.categoria_spec
         context['nombre_categoria_elegida'] = self.categoria.nombre
         # data fiscales
-        ahora = timezone.now()
-        desde = ahora - timedelta(minutes=5)
-        context['fiscales_activos'] = Fiscal.objects.filter(last_seen__gt=desde).count()
+        context['fiscales_activos'] = FiscalesActivosPorMinuto.activos()
         # data fotos
         generador_datos_fotos = GeneradorDatosFotosConsolidado(self.restriccion_geografica)
         context['data_fotos_nacion_pba_restriccion'] = generador_datos_fotos.datos_nacion_pba_restriccion()
@@ -188,12 +187,11 @@ class AvanceDeCargaResumen(TemplateView):
         generador_datos_carga_parcial = GeneradorDatosCargaParcialConsolidado(
             self.restriccion_geografica, self.categoria)
         if self.base_carga_parcial == "solo_con_fotos":
-            generador_datos_carga_parcial.set_query_base(
-                MesaCategoria.objects.exclude(mesa__attachments=None))
+            generador_datos_carga_parcial.solo_mesas_con_fotos()
         generador_datos_carga_total = GeneradorDatosCargaTotalConsolidado(
             self.restriccion_geografica, self.categoria)
         if self.base_carga_total == "solo_con_fotos":
-            generador_datos_carga_total.set_query_base(MesaCategoria.objects.exclude(mesa__attachments=None))
+            generador_datos_carga_total.solo_mesas_con_fotos()
         context['data_carga_parcial'] = generador_datos_carga_parcial.datos()
         context['data_carga_total'] = generador_datos_carga_total.datos()
         # data preidentificaciones
@@ -212,17 +210,17 @@ class AvanceDeCargaResumen(TemplateView):
         # detalle carga parcial confirmada
         if self.detalle_carga_parcial_confirmada == 'distrito':
             context['datos_detalle_carga_parcial_confirmada'] = GeneradorDatosCargaParcialDiscriminada(
-                settings.SLUG_CATEGORIA_PRESI_Y_VICE, 'mesa__circuito__seccion__distrito__nombre').para_carga_confirmada().datos()
+                settings.SLUG_CATEGORIA_PRESI_Y_VICE, 'distrito__nombre').para_carga_confirmada().datos()
         elif self.detalle_carga_parcial_confirmada == 'seccion':
             context['datos_detalle_carga_parcial_confirmada'] = GeneradorDatosCargaParcialDiscriminada(
-                settings.SLUG_CATEGORIA_GOB_Y_VICE_PBA, 'mesa__circuito__seccion__nombre').para_carga_confirmada().datos()
+                settings.SLUG_CATEGORIA_GOB_Y_VICE_PBA, 'seccion__nombre').para_carga_confirmada().datos()
         # detalle carga parcial csv
         if self.detalle_carga_parcial_csv == 'distrito':
             context['datos_detalle_carga_parcial_csv'] = GeneradorDatosCargaParcialDiscriminada(
-                settings.SLUG_CATEGORIA_PRESI_Y_VICE, 'mesa__circuito__seccion__distrito__nombre').para_carga_csv().datos()
+                settings.SLUG_CATEGORIA_PRESI_Y_VICE, 'distrito__nombre').para_carga_csv().datos()
         elif self.detalle_carga_parcial_csv == 'seccion':
             context['datos_detalle_carga_parcial_csv'] = GeneradorDatosCargaParcialDiscriminada(
-                settings.SLUG_CATEGORIA_GOB_Y_VICE_PBA, 'mesa__circuito__seccion__nombre').para_carga_csv().datos()
+                settings.SLUG_CATEGORIA_GOB_Y_VICE_PBA, 'seccion__nombre').para_carga_csv().datos()
         # data relacionada con navegación
         context['base_carga_parcial'] = self.base_carga_parcial
         context['base_carga_total'] = self.base_carga_total
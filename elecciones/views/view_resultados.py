@@ -1,14 +1,15 @@
 from urllib import parse
 from django.utils.six.moves.urllib.parse import urlsplit
 from django.conf import settings
+from django.http import HttpResponseBadRequest, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.utils.text import get_text_list
-from django.views.generic.base import TemplateView
+from django.views.generic.base import TemplateView, View
 from django.contrib.auth.decorators import login_required, user_passes_test
 from constance import config
 
-from .definiciones import *
+from .definiciones import VisualizadoresOnlyMixin
 
 import django_excel as excel
 
@@ -28,6 +29,9 @@ from elecciones.models import (
     NIVELES_DE_AGREGACION,
 )
 
+from elecciones.arbol_resultados import ArbolDeResultados
+from elecciones.cache_resultados import clave_resultados, obtener_resultados
+from elecciones.evolucion_resultados import evolucion
 from elecciones.proyecciones import Proyecciones, create_sumarizador
 from elecciones.sumarizador import NIVEL_DE_AGREGACION
 
@@ -157,8 +161,43 @@ class ResultadosCategoriaBase(VisualizadoresOnlyMixin, TemplateView):
         return [self.kwargs.get("template_name", self.template_name)]
 
     def get_resultados(self, categoria):
+        """
+        Los resultados se reutilizan mientras no cambie la época de consolidación.
+        """
+        return obtener_resultados(
+            clave_resultados(categoria.id, *self.sumarizador.parametros_de_computo()),
+            lambda: self.calcular_resultados(categoria)
+        )
+
+    def calcular_resultados(self, categoria):
+        if ArbolDeResultados.resuelve(self.sumarizador):
+            # Sin proyección y hasta nivel circuito, los resultados salen del árbol de la categoría.
+            if self.sumarizador.ids_a_considerar:
+                return self.get_arbol_de_resultados(categoria).resultados_para(
+                    self.sumarizador.nivel_de_agregacion, self.sumarizador.ids_a_considerar[0]
+                )
+            return self.get_arbol_de_resultados(categoria).resultados_para()
+
         return self.sumarizador.get_resultados(categoria)
 
+    def get_arbol_de_resultados(self, categoria):
+        """
+        Devuelve el árbol de resultados de la categoría, que se comparte entre todas las
+        unidades geográficas que se consulten con los mismos parámetros.
+        """
+        tipo_de_agregacion = self.sumarizador.tipo_de_agregacion
+        opciones_a_considerar = self.sumarizador.opciones_a_considerar
+
+        def calcular_arbol():
+            arbol = ArbolDeResultados(tipo_de_agregacion, opciones_a_considerar)
+            arbol.calcular_arbol(categoria)
+            return arbol
+
+        return obtener_resultados(
+            clave_resultados('arbol', categoria.id, tipo_de_agregacion, opciones_a_considerar),
+            calcular_arbol
+        )
+
     def get_tipo_de_agregacion(self):
         # TODO el default también está en Sumarizador.__init__
         return self.request.GET.get('tipoDeAgregacion', TIPOS_DE_AGREGACIONES.todas_las_cargas)
@@ -351,3 +390,26 @@ class ResultadosComputoCategoria(ResultadosCategoriaBase):
         return self.tecnica_de_proyeccion
 
 
+class EvolucionResultados(VisualizadoresOnlyMixin, View):
+    """
+    Evolución de los resultados de una categoría (en todo el país o en un distrito),
+    servida directamente desde los snapshots. Un distrito o un tipo de agregación mal formados
+    dan 400, y un distrito inexistente 404.
+    """
+
+    def get(self, request, *args, **kwargs):
+        categoria = get_object_or_404(Categoria, id=self.kwargs.get('pk'))
+        distrito = request.GET.get('distrito') or None
+        if distrito is not None:
+            if not distrito.isdigit():
+                return HttpResponseBadRequest('El distrito debe ser un id numérico.')
+            distrito = get_object_or_404(Distrito, id=int(distrito)).id
+        tipo_de_agregacion = request.GET.get('tipoDeAgregacion', TIPOS_DE_AGREGACIONES.todas_las_cargas)
+        if tipo_de_agregacion not in TIPOS_DE_AGREGACIONES:
+            return HttpResponseBadRequest('Tipo de agregación inválido.')
+        return JsonResponse({
+            'categoria': categoria.id,
+            'distrito': distrito,
+            'tipo_de_agregacion': tipo_de_agregacion,
+            'snapshots': evolucion(categoria, distrito, tipo_de_agregacion),
+        })
@@ -12,6 +12,7 @@ import json
 import os
 import sys
 from model_utils import Choices
+from django.core.exceptions import ImproperlyConfigured
 import logging.config
 import structlog
 
@@ -352,6 +353,16 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
         'LOCATION': 'elecciones_cache',
     },
+    # Resultados calculados (ver CACHE_RESULTADOS). Va aparte para que no desplace a las
+    # entradas de constance al llenarse.
+    'resultados': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'elecciones_cache_resultados',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    },
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'unique-snowflake',
@@ -389,6 +400,33 @@ TIMEOUT_TAREAS = 3  # En minutos
 # de subida de fotos y CSV
 MAX_UPLOAD_SIZE = 12 * 1024 ** 2     # 12 Mb
 
+# Implementación de la cola de tareas que consultan los fiscales (ver scheduling/cola_tareas.py):
+# 'base' usa la tabla ColaCargasPendientes; 'memoria' usa un proceso aparte (comando
+# servidor_cola_tareas) que la mantiene en memoria a partir de la tabla. Si no responde, se usa la tabla.
+# La clave autentica a los clientes del proceso. No tiene valor por defecto: se toma del entorno
+# del despliegue y, si se usa la cola en memoria sin definirla, no se arranca.
+COLA_TAREAS = os.getenv('COLA_TAREAS', 'base')
+COLA_TAREAS_EN_MEMORIA_DIRECCION = (
+    os.getenv('COLA_TAREAS_EN_MEMORIA_HOST', 'localhost'),
+    int(os.getenv('COLA_TAREAS_EN_MEMORIA_PUERTO', 50123))
+)
+COLA_TAREAS_EN_MEMORIA_CLAVE = os.getenv('COLA_TAREAS_EN_MEMORIA_CLAVE', '').encode()
+if COLA_TAREAS == 'memoria' and not COLA_TAREAS_EN_MEMORIA_CLAVE:
+    raise ImproperlyConfigured(
+        'COLA_TAREAS=memoria requiere definir COLA_TAREAS_EN_MEMORIA_CLAVE en el entorno.'
+    )
+
+# Dirección en la que el comando servidor_metricas_cola expone las métricas de la cola de tareas
+# en formato Prometheus (ver scheduling/metricas.py).
+METRICAS_COLA_DIRECCION = (
+    os.getenv('METRICAS_COLA_HOST', 'localhost'),
+    int(os.getenv('METRICAS_COLA_PUERTO', 9108))
+)
+
+# Si el scheduler corre en modo incremental (scheduler --incremental). Sólo en ese caso la
+# consolidación registra novedades para el scheduler (ver scheduling.models.NovedadScheduler).
+SCHEDULER_INCREMENTAL = os.getenv('SCHEDULER_INCREMENTAL') == 'True'
+
 # Tiempo en segundos que se espera entre
 # recálculo de consolidaciones de identificación y carga
 PAUSA_CONSOLIDACION = 15
@@ -462,6 +500,22 @@ OPCIONES_CARGAS_TOTALES_COMPLETAS = True
 # Opción para elegir ninguna proyección en el combo
 SIN_PROYECCION = ('sin_proyeccion', 'Sólo escrutado')
 
+# Los resultados calculados se guardan en este cache y se reutilizan hasta que la consolidación
+# modifique alguna MesaCategoria (ver elecciones/cache_resultados.py).
+# Tiene que ser un cache compartido entre el consolidador y los workers web
+# (la tabla se crea con `python manage.py createcachetable`).
+CACHE_RESULTADOS = 'resultados'
+CACHEAR_RESULTADOS = not TESTING
+
+# Cada cuántos segundos cada proceso verifica si cambiaron las prioridades del scheduling
+# (ver MapasPrioridadesCompilados). En los tests siempre, porque cada test deshace sus cambios.
+SEGUNDOS_VIGENCIA_MAPAS_PRIORIDADES = 0 if TESTING else 5
+
+# Cantidad de hilos con los que el SumarizadorCombinado calcula los distritos en paralelo
+# (cada hilo usa su propia conexión a la base). Con 0 o 1 los calcula uno tras otro.
+# En los tests es secuencial porque los datos viven en la transacción del test.
+HILOS_SUMARIZADOR_COMBINADO = 0 if TESTING else 8
+
 # Opción para indicar que no se debe mostrar información relacionada con cantidad de electores por mesa / escuela / etc
 # una razón para esto es que su no se cuenta con información fidedigna al respecto
 OCULTAR_CANTIDADES_DE_ELECTORES = True
@@ -528,6 +582,7 @@ CONSTANCE_CONFIG = {
     'SCORING_TROLL_DESCUENTO_ACCION_CORRECTA': (1, 'Cuánto disminuye el scoring de troll para cada acción aceptada de un fiscal.', int),
     'MULTIPLICADOR_CANT_ASIGNACIONES_REALIZADAS': (2, 'Este multiplicador se utiliza al computar "cant_asignaciones_realizadas_redondeadas" en el schedulling de attachments y mesa-categorías.', int),
     'PAUSA_SCHEDULER': (10, 'Frecuencia de ejecución del scheduler (en segundos).', int),
+    'PAUSA_SNAPSHOTS_RESULTADOS': (300, 'Frecuencia con la que se guardan snapshots de resultados (en segundos).', int),
     'PAUSA_IMPORTAR_EMAILS': (300, 'Frecuencia de ejecución del importador de actas por email (en segundos).', int),
     'FACTOR_LARGO_COLA_POR_USUARIOS_ACTIVOS': (1.5, 'Factor de multiplicación para agregar tareas.', float),
     'ASIGNAR_MESA_EN_EL_MOMENTO_SI_NO_HAY_COLA': (True, 'Asignar tareas en el momento si la cola está vacía?', bool),
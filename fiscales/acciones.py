@@ -5,7 +5,7 @@ from constance import config
 
 from adjuntos.models import Attachment
 from elecciones.models import MesaCategoria
-from scheduling.models import ColaCargasPendientes
+from scheduling.cola_tareas import cola_de_tareas
 
 
 def siguiente_accion(request):
@@ -22,13 +22,22 @@ def elegir_siguiente_accion(request):
     Define la siguiente acción en base a la cola de tareas preexistente.
     """
     modo_ub = request.GET.get('modo_ub') and request.user.fiscal.esta_en_grupo('unidades basicas')
-    with transaction.atomic():
-        (mesa_categoria, foto) = ColaCargasPendientes.siguiente_tarea(request.user.fiscal, modo_ub)
-        if mesa_categoria:
-            return CargaCategoriaEnActa(request, mesa_categoria, modo_ub)
-        if foto:
-            return IdentificacionDeFoto(request, foto, modo_ub)
-        siguiente = elegir_siguiente_accion_en_el_momento(request) if config.ASIGNAR_MESA_EN_EL_MOMENTO_SI_NO_HAY_COLA else NoHayAccion(request)
+    cola = cola_de_tareas()
+    try:
+        with transaction.atomic():
+            (mesa_categoria, foto) = cola.siguiente_tarea(request.user.fiscal, modo_ub)
+            if mesa_categoria:
+                return CargaCategoriaEnActa(request, mesa_categoria, modo_ub)
+            if foto:
+                return IdentificacionDeFoto(request, foto, modo_ub)
+            if config.ASIGNAR_MESA_EN_EL_MOMENTO_SI_NO_HAY_COLA:
+                siguiente = elegir_siguiente_accion_en_el_momento(request)
+            else:
+                siguiente = NoHayAccion(request)
+    except Exception:
+        # Se revirtió la transacción: la tarea vuelve a estar pendiente.
+        cola.devolver_tarea()
+        raise
     return siguiente
 
 
@@ -7,7 +7,6 @@ from fiscales.models import Fiscal
 
 
 class OneSessionPerUserMiddleware:
-    LAST_SEEN_KEY = "last_seen"
 
     def __init__(self, get_response):
         self.get_response = get_response
@@ -23,12 +22,12 @@ class OneSessionPerUserMiddleware:
                     return render(request, 'fiscales/sesion-expirada.html')
 
                 # Me fijo si hay que actualizarle el last_seen
-                last_seen = request.session.get(self.LAST_SEEN_KEY)
+                last_seen = fiscal.last_seen
                 ahora = timezone.now()
                 delta = timedelta(seconds=settings.LAST_SEEN_UPDATE_INTERVAL)
 
                 if not last_seen or ahora > last_seen + delta:
-                    # Me actualizo el last_seen en la bd.
+                    # Me actualizo el last_seen en la bd (y los fiscales activos por minuto).
                     fiscal.update_last_seen(ahora)
             except Fiscal.DoesNotExist:
                 # usuario no fiscal
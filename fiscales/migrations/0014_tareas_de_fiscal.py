@@ -0,0 +1,41 @@
+# Generated by Django 2.2.2 on 2019-10-22 19:40
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Completa las tareas de cada fiscal con las cargas e identificaciones que ya hizo.
+COMPLETAR_TAREAS_DE_FISCAL = """
+INSERT INTO fiscales_tareasdefiscal (fiscal_id, mesa_categorias, attachments)
+SELECT f.id,
+    ARRAY(SELECT DISTINCT c.mesa_categoria_id FROM elecciones_carga c WHERE c.fiscal_id = f.id),
+    ARRAY(SELECT DISTINCT i.attachment_id FROM adjuntos_identificacion i WHERE i.fiscal_id = f.id)
+FROM fiscales_fiscal f
+WHERE EXISTS (SELECT 1 FROM elecciones_carga c WHERE c.fiscal_id = f.id)
+    OR EXISTS (SELECT 1 FROM adjuntos_identificacion i WHERE i.fiscal_id = f.id)
+"""
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fiscales', '0013_fiscal_distrito_afin'),
+        ('elecciones', '0067_resumen_avance_carga'),
+        ('adjuntos', '0018_attachment_parent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TareasDeFiscal',
+            fields=[
+                ('fiscal', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='tareas', serialize=False, to='fiscales.Fiscal')),
+                ('mesa_categorias', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), default=list, size=None)),
+                ('attachments', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), default=list, size=None)),
+            ],
+            options={
+                'verbose_name': 'Tareas de fiscal',
+                'verbose_name_plural': 'Tareas de fiscales',
+            },
+        ),
+        migrations.RunSQL(COMPLETAR_TAREAS_DE_FISCAL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 2.2.2 on 2019-10-22 20:05
+
+from django.db import migrations, models
+
+
+# Cuenta a los fiscales vistos en los últimos minutos.
+COMPLETAR_FISCALES_ACTIVOS = """
+INSERT INTO fiscales_fiscalesactivosporminuto (minuto, cantidad)
+SELECT date_trunc('minute', last_seen), count(*)
+FROM fiscales_fiscal
+WHERE last_seen >= now() - interval '6 minutes'
+GROUP BY 1
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fiscales', '0014_tareas_de_fiscal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FiscalesActivosPorMinuto',
+            fields=[
+                ('minuto', models.DateTimeField(primary_key=True, serialize=False)),
+                ('cantidad', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Fiscales activos por minuto',
+                'verbose_name_plural': 'Fiscales activos por minuto',
+            },
+        ),
+        migrations.RunSQL(COMPLETAR_FISCALES_ACTIVOS, migrations.RunSQL.noop),
+    ]
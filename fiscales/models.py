@@ -11,14 +11,17 @@ from datetime import timedelta
 from django.contrib.contenttypes.fields import GenericRelation
 from django.contrib.auth.models import User
 from django.dispatch import receiver
-from django.db.models import Sum
+from django.db.models import Count, Sum
+from django.db.models.functions import Trunc
 from django.db.models.signals import post_save, pre_delete
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.fields import ArrayField
+from django.db import connection
 from annoying.functions import get_object_or_None
-from elecciones.models import Seccion, Distrito, MesaCategoria
+from elecciones.models import Seccion, Distrito, MesaCategoria, Carga
 
 from contacto.models import DatoDeContacto
-from adjuntos.models import Attachment
+from adjuntos.models import Attachment, Identificacion
 from model_utils.models import TimeStampedModel
 from model_utils.fields import StatusField
 from django.db.utils import IntegrityError
@@ -156,6 +159,8 @@ class Fiscal(models.Model):
         cuando haga el submit.
         - Pero sí le baja la cantidad de asignaciones a la mesacategoría y los attachments para que queden
         postergados por demasiado tiempo.
+
+        Devuelve la cantidad de tareas vencidas.
         """
         desde = timezone.now() - timedelta(minutes=settings.TIMEOUT_TAREAS)
         fiscales_para_limpiar_asignacion_previa = []
@@ -170,6 +175,7 @@ class Fiscal(models.Model):
         # attachments que tuviera asignados, para evitar deadlocks (ver #321).
         for fiscal in fiscales_para_limpiar_asignacion_previa:
             fiscal.limpiar_asignacion_previa()
+        return len(fiscales_para_limpiar_asignacion_previa)
 
     def limpiar_asignacion_previa(self):
         """
@@ -206,7 +212,7 @@ class Fiscal(models.Model):
         No se hace aquí para evitar deadlocks (ver #317), se hace desde
         acciones.py en una transacción independiente.
         """
-        distrito = mesa_categoria.mesa.distrito
+        distrito = mesa_categoria.distrito
         self.asignar_attachment_o_mesacategoria(None, mesa_categoria, distrito)
 
     def asignar_attachment_o_mesacategoria(self, attachment, mesa_categoria, distrito_afin=None):
@@ -226,8 +232,10 @@ class Fiscal(models.Model):
         self.save(update_fields=['asignacion_ultima_tarea'])
 
     def update_last_seen(self, cuando):
+        anterior = self.last_seen
         self.last_seen = cuando
         self.save(update_fields=['last_seen'])
+        FiscalesActivosPorMinuto.registrar(anterior, cuando)
 
     def update_session_key(self, session_key):
         self.session_key = session_key
@@ -334,6 +342,133 @@ class Fiscal(models.Model):
             fiscal.quitar_marca_troll(actor, nuevo_scoring)
 
 
+class TareasDeFiscal(models.Model):
+    """
+    Ids de las MesaCategoria que cargó y de los Attachment que identificó cada fiscal.
+
+    Se mantienen al guardar cargas e identificaciones, y se usan para no volver a darle esas
+    tareas cuando hay pocos usuaries, sin tener que cruzar la cola con las cargas e
+    identificaciones de todos. De cada tipo se guardan sólo las últimas ``CANTIDAD_MAXIMA``:
+    las más viejas ya no suelen estar en la cola, y así los arrays no crecen sin límite.
+    """
+    CANTIDAD_MAXIMA = 200
+
+    fiscal = models.OneToOneField(Fiscal, primary_key=True, related_name='tareas', on_delete=models.CASCADE)
+    mesa_categorias = ArrayField(models.IntegerField(), default=list)
+    attachments = ArrayField(models.IntegerField(), default=list)
+
+    class Meta:
+        verbose_name = 'Tareas de fiscal'
+        verbose_name_plural = 'Tareas de fiscales'
+
+    @classmethod
+    def agregar(cls, fiscal_id, campo, id):
+        """
+        Agrega `id` al array `campo` de las tareas del fiscal (si no estaba), descartando
+        las más viejas si se pasa de ``CANTIDAD_MAXIMA``.
+        """
+        tabla = cls._meta.db_table
+        otro_campo = 'attachments' if campo == 'mesa_categorias' else 'mesa_categorias'
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                INSERT INTO {tabla} (fiscal_id, {campo}, {otro_campo})
+                VALUES (%s, ARRAY[%s]::integer[], '{{}}')
+                ON CONFLICT (fiscal_id) DO UPDATE
+                SET {campo} = (array_append({tabla}.{campo}, %s))[
+                    greatest(cardinality({tabla}.{campo}) + 2 - %s, 1):
+                ]
+                WHERE NOT {tabla}.{campo} @> ARRAY[%s]::integer[]
+            """, [fiscal_id, id, id, cls.CANTIDAD_MAXIMA, id])
+
+    @classmethod
+    def de_fiscal(cls, fiscal):
+        """
+        Devuelve los ids de (mesa_categorias, attachments) en los que trabajó el fiscal.
+        """
+        tareas = cls.objects.filter(fiscal=fiscal).values_list('mesa_categorias', 'attachments').first()
+        return tareas or ([], [])
+
+
+class FiscalesActivosPorMinuto(models.Model):
+    """
+    Cantidad de fiscales cuyo last_seen cae en cada minuto, para saber cuántes están actives
+    sumando unas pocas filas en lugar de contar sobre toda la tabla de fiscales.
+
+    Cada fiscal cuenta en el minuto de su último last_seen: al actualizarlo se pasa
+    del minuto anterior al nuevo.
+    """
+    minuto = models.DateTimeField(primary_key=True)
+    cantidad = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Fiscales activos por minuto'
+        verbose_name_plural = 'Fiscales activos por minuto'
+
+    @staticmethod
+    def truncar(momento):
+        return momento.replace(second=0, microsecond=0)
+
+    @classmethod
+    def desde(cls):
+        """
+        Primer minuto entero dentro de la ventana de actividad: se redondea hacia arriba
+        para no contar a quienes se vieron en el minuto partido antes del comienzo de la ventana.
+        """
+        inicio = timezone.now() - timedelta(seconds=settings.SESSION_TIMEOUT)
+        minuto = cls.truncar(inicio)
+        return minuto if minuto == inicio else minuto + timedelta(minutes=1)
+
+    @classmethod
+    def registrar(cls, anterior, actual):
+        """
+        Mueve al fiscal del minuto de su last_seen `anterior` (si lo tenía) al de `actual`,
+        y de paso descarta los minutos que ya quedaron fuera de la ventana.
+        """
+        minuto = cls.truncar(actual)
+        minuto_anterior = cls.truncar(anterior) if anterior else None
+        if minuto_anterior == minuto:
+            return
+        desde = cls.desde()
+        tabla = cls._meta.db_table
+        with connection.cursor() as cursor:
+            # La baja y la limpieza tocan filas disjuntas: no se puede modificar
+            # dos veces la misma fila en una sentencia.
+            cursor.execute(f"""
+                WITH baja AS (
+                    UPDATE {tabla} SET cantidad = {tabla}.cantidad - 1
+                    WHERE minuto = %s AND minuto >= %s
+                ), viejos AS (
+                    DELETE FROM {tabla} WHERE minuto < %s AND minuto <> %s
+                )
+                INSERT INTO {tabla} (minuto, cantidad) VALUES (%s, 1)
+                ON CONFLICT (minuto) DO UPDATE SET cantidad = {tabla}.cantidad + 1
+            """, [minuto_anterior, desde, desde, minuto, minuto])
+
+    @classmethod
+    def activos(cls):
+        """
+        Cantidad de fiscales vistos en los últimos settings.SESSION_TIMEOUT segundos
+        (con resolución de un minuto).
+        """
+        return cls.objects.filter(minuto__gte=cls.desde()).aggregate(total=Sum('cantidad'))['total'] or 0
+
+    @classmethod
+    def recalcular(cls):
+        """
+        Reconstruye los minutos de la ventana a partir del last_seen de los fiscales, corrigiendo
+        desfasajes, y descarta los anteriores.
+        """
+        desde = cls.desde()
+        por_minuto = Fiscal.objects.filter(last_seen__gte=desde).annotate(
+            minuto=Trunc('last_seen', 'minute')
+        ).values('minuto').annotate(cantidad=Count('id')).values_list('minuto', 'cantidad').order_by()
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(
+                cls(minuto=minuto, cantidad=cantidad) for minuto, cantidad in por_minuto
+            )
+
+
 @receiver(post_save, sender=Fiscal)
 def crear_user_y_codigo_para_fiscal(sender, instance=None, created=False, update_fields=None, **kwargs):
     """
@@ -365,3 +500,15 @@ def crear_user_y_codigo_para_fiscal(sender, instance=None, created=False, update
 def borrar_user_para_fiscal(sender, instance=None, **kwargs):
     if instance.user:
         instance.user.delete()
+
+
+@receiver(post_save, sender=Carga)
+def registrar_carga_del_fiscal(sender, instance=None, created=False, **kwargs):
+    if created:
+        TareasDeFiscal.agregar(instance.fiscal_id, 'mesa_categorias', instance.mesa_categoria_id)
+
+
+@receiver(post_save, sender=Identificacion)
+def registrar_identificacion_del_fiscal(sender, instance=None, created=False, **kwargs):
+    if created and instance.fiscal_id:
+        TareasDeFiscal.agregar(instance.fiscal_id, 'attachments', instance.attachment_id)
@@ -1,4 +1,7 @@
 import pytest
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
 from django.db.utils import IntegrityError
 from django.urls import reverse
 from elecciones.tests.factories import (
@@ -11,7 +14,7 @@ from elecciones.tests.factories import (
     VotoMesaReportadoFactory,
 )
 from elecciones.models import Opcion, MesaCategoria
-from fiscales.models import CodigoReferido
+from fiscales.models import CodigoReferido, FiscalesActivosPorMinuto
 
 
 
@@ -106,3 +109,36 @@ def test_datos_previos_desde_metadata(db):
     # esa mesa categoria incluye la metadata ya cargada en mc1
     assert mc2.datos_previos('parcial') == {o1.id: 10}
     assert mc2.datos_previos('total') == {o1.id: 10}
+
+
+def test_fiscales_activos_por_minuto(db):
+    ahora = timezone.now()
+    f1, f2, f3 = FiscalFactory.create_batch(3)
+    f1.update_last_seen(ahora - timedelta(minutes=3))
+    f2.update_last_seen(ahora - timedelta(minutes=20))
+    assert FiscalesActivosPorMinuto.activos() == 1
+
+    # Cada fiscal cuenta una sola vez, en el minuto de su último last_seen.
+    f1.update_last_seen(ahora)
+    f2.update_last_seen(ahora)
+    f3.update_last_seen(ahora)
+    assert FiscalesActivosPorMinuto.activos() == 3
+    assert sum(FiscalesActivosPorMinuto.objects.values_list('cantidad', flat=True)) == 3
+
+    FiscalesActivosPorMinuto.objects.all().delete()
+    FiscalesActivosPorMinuto.recalcular()
+    assert FiscalesActivosPorMinuto.activos() == 3
+
+
+def test_fiscales_activos_por_minuto_no_amplia_la_ventana(db, mocker):
+    ahora = timezone.now().replace(second=30, microsecond=0)
+    mocker.patch('fiscales.models.timezone.now', return_value=ahora)
+    f1, f2 = FiscalFactory.create_batch(2)
+    # Visto en el mismo minuto que el comienzo de la ventana pero antes de él.
+    f1.update_last_seen(ahora - timedelta(seconds=settings.SESSION_TIMEOUT + 10))
+    f2.update_last_seen(ahora - timedelta(seconds=settings.SESSION_TIMEOUT - 40))
+    assert FiscalesActivosPorMinuto.activos() == 1
+
+    # Al registrar a f2 se descartó el minuto de f1, que quedó fuera de la ventana.
+    desde = FiscalesActivosPorMinuto.desde()
+    assert not FiscalesActivosPorMinuto.objects.filter(minuto__lt=desde).exists()
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django_admin_row_actions import AdminRowActionsMixin
 
-from .models import ColaCargasPendientes
+from .models import CircuitoPrioritario, ColaCargasPendientes
 
 
 class ColaCargasPendientesAdmin(AdminRowActionsMixin, admin.ModelAdmin):
@@ -20,4 +20,13 @@ class ColaCargasPendientesAdmin(AdminRowActionsMixin, admin.ModelAdmin):
     get_status.short_description = "Status mesacat"
 
 
+class CircuitoPrioritarioAdmin(admin.ModelAdmin):
+    raw_id_fields = ('circuito',)
+    list_display = ['circuito', 'categoria', 'cant_mesas_necesarias']
+    list_editable = ['cant_mesas_necesarias']
+    list_filter = ['categoria']
+    search_fields = ['circuito__nombre', 'circuito__numero', 'circuito__seccion__nombre']
+
+
 admin.site.register(ColaCargasPendientes, ColaCargasPendientesAdmin)
+admin.site.register(CircuitoPrioritario, CircuitoPrioritarioAdmin)
@@ -0,0 +1,336 @@
+"""
+Implementaciones de la cola de tareas que consultan los fiscales al pedir su siguiente acción.
+
+- ``ColaEnBase``: la tabla ``ColaCargasPendientes``. Cada pedido hace un
+  ``select_for_update(skip_locked=True)`` ordenado, eventualmente otro por afinidad
+  geográfica, y un DELETE.
+
+- ``ColaEnMemoriaRemota``: un proceso aparte (comando ``servidor_cola_tareas``) mantiene la cola
+  en memoria, con un heap general y uno por distrito y por sección. La carga desde la tabla al
+  arrancar (y la reconcilia periódicamente); cuando el scheduler modifica la tabla le avisa sólo
+  qué tareas agregó o sacó. Cada pedido es un pop en memoria (salteando las tareas en las que ya
+  trabajó le fiscal, si corresponde) y un DELETE por clave primaria; si la transacción del pedido
+  se revierte, la tarea se devuelve a la cola. Si el proceso no responde se usa la tabla.
+
+La tabla sigue siendo la fuente de verdad: la escribe el scheduler y de ella se recupera la cola
+en memoria si el proceso se reinicia.
+"""
+import heapq
+import threading
+import time
+from collections import defaultdict
+from multiprocessing import ProcessError
+from multiprocessing.managers import BaseManager, RemoteError
+
+import structlog
+from constance import config
+from django.conf import settings
+
+from adjuntos.models import Attachment
+from elecciones.models import MesaCategoria
+from fiscales.models import TareasDeFiscal
+from .models import ColaCargasPendientes, MetricasColaPorMinuto, count_active_sessions
+
+logger = structlog.get_logger(__name__)
+
+# Lo que se guarda en memoria de cada elemento de la cola.
+CAMPOS_TAREA = ['id', 'orden', 'mesa_categoria_id', 'attachment_id', 'distrito_id', 'seccion_id']
+
+# Segundos durante los cuales una tarea entregada no se vuelve a cargar desde la tabla
+# (da tiempo a que se confirme el DELETE de quien la pidió).
+SEGUNDOS_RESERVA_TAREA_ENTREGADA = 60
+
+# Errores al hablar con el proceso de la cola en memoria (caído, reiniciado, con otra clave
+# o que falló al atender el pedido): en esos casos se usa la tabla.
+ERRORES_COLA_EN_MEMORIA = (OSError, EOFError, ProcessError, RemoteError)
+
+
+def tareas_en_la_tabla():
+    return list(ColaCargasPendientes.objects.values_list(*CAMPOS_TAREA))
+
+
+class ColaEnMemoria():
+    """
+    Cola de prioridad por `orden`, con sub-colas por distrito y por sección para la afinidad
+    geográfica. Las entradas de los heaps que ya no corresponden a una tarea de la cola (porque
+    salió por otra sub-cola, se quitó o cambió de orden) se descartan al llegar al tope.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entregadas = {}
+        self.cargar([])
+
+    def depurar_entregadas(self):
+        ahora = time.monotonic()
+        self.entregadas = {
+            id: momento for id, momento in self.entregadas.items()
+            if ahora - momento < SEGUNDOS_RESERVA_TAREA_ENTREGADA
+        }
+
+    def cargar(self, tareas):
+        """
+        Reemplaza el contenido de la cola por `tareas` (tuplas con los `CAMPOS_TAREA`),
+        salvo las que se entregaron hace poco.
+        """
+        with self.lock:
+            self.depurar_entregadas()
+            self.tareas = {tarea[0]: tarea for tarea in tareas if tarea[0] not in self.entregadas}
+            self.general = []
+            self.por_distrito = defaultdict(list)
+            self.por_seccion = defaultdict(list)
+            for id, orden, _, _, distrito_id, seccion_id in self.tareas.values():
+                self.general.append((orden, id))
+                self.por_distrito[distrito_id].append((orden, id))
+                self.por_seccion[seccion_id].append((orden, id))
+            for heap in [self.general, *self.por_distrito.values(), *self.por_seccion.values()]:
+                heapq.heapify(heap)
+
+    def agregar(self, tareas):
+        """
+        Agrega `tareas` a la cola, o les actualiza el orden si ya estaban,
+        salvo las que se entregaron hace poco.
+        """
+        with self.lock:
+            self.depurar_entregadas()
+            for tarea in tareas:
+                id, orden, _, _, distrito_id, seccion_id = tarea
+                if id in self.entregadas or self.tareas.get(id) == tarea:
+                    continue
+                self.tareas[id] = tarea
+                heapq.heappush(self.general, (orden, id))
+                heapq.heappush(self.por_distrito[distrito_id], (orden, id))
+                heapq.heappush(self.por_seccion[seccion_id], (orden, id))
+
+    def devolver(self, tarea):
+        """
+        Vuelve a poner en la cola una tarea entregada cuya entrega no se confirmó
+        (se revirtió la transacción que la borraba de la tabla).
+        """
+        with self.lock:
+            self.entregadas.pop(tarea[0], None)
+        self.agregar([tarea])
+
+    def quitar(self, ids):
+        """
+        Quita de la cola las tareas con esos ids. Sus entradas en los heaps se descartan
+        cuando llegan al tope.
+        """
+        with self.lock:
+            for id in ids:
+                self.tareas.pop(id, None)
+
+    def vigente(self, entrada):
+        orden, id = entrada
+        return id in self.tareas and self.tareas[id][1] == orden
+
+    def primera(self, heap, excluidas=None):
+        # Las excluidas quedan en la cola para otres fiscales: se sacan del heap mientras se
+        # busca y después se vuelven a poner, así que sólo se recorren las que están adelante.
+        salteadas = []
+        tarea = None
+        while heap:
+            if not self.vigente(heap[0]):
+                heapq.heappop(heap)
+            elif excluidas is not None and excluidas(self.tareas[heap[0][1]]):
+                salteadas.append(heapq.heappop(heap))
+            else:
+                tarea = self.tareas[heap[0][1]]
+                break
+        for entrada in salteadas:
+            heapq.heappush(heap, entrada)
+        return tarea
+
+    def siguiente(self, distrito_id=None, seccion_id=None, bonus_afinidad=None,
+                  excluir_mesa_categorias=None, excluir_attachments=None):
+        """
+        Saca y devuelve la tarea más prioritaria. Si se indica un distrito o una sección afín,
+        se prefiere la más prioritaria de ahí: siempre si `bonus_afinidad` es None, o si no está
+        más de `bonus_afinidad` lugares detrás de la primera.
+
+        Se saltean las tareas cuya mesa_categoria o attachment esté en los conjuntos a excluir.
+        """
+        excluidas = None
+        if excluir_mesa_categorias or excluir_attachments:
+            excluir_mesa_categorias = excluir_mesa_categorias or set()
+            excluir_attachments = excluir_attachments or set()
+
+            def es_excluida(tarea):
+                return tarea[2] in excluir_mesa_categorias or tarea[3] in excluir_attachments
+            excluidas = es_excluida
+
+        with self.lock:
+            tarea = self.primera(self.general, excluidas)
+            if tarea is None:
+                return None
+            if seccion_id is not None:
+                tarea_afin = self.primera(self.por_seccion.get(seccion_id, []), excluidas)
+            elif distrito_id is not None:
+                tarea_afin = self.primera(self.por_distrito.get(distrito_id, []), excluidas)
+            else:
+                tarea_afin = None
+            if tarea_afin and (bonus_afinidad is None or tarea_afin[1] - bonus_afinidad <= tarea[1]):
+                tarea = tarea_afin
+            del self.tareas[tarea[0]]
+            self.entregadas[tarea[0]] = time.monotonic()
+            return tarea
+
+    def largo(self):
+        with self.lock:
+            return len(self.tareas)
+
+
+class ServidorColaTareas(BaseManager):
+    pass
+
+
+ServidorColaTareas.register('cola')
+
+
+def conectar_cola_en_memoria():
+    servidor = ServidorColaTareas(
+        address=settings.COLA_TAREAS_EN_MEMORIA_DIRECCION,
+        authkey=settings.COLA_TAREAS_EN_MEMORIA_CLAVE,
+    )
+    servidor.connect()
+    return servidor.cola()
+
+
+class ColaEnBase():
+
+    def siguiente_tarea(self, fiscal=None, modo_ub=False):
+        """
+        Saca la siguiente tarea para le fiscal y registra el pedido en las métricas de la cola.
+        """
+        inicio = time.monotonic()
+        self.saltos = 0
+        mesa_categoria, attachment = self.tomar_tarea(fiscal, modo_ub)
+        MetricasColaPorMinuto.registrar(
+            pedidos=1,
+            pedidos_sin_tarea=int(mesa_categoria is None and attachment is None),
+            segundos_pedidos=time.monotonic() - inicio,
+            saltos=self.saltos,
+            asignaciones_cargas=int(mesa_categoria is not None),
+            asignaciones_identificaciones=int(attachment is not None),
+        )
+        return (mesa_categoria, attachment)
+
+    def tomar_tarea(self, fiscal=None, modo_ub=False):
+        return ColaCargasPendientes.siguiente_tarea(fiscal, modo_ub)
+
+    def devolver_tarea(self):
+        """
+        Se invoca si se revirtió la transacción en la que se tomó la última tarea.
+        En la tabla el rollback deshace el DELETE, así que no hay nada que hacer.
+        """
+        pass
+
+    def notificar_cambios(self, agregadas=None, quitadas=None):
+        """
+        Se invoca después de modificar la tabla de la cola, con las tareas agregadas o
+        reordenadas (un queryset de ``ColaCargasPendientes``) y los ids de las que se sacaron.
+        Sin parámetros indica que cambió toda la cola.
+        """
+        pass
+
+
+class ColaEnMemoriaRemota(ColaEnBase):
+
+    def __init__(self, cola=None):
+        self.cola = cola
+        self.tarea_tomada = None
+
+    def cola_en_memoria(self):
+        if self.cola is None:
+            self.cola = conectar_cola_en_memoria()
+        return self.cola
+
+    def tomar_tarea(self, fiscal=None, modo_ub=False):
+        parametros = dict(bonus_afinidad=None if modo_ub else config.BONUS_AFINIDAD_GEOGRAFICA)
+        # Con pocos usuaries se excluyen las tareas en las que el fiscal estuvo involucrade.
+        if fiscal and count_active_sessions() < config.UMBRAL_EXCLUIR_TAREAS_FISCAL:
+            mesa_categorias, attachments = TareasDeFiscal.de_fiscal(fiscal)
+            parametros['excluir_mesa_categorias'] = set(mesa_categorias)
+            parametros['excluir_attachments'] = set(attachments)
+
+        if fiscal and modo_ub:
+            if fiscal.seccion_id:
+                parametros['seccion_id'] = fiscal.seccion_id
+            else:
+                parametros['distrito_id'] = fiscal.distrito_id
+        elif fiscal and fiscal.distrito_afin_id:
+            parametros['distrito_id'] = fiscal.distrito_afin_id
+
+        self.tarea_tomada = None
+        try:
+            while True:
+                tarea = self.cola_en_memoria().siguiente(**parametros)
+                if tarea is None:
+                    return (None, None)
+                self.tarea_tomada = tarea
+                id, _, mesa_categoria_id, attachment_id, distrito_id, _ = tarea
+                # Si ya no está en la tabla la tomó alguien por otro camino (o la sacó el scheduler).
+                # Con el distrito sólo se busca en su partición.
+                borradas, _ = ColaCargasPendientes.objects.filter(id=id, distrito_id=distrito_id).delete()
+                if borradas:
+                    break
+                self.tarea_tomada = None
+                self.saltos += 1
+
+            if mesa_categoria_id:
+                return (MesaCategoria.objects.get(id=mesa_categoria_id), None)
+            return (None, Attachment.objects.get(id=attachment_id))
+        except ERRORES_COLA_EN_MEMORIA as e:
+            logger.error('Cola en memoria', error=str(e))
+            self.cola = None
+            return super().tomar_tarea(fiscal, modo_ub)
+        except Exception:
+            self.devolver_tarea()
+            raise
+
+    def devolver_tarea(self):
+        """
+        La cola en memoria ya entregó la tarea: si se revirtió la transacción que la borraba
+        de la tabla, se la vuelve a poner para que no espere a la próxima recarga.
+        """
+        tarea, self.tarea_tomada = self.tarea_tomada, None
+        if tarea is None:
+            return
+        try:
+            self.cola_en_memoria().devolver(tarea)
+        except ERRORES_COLA_EN_MEMORIA as e:
+            logger.error('Cola en memoria', error=str(e))
+            self.cola = None
+
+    def notificar_cambios(self, agregadas=None, quitadas=None):
+        try:
+            if agregadas is None and quitadas is None:
+                self.cola_en_memoria().cargar(tareas_en_la_tabla())
+                return
+            if quitadas:
+                self.cola_en_memoria().quitar(list(quitadas))
+            if agregadas is not None:
+                self.cola_en_memoria().agregar(list(agregadas.values_list(*CAMPOS_TAREA)))
+        except ERRORES_COLA_EN_MEMORIA as e:
+            logger.error('Cola en memoria', error=str(e))
+            self.cola = None
+
+
+COLAS = {
+    'base': ColaEnBase,
+    'memoria': ColaEnMemoriaRemota,
+}
+
+_cola_de_tareas = threading.local()
+
+
+def cola_de_tareas():
+    """
+    Devuelve la cola de tareas configurada en ``settings.COLA_TAREAS``
+    (una por hilo, porque mantiene la conexión al proceso de la cola en memoria).
+    """
+    cola = getattr(_cola_de_tareas, 'cola', None)
+    if type(cola) is not COLAS[settings.COLA_TAREAS]:
+        cola = COLAS[settings.COLA_TAREAS]()
+        _cola_de_tareas.cola = cola
+    return cola
@@ -1,10 +1,12 @@
 import time
 import structlog
 
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 from constance import config
 from sentry_sdk import capture_message
-from scheduling.scheduler import scheduler
+from elecciones.models import Distrito
+from scheduling.scheduler import reconstruir_cola_de_distrito, scheduler, scheduler_incremental
 from adjuntos.management.commands.consolidar_identificaciones_y_cargas import consolidador
 
 logger = structlog.get_logger('scheduler')
@@ -24,13 +26,47 @@ class Command(BaseCommand):
             type=int, default=100,
             help="Cantidad de rondas de consolidación antes de vaciar la cola (default %(default)s)."
         )
+        parser.add_argument(
+            "--incremental",
+            default=settings.SCHEDULER_INCREMENTAL, action="store_true",
+            help="Encola a partir de las novedades de la consolidación en lugar de recorrer todas las "
+            "tareas pendientes en cada ronda. La cola se reconstruye igual cada "
+            "--cant_rondas_antes_de_reconstruir_la_cola rondas para corregir desfasajes. "
+            "Requiere settings.SCHEDULER_INCREMENTAL, que es también el valor por defecto."
+        )
         parser.add_argument(
             "--no_llamar_al_consolidador",
             default=False, action="store_true", dest="no_llamar_al_consolidador",
             help="Si está este flag no se llama al consolidador."
         )
+        parser.add_argument(
+            "--reconstruir_distrito",
+            metavar="NUMERO",
+            help="Reconstruye sólo las tareas encoladas del distrito con ese número, sin tocar las "
+            "de los demás, y termina."
+        )
 
     def handle(self, *args, **options):
+        if options['reconstruir_distrito']:
+            distrito = Distrito.objects.filter(numero=options['reconstruir_distrito']).first()
+            if distrito is None:
+                raise CommandError(f"No existe el distrito nro {options['reconstruir_distrito']}.")
+            (cant_tareas, cant_cargas, cant_ident) = reconstruir_cola_de_distrito(distrito.id)
+            logger.info(
+                'Cola del distrito reconstruida',
+                distrito=distrito.numero,
+                tareas=cant_tareas,
+                cargas=cant_cargas,
+                identificaciones=cant_ident,
+            )
+            return
+
+        if options['incremental'] and not settings.SCHEDULER_INCREMENTAL:
+            raise CommandError(
+                "El modo incremental requiere SCHEDULER_INCREMENTAL=True, para que la "
+                "consolidación registre las novedades."
+            )
+
         self.ronda_consolidador = 0
         finalizar = False
         while not finalizar:
@@ -51,13 +87,18 @@ class Command(BaseCommand):
             reconstruir_la_cola = False
 
         try:
-            (cant_tareas, cant_cargas, cant_ident) = scheduler(reconstruir_la_cola)
+            incremental = options['incremental'] and not reconstruir_la_cola
+            if incremental:
+                (cant_tareas, cant_cargas, cant_ident) = scheduler_incremental()
+            else:
+                (cant_tareas, cant_cargas, cant_ident) = scheduler(reconstruir_la_cola)
             logger.debug(
                 'Encolado',
                 tareas=cant_tareas,
                 cargas=cant_cargas,
                 identificaciones=cant_ident,
                 reconstruir_la_cola=reconstruir_la_cola,
+                incremental=incremental,
             )
         except Exception as e:
             # Logueamos la excepción y continuamos.
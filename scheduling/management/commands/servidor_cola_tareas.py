@@ -0,0 +1,70 @@
+import threading
+import time
+import structlog
+
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.db import close_old_connections
+from sentry_sdk import capture_message
+from scheduling.cola_tareas import ColaEnMemoria, ServidorColaTareas, tareas_en_la_tabla
+
+logger = structlog.get_logger('servidor_cola_tareas')
+
+
+class Servidor(ServidorColaTareas):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Mantiene en memoria la cola de tareas para los fiscales (con settings.COLA_TAREAS = 'memoria'). "
+        "La carga desde la tabla ColaCargasPendientes al arrancar y la reconcilia periódicamente; "
+        "entre tanto el scheduler le avisa qué tareas agrega o saca."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--pausa_recarga",
+            type=int, default=300,
+            help="Cada cuántos segundos se recarga la cola entera desde la tabla, por si se perdió "
+            "algún aviso del scheduler (default %(default)s)."
+        )
+
+    def handle(self, *args, **options):
+        if not settings.COLA_TAREAS_EN_MEMORIA_CLAVE:
+            raise CommandError(
+                'Falta definir la clave de la cola en memoria '
+                '(variable de entorno COLA_TAREAS_EN_MEMORIA_CLAVE).'
+            )
+        cola = ColaEnMemoria()
+        cola.cargar(tareas_en_la_tabla())
+        logger.info('Cola en memoria cargada', tareas=cola.largo())
+
+        recarga = threading.Thread(target=self.recargar, args=(cola, options['pausa_recarga']), daemon=True)
+        recarga.start()
+
+        Servidor.register('cola', callable=lambda: cola)
+        servidor = Servidor(
+            address=settings.COLA_TAREAS_EN_MEMORIA_DIRECCION,
+            authkey=settings.COLA_TAREAS_EN_MEMORIA_CLAVE,
+        ).get_server()
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+    def recargar(self, cola, pausa):
+        while True:
+            time.sleep(pausa)
+            try:
+                close_old_connections()
+                cola.cargar(tareas_en_la_tabla())
+                logger.debug('Cola en memoria recargada', tareas=cola.largo())
+            except Exception as e:
+                # Logueamos la excepción y continuamos.
+                capture_message(
+                    f"""
+                    Excepción {e} al recargar la cola en memoria.
+                    """
+                )
+                logger.error('Cola en memoria', error=str(e))
@@ -0,0 +1,82 @@
+import threading
+import time
+import structlog
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.db import close_old_connections, connection
+from sentry_sdk import capture_message
+from scheduling.metricas import formato_prometheus, resumen
+from scheduling.models import MetricasColaPorMinuto
+
+logger = structlog.get_logger('metricas_cola')
+
+
+class Metricas(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        try:
+            cuerpo = formato_prometheus(resumen()).encode()
+        except Exception as e:
+            logger.error('Métricas de la cola', error=str(e))
+            self.send_error(500)
+            return
+        finally:
+            connection.close()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, format, *args):
+        logger.debug('Pedido de métricas', pedido=format % args)
+
+
+class Command(BaseCommand):
+    help = (
+        "Expone en formato Prometheus (en /metrics, en settings.METRICAS_COLA_DIRECCION) el estado "
+        "de la cola de tareas y sus métricas del último minuto, y loguea un resumen cada minuto."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--horas_a_conservar",
+            type=int, default=24,
+            help="Horas de métricas por minuto que se conservan en la base (default %(default)s)."
+        )
+
+    def handle(self, *args, **options):
+        resumen_por_minuto = threading.Thread(
+            target=self.loguear_resumen, args=(options['horas_a_conservar'],), daemon=True
+        )
+        resumen_por_minuto.start()
+
+        servidor = ThreadingHTTPServer(settings.METRICAS_COLA_DIRECCION, Metricas)
+        logger.info('Servidor de métricas de la cola', direccion=settings.METRICAS_COLA_DIRECCION)
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+    def loguear_resumen(self, horas_a_conservar):
+        while True:
+            # Se espera a que termine el minuto (y un poco más, para que se vuelquen sus contadores).
+            time.sleep(60 - time.time() % 60 + MetricasColaPorMinuto.SEGUNDOS_VOLCADO)
+            try:
+                close_old_connections()
+                logger.info('Métricas de la cola', **resumen())
+                MetricasColaPorMinuto.depurar(horas_a_conservar)
+            except Exception as e:
+                # Logueamos la excepción y continuamos.
+                capture_message(
+                    f"""
+                    Excepción {e} al resumir las métricas de la cola.
+                    """
+                )
+                logger.error('Métricas de la cola', error=str(e))
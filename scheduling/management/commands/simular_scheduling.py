@@ -0,0 +1,152 @@
+import csv
+
+from constance import config
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from scheduling.simulador import CURVAS, METRICAS, Simulador, llegadas_registradas, llegadas_sinteticas
+
+
+class Command(BaseCommand):
+    help = (
+        "Simula la llegada de actas y el trabajo de N fiscales contra el scheduler, la cola de tareas y "
+        "la consolidación reales, y reporta mesas consolidadas por minuto, pedidos sin tarea y trabajo "
+        "de más. ¡Usar sólo en una base de pruebas!"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--actas", type=int, default=1000, help="Cantidad de actas que llegan (default %(default)s)."
+        )
+        parser.add_argument(
+            "--minutos_llegada", type=int, default=120,
+            help="Minutos en los que llegan las actas (default %(default)s)."
+        )
+        parser.add_argument(
+            "--curva", choices=CURVAS, default='campana',
+            help="Forma de la curva de llegada sintética (default %(default)s)."
+        )
+        parser.add_argument(
+            "--curva_registrada",
+            help="CSV con las columnas minuto y actas. Si se indica, reemplaza a la curva sintética."
+        )
+        parser.add_argument(
+            "--fiscales", type=int, default=50, help="Cantidad de fiscales (default %(default)s)."
+        )
+        parser.add_argument(
+            "--segundos_identificacion", type=float, default=30,
+            help="Duración media de una identificación (default %(default)s)."
+        )
+        parser.add_argument(
+            "--segundos_carga", type=float, default=90,
+            help="Duración media de una carga (default %(default)s)."
+        )
+        parser.add_argument(
+            "--segundos_espera_sin_tarea", type=float, default=15,
+            help="Cuánto espera le fiscal para volver a pedir si no hubo tarea (default %(default)s)."
+        )
+        parser.add_argument(
+            "--prob_error", type=float, default=0.02,
+            help="Probabilidad de identificar o cargar mal (default %(default)s)."
+        )
+        parser.add_argument(
+            "--prob_abandono", type=float, default=0.01,
+            help="Probabilidad de irse sin entregar una tarea (default %(default)s)."
+        )
+        parser.add_argument(
+            "--minutos", type=int,
+            help="Duración de la simulación (default: una hora después de la última acta)."
+        )
+        parser.add_argument(
+            "--incremental", default=False, action="store_true",
+            help="Usa el scheduler incremental, como el comando scheduler."
+        )
+        parser.add_argument(
+            "--cant_rondas_antes_de_reconstruir_la_cola", type=int, default=100,
+            help="Cantidad de rondas de consolidación antes de vaciar la cola (default %(default)s)."
+        )
+        parser.add_argument(
+            "--config", nargs='+', default=[], metavar='CLAVE=VALOR',
+            help="Valores de constance (p. ej. COEFICIENTE_IDENTIFICACION_VS_CARGA=2) o de settings "
+            "(p. ej. TIMEOUT_TAREAS=5) a usar durante la simulación."
+        )
+        parser.add_argument(
+            "--csv", help="Archivo donde guardar las métricas de cada minuto."
+        )
+        parser.add_argument(
+            "--semilla", type=int, default=42, help="Semilla aleatoria (default %(default)s)."
+        )
+
+    def parametros(self, valores):
+        """
+        Devuelve {clave: (es_de_constance, valor)} con los valores convertidos al tipo de cada clave.
+        """
+        parametros = {}
+        for clave_valor in valores:
+            clave, _, valor = clave_valor.partition('=')
+            if clave in settings.CONSTANCE_CONFIG:
+                default, *_, tipo = settings.CONSTANCE_CONFIG[clave]
+                tipo = tipo if isinstance(tipo, type) else type(default)
+                es_de_constance = True
+            elif hasattr(settings, clave):
+                tipo = type(getattr(settings, clave))
+                es_de_constance = False
+            else:
+                raise CommandError(f'{clave} no es un valor de constance ni de settings.')
+            if tipo is bool:
+                valor = valor.lower() in ('1', 'true', 'si', 'sí')
+            parametros[clave] = (es_de_constance, tipo(valor))
+        return parametros
+
+    def handle(self, *args, **options):
+        if options['curva_registrada']:
+            with open(options['curva_registrada']) as archivo:
+                llegadas = llegadas_registradas(archivo, options['semilla'])
+        else:
+            llegadas = llegadas_sinteticas(
+                options['actas'], options['minutos_llegada'], options['curva'], options['semilla']
+            )
+
+        simulador = Simulador(
+            llegadas,
+            cant_fiscales=options['fiscales'],
+            segundos_identificacion=options['segundos_identificacion'],
+            segundos_carga=options['segundos_carga'],
+            segundos_espera_sin_tarea=options['segundos_espera_sin_tarea'],
+            prob_error=options['prob_error'],
+            prob_abandono=options['prob_abandono'],
+            minutos=options['minutos'],
+            incremental=options['incremental'],
+            cant_rondas_antes_de_reconstruir_la_cola=options['cant_rondas_antes_de_reconstruir_la_cola'],
+            semilla=options['semilla'],
+            log=self.stdout.write if options['verbosity'] > 1 else None,
+        )
+
+        if options['incremental']:
+            # Para que la consolidación registre las novedades que consume el scheduler incremental.
+            options['config'].append('SCHEDULER_INCREMENTAL=True')
+
+        # Se restauran los valores originales al terminar.
+        originales = {}
+        try:
+            for clave, (es_de_constance, valor) in self.parametros(options['config']).items():
+                objeto = config if es_de_constance else settings
+                originales[clave] = (objeto, getattr(objeto, clave))
+                setattr(objeto, clave, valor)
+            minutos = simulador.correr()
+        except ValueError as e:
+            raise CommandError(str(e))
+        finally:
+            for clave, (objeto, valor) in originales.items():
+                setattr(objeto, clave, valor)
+
+        if options['csv']:
+            with open(options['csv'], 'w') as archivo:
+                escritor = csv.writer(archivo)
+                escritor.writerow(['minuto'] + METRICAS)
+                for i, minuto in enumerate(minutos):
+                    escritor.writerow([i] + [minuto[metrica] for metrica in METRICAS])
+            self.stdout.write(f"Métricas por minuto guardadas en {options['csv']}.")
+
+        for clave, valor in simulador.resumen().items():
+            self.stdout.write(f'{clave:<20}{valor}')
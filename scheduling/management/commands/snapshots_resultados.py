@@ -0,0 +1,52 @@
+import time
+import structlog
+
+from django.core.management.base import BaseCommand
+from constance import config
+from sentry_sdk import capture_message
+from elecciones.evolucion_resultados import tomar_snapshots
+from elecciones.models import TIPOS_DE_AGREGACIONES
+
+logger = structlog.get_logger('snapshots_resultados')
+
+
+class Command(BaseCommand):
+    help = "Guarda periódicamente snapshots de los resultados para mostrar su evolución."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tipo_de_agregacion",
+            nargs='+', default=[TIPOS_DE_AGREGACIONES.todas_las_cargas],
+            choices=[tipo for tipo, _ in TIPOS_DE_AGREGACIONES],
+            help="Tipos de agregación para los que se toman snapshots (default %(default)s)."
+        )
+        parser.add_argument(
+            "--una_vez",
+            default=False, action="store_true", dest="una_vez",
+            help="Toma los snapshots una sola vez y termina."
+        )
+
+    def handle(self, *args, **options):
+        finalizar = False
+        while not finalizar:
+            try:
+                self.una_ronda(options)
+                if options['una_vez']:
+                    break
+                time.sleep(config.PAUSA_SNAPSHOTS_RESULTADOS)
+            except KeyboardInterrupt:
+                finalizar = True
+
+    def una_ronda(self, options):
+        for tipo_de_agregacion in options['tipo_de_agregacion']:
+            try:
+                creados = tomar_snapshots(tipo_de_agregacion=tipo_de_agregacion)
+                logger.debug('Snapshots', creados=creados, tipo_de_agregacion=tipo_de_agregacion)
+            except Exception as e:
+                # Logueamos la excepción y continuamos.
+                capture_message(
+                    f"""
+                    Excepción {e} al tomar snapshots de resultados.
+                    """
+                )
+                logger.error('Snapshots', error=str(e))
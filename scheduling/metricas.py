@@ -0,0 +1,95 @@
+"""
+Telemetría de la cola de tareas, para detectar una cola que se vacía o que no avanza antes de
+que les fiscales empiecen a ver "no hay acción".
+
+- Estado actual de la cola: cantidad de tareas por tipo y antigüedad de la más vieja.
+- Por minuto (``MetricasColaPorMinuto``): pedidos de ``siguiente_tarea``, los que no obtuvieron
+  tarea, su demora media, las tareas salteadas porque las había tomado otre, asignaciones por
+  tipo, cargas e identificaciones completadas y tareas vencidas al liberarlas por timeout.
+
+Se exponen en formato de texto de Prometheus con el comando ``servidor_metricas_cola``,
+que además loguea un resumen por minuto.
+"""
+from datetime import timedelta
+
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from fiscales.models import FiscalesActivosPorMinuto
+from .models import ColaCargasPendientes, MetricasColaPorMinuto
+
+# Nombre, descripción y series (etiquetas, clave del resumen) de cada métrica de Prometheus.
+METRICAS_PROMETHEUS = [
+    ('escrutinio_cola_tareas', 'Tareas en la cola por tipo.', [
+        ({'tipo': 'carga'}, 'tareas_carga'),
+        ({'tipo': 'identificacion'}, 'tareas_identificacion'),
+    ]),
+    ('escrutinio_cola_antiguedad_segundos', 'Segundos que lleva en la cola la tarea más vieja.', [
+        ({}, 'antiguedad_segundos'),
+    ]),
+    ('escrutinio_cola_pedidos_por_minuto', 'Pedidos de siguiente tarea en el último minuto.', [
+        ({'resultado': 'con_tarea'}, 'pedidos_con_tarea'),
+        ({'resultado': 'sin_tarea'}, 'pedidos_sin_tarea'),
+    ]),
+    ('escrutinio_cola_demora_pedido_segundos', 'Demora media de los pedidos del último minuto.', [
+        ({}, 'demora_media_segundos'),
+    ]),
+    ('escrutinio_cola_saltos_por_minuto', 'Tareas salteadas porque las había tomado otre.', [
+        ({}, 'saltos'),
+    ]),
+    ('escrutinio_cola_asignaciones_por_minuto', 'Tareas asignadas en el último minuto.', [
+        ({'tipo': 'carga'}, 'asignaciones_cargas'),
+        ({'tipo': 'identificacion'}, 'asignaciones_identificaciones'),
+    ]),
+    ('escrutinio_cola_completadas_por_minuto', 'Tareas completadas en el último minuto.', [
+        ({'tipo': 'carga'}, 'cargas_completadas'),
+        ({'tipo': 'identificacion'}, 'identificaciones_completadas'),
+    ]),
+    ('escrutinio_cola_vencidas_por_minuto', 'Tareas liberadas por timeout en el último minuto.', [
+        ({}, 'tareas_vencidas'),
+    ]),
+]
+
+
+def estado_de_la_cola():
+    """
+    Cantidad de tareas de cada tipo en la cola y segundos que lleva la más vieja.
+    """
+    cola = ColaCargasPendientes.objects.aggregate(
+        tareas_carga=Count('id', filter=Q(attachment=None)),
+        tareas_identificacion=Count('id', filter=Q(mesa_categoria=None)),
+        mas_vieja=Min('creada'),
+    )
+    mas_vieja = cola.pop('mas_vieja')
+    cola['antiguedad_segundos'] = (timezone.now() - mas_vieja).total_seconds() if mas_vieja else 0
+    return cola
+
+
+def resumen(minuto=None):
+    """
+    Estado de la cola y contadores de `minuto` (por defecto, el último minuto completo).
+    """
+    if minuto is None:
+        minuto = FiscalesActivosPorMinuto.truncar(timezone.now()) - timedelta(minutes=1)
+    metricas = MetricasColaPorMinuto.objects.filter(minuto=minuto).first() or MetricasColaPorMinuto()
+
+    datos = estado_de_la_cola()
+    for campo in MetricasColaPorMinuto.contadores():
+        datos[campo] = getattr(metricas, campo)
+    datos['pedidos_con_tarea'] = metricas.pedidos - metricas.pedidos_sin_tarea
+    datos['demora_media_segundos'] = (
+        round(metricas.segundos_pedidos / metricas.pedidos, 4) if metricas.pedidos else 0
+    )
+    return datos
+
+
+def formato_prometheus(datos):
+    lineas = []
+    for nombre, descripcion, series in METRICAS_PROMETHEUS:
+        lineas.append(f'# HELP {nombre} {descripcion}')
+        lineas.append(f'# TYPE {nombre} gauge')
+        for etiquetas, clave in series:
+            etiquetas = ','.join(f'{etiqueta}="{valor}"' for etiqueta, valor in etiquetas.items())
+            serie = f'{nombre}{{{etiquetas}}}' if etiquetas else nombre
+            lineas.append(f'{serie} {datos[clave]}')
+    return '\n'.join(lineas) + '\n'
@@ -0,0 +1,44 @@
+# Generated by Django 2.2.2 on 2019-10-22 19:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elecciones', '0067_resumen_avance_carga'),
+        ('adjuntos', '0018_attachment_parent'),
+        ('scheduling', '0005_colacargaspendientes_seccion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadoresScheduler',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cant_fotos', models.IntegerField(default=0)),
+                ('cant_cargas', models.IntegerField(default=0)),
+                ('cant_cargas_parcial', models.IntegerField(default=0)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Contadores del scheduler',
+                'verbose_name_plural': 'Contadores del scheduler',
+            },
+        ),
+        migrations.CreateModel(
+            name='NovedadScheduler',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('era_pendiente', models.BooleanField(default=False)),
+                ('era_parcial_sensible', models.BooleanField(default=False)),
+                ('attachment', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='adjuntos.Attachment')),
+                ('mesa_categoria', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='elecciones.MesaCategoria')),
+            ],
+            options={
+                'verbose_name': 'Novedad para el scheduler',
+                'verbose_name_plural': 'Novedades para el scheduler',
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.2 on 2019-10-22 18:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elecciones', '0068_mesas_identificadas_circuito'),
+        ('scheduling', '0006_novedades_y_contadores_scheduler'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CircuitoPrioritario',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cant_mesas_necesarias', models.PositiveIntegerField()),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='circuitos_prioritarios', to='elecciones.Categoria')),
+                ('circuito', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prioridades_de_carga', to='elecciones.Circuito')),
+            ],
+            options={
+                'verbose_name': 'Circuito prioritario',
+                'verbose_name_plural': 'Circuitos prioritarios',
+                'unique_together': {('circuito', 'categoria')},
+            },
+        ),
+    ]
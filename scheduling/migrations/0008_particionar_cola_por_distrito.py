@@ -0,0 +1,129 @@
+# Generated by Django 2.2.2 on 2019-10-22 19:30
+
+import re
+
+from django.db import migrations
+
+TABLA = 'scheduling_colacargaspendientes'
+
+
+def recrear_cola(cursor, particionada):
+    """
+    Vuelve a crear la tabla de la cola, particionada por distrito o no, con los mismos datos,
+    índices y restricciones. Las restricciones de unicidad de una tabla particionada tienen que
+    incluir a la columna de partición, y no puede tener clave primaria sobre `id` (que sigue
+    siendo único porque lo da la secuencia).
+
+    Como PostgreSQL considera distintos a los NULL, las tareas sin distrito (por ejemplo, los
+    attachments sin preidentificación) no chocarían nunca: la partición `_sin_distrito` tiene
+    además sus propios índices únicos sin el distrito.
+    """
+    cursor.execute(
+        "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass", [TABLA]
+    )
+    restricciones = cursor.fetchall()
+    cursor.execute("SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s", [TABLA])
+    indices = [
+        (nombre, definicion) for nombre, definicion in cursor.fetchall()
+        if nombre not in {restriccion[0] for restriccion in restricciones}
+    ]
+
+    cursor.execute(f'ALTER TABLE {TABLA} RENAME TO {TABLA}_anterior')
+    particion = 'PARTITION BY LIST (distrito_id)' if particionada else ''
+    cursor.execute(f'CREATE TABLE {TABLA} (LIKE {TABLA}_anterior INCLUDING DEFAULTS) {particion}')
+    cursor.execute(f'ALTER SEQUENCE {TABLA}_id_seq OWNED BY {TABLA}.id')
+    if particionada:
+        cursor.execute(f'CREATE TABLE {TABLA}_sin_distrito PARTITION OF {TABLA} FOR VALUES IN (NULL)')
+        cursor.execute(f'CREATE TABLE {TABLA}_otros PARTITION OF {TABLA} DEFAULT')
+        cursor.execute('SELECT id FROM elecciones_distrito')
+        for distrito_id, in cursor.fetchall():
+            cursor.execute(
+                f'CREATE TABLE {TABLA}_{distrito_id} PARTITION OF {TABLA} FOR VALUES IN ({distrito_id})'
+            )
+    cursor.execute(f'INSERT INTO {TABLA} SELECT * FROM {TABLA}_anterior')
+    cursor.execute(f'DROP TABLE {TABLA}_anterior CASCADE')
+
+    for nombre, definicion in indices:
+        if nombre == f'{TABLA}_id':
+            cursor.execute(f'ALTER TABLE {TABLA} ADD PRIMARY KEY (id)')
+        else:
+            cursor.execute(definicion)
+    for nombre, tipo, definicion in restricciones:
+        if tipo == 'p':
+            cursor.execute(f'CREATE INDEX {TABLA}_id ON {TABLA} (id)')
+        elif tipo == 'u':
+            columnas = [
+                columna.strip() for columna in re.search(r'\((.*)\)', definicion).group(1).split(',')
+                if columna.strip() != 'distrito_id'
+            ]
+            if particionada:
+                cursor.execute(
+                    f'CREATE UNIQUE INDEX {TABLA}_sin_distrito_{columnas[0]} '
+                    f'ON {TABLA}_sin_distrito ({", ".join(columnas)})'
+                )
+                columnas.append('distrito_id')
+            cursor.execute(f'ALTER TABLE {TABLA} ADD CONSTRAINT {nombre} UNIQUE ({", ".join(columnas)})')
+        elif tipo in ('c', 'f'):
+            cursor.execute(f'ALTER TABLE {TABLA} ADD CONSTRAINT {nombre} {definicion}')
+
+
+UNICIDAD_ANTERIOR = {('mesa_categoria', 'numero_carga'), ('attachment', 'numero_carga')}
+UNICIDAD = {('mesa_categoria', 'numero_carga', 'distrito'), ('attachment', 'numero_carga', 'distrito')}
+
+
+def es_postgres_con_particiones(connection):
+    # Las restricciones de unicidad y las foreign keys en tablas particionadas son de PostgreSQL 11.
+    return connection.vendor == 'postgresql' and connection.pg_version >= 110000
+
+
+def indices_sin_distrito(schema_editor, crear):
+    """
+    Sin particiones, las tareas sin distrito quedan únicas con índices parciales.
+    """
+    for campo in ['mesa_categoria', 'attachment']:
+        indice = f'{TABLA}_{campo}_sin_distrito'
+        if crear:
+            schema_editor.execute(
+                f'CREATE UNIQUE INDEX {indice} ON {TABLA} ({campo}_id, numero_carga) '
+                f'WHERE distrito_id IS NULL'
+            )
+        else:
+            schema_editor.execute(f'DROP INDEX {indice}')
+
+
+def particionar(apps, schema_editor):
+    if es_postgres_con_particiones(schema_editor.connection):
+        with schema_editor.connection.cursor() as cursor:
+            recrear_cola(cursor, particionada=True)
+    else:
+        modelo = apps.get_model('scheduling', 'ColaCargasPendientes')
+        schema_editor.alter_unique_together(modelo, UNICIDAD_ANTERIOR, UNICIDAD)
+        indices_sin_distrito(schema_editor, crear=True)
+
+
+def desparticionar(apps, schema_editor):
+    if es_postgres_con_particiones(schema_editor.connection):
+        with schema_editor.connection.cursor() as cursor:
+            recrear_cola(cursor, particionada=False)
+    else:
+        modelo = apps.get_model('scheduling', 'ColaCargasPendientes')
+        indices_sin_distrito(schema_editor, crear=False)
+        schema_editor.alter_unique_together(modelo, UNICIDAD, UNICIDAD_ANTERIOR)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduling', '0007_circuitos_prioritarios'),
+    ]
+
+    operations = [
+        # La base cambia a mano; el estado registra la nueva unicidad, que incluye al distrito.
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(particionar, desparticionar)],
+            state_operations=[
+                migrations.AlterUniqueTogether(name='colacargaspendientes', unique_together=UNICIDAD),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.2 on 2019-10-22 20:10
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduling', '0008_particionar_cola_por_distrito'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricasColaPorMinuto',
+            fields=[
+                ('minuto', models.DateTimeField(primary_key=True, serialize=False)),
+                ('pedidos', models.IntegerField(default=0)),
+                ('pedidos_sin_tarea', models.IntegerField(default=0)),
+                ('segundos_pedidos', models.FloatField(default=0)),
+                ('saltos', models.IntegerField(default=0)),
+                ('asignaciones_cargas', models.IntegerField(default=0)),
+                ('asignaciones_identificaciones', models.IntegerField(default=0)),
+                ('cargas_completadas', models.IntegerField(default=0)),
+                ('identificaciones_completadas', models.IntegerField(default=0)),
+                ('tareas_vencidas', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Métricas de la cola por minuto',
+                'verbose_name_plural': 'Métricas de la cola por minuto',
+            },
+        ),
+        migrations.AddField(
+            model_name='colacargaspendientes',
+            name='creada',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
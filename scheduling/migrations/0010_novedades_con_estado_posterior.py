@@ -0,0 +1,32 @@
+# Generated by Django 2.2.2 on 2019-10-22 20:50
+
+from django.db import migrations, models
+
+
+# Las novedades pendientes no tienen el estado posterior al cambio: se descartan junto con los
+# contadores, que el scheduler vuelve a contar en su próxima ronda.
+DESCARTAR_NOVEDADES = """
+DELETE FROM scheduling_novedadscheduler;
+DELETE FROM scheduling_contadoresscheduler;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduling', '0009_metricas_cola'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='novedadscheduler',
+            name='es_parcial_sensible',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='novedadscheduler',
+            name='es_pendiente',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunSQL(DESCARTAR_NOVEDADES, migrations.RunSQL.noop),
+    ]
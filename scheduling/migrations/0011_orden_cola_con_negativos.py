@@ -0,0 +1,18 @@
+# Generated by Django 2.2.2 on 2019-10-22 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduling', '0010_novedades_con_estado_posterior'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='colacargaspendientes',
+            name='orden',
+            field=models.IntegerField(db_index=True),
+        ),
+    ]
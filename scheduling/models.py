@@ -1,14 +1,29 @@
+import bisect
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
 from django.db import models, transaction, connection
-from django.db.models import Q, F, ExpressionWrapper, Case, When
+from django.db.models import (
+    F, ExpressionWrapper, Case, When, Count, IntegerField, Min, OuterRef, Q, Subquery
+)
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.sessions.models import Session
 from django.utils import timezone
+from datetime import timedelta
 from django.conf import settings
 from constance import config
-from datetime import timedelta
+import structlog
 
-from elecciones.models import (Distrito, Seccion, Categoria, MesaCategoria)
-from adjuntos.models import Attachment
-from fiscales.models import Fiscal
+from elecciones.models import (Distrito, Seccion, Circuito, Categoria, MesaCategoria, Carga, Epoca)
+from adjuntos.models import Attachment, Identificacion
+from fiscales.models import FiscalesActivosPorMinuto, TareasDeFiscal
+
+logger = structlog.get_logger(__name__)
 
 
 class ColaCargasPendientes(models.Model):
@@ -17,18 +32,23 @@ class ColaCargasPendientes(models.Model):
     """
     mesa_categoria = models.ForeignKey(MesaCategoria, on_delete=models.CASCADE, null=True)
     attachment = models.ForeignKey(Attachment, on_delete=models.CASCADE, null=True)
-    # Este campo lo calcula el encolador.
-    orden = models.PositiveIntegerField(db_index=True)
+    # Este campo lo calcula el encolador. Los circuitos prioritarios se encolan con
+    # lugares anteriores al primero de la cola, que pueden ser negativos.
+    orden = models.IntegerField(db_index=True)
     numero_carga = models.PositiveIntegerField(default=1)
     # Denormalizaciones para facilitar el cálculo de afinidad.
     distrito = models.ForeignKey(Distrito, null=True, blank=True, on_delete=models.SET_NULL)
     # La sección se utiliza sólo en modo UB.
     seccion = models.ForeignKey(Seccion, null=True, blank=True, on_delete=models.SET_NULL)
+    # Para medir cuánto hace que espera la tarea más vieja.
+    creada = models.DateTimeField(default=timezone.now)
 
     class Meta:
+        # Incluyen al distrito porque la tabla está particionada por distrito (las tareas sin
+        # distrito tienen además sus propios índices únicos, ver la migración 0008).
         unique_together = [
-            ['mesa_categoria', 'numero_carga'],
-            ['attachment', 'numero_carga']
+            ['mesa_categoria', 'numero_carga', 'distrito'],
+            ['attachment', 'numero_carga', 'distrito']
         ]
         verbose_name = 'Cola de Identificaciones y Cargas pendientes'
         verbose_name_plural = 'Cola de Identificaciones y Cargas pendientes'
@@ -60,11 +80,9 @@ class ColaCargasPendientes(models.Model):
             # Si hay pocos usuaries, evitamos darle tareas en la que
             # le fiscal estuvo involucrade.
             if count_active_sessions() < config.UMBRAL_EXCLUIR_TAREAS_FISCAL:
-                excluir = (
-                      Q(mesa_categoria__cargas__fiscal=fiscal) 
-                    | Q(attachment__identificaciones__fiscal=fiscal)
-                )
-                query = query.exclude(excluir)
+                mesa_categorias, attachments = TareasDeFiscal.de_fiscal(fiscal)
+                query = query.exclude(mesa_categoria_id__in=mesa_categorias).exclude(
+                    attachment_id__in=attachments)
 
             # Se privilegia a las tareas del distrito en las que viene
             # trabajando el fiscal.
@@ -88,31 +106,397 @@ class ColaCargasPendientes(models.Model):
                 item = item_afin
             mesa_categoria = item.mesa_categoria
             attachment = item.attachment
-            item.delete()
+            # Con el distrito sólo se busca en su partición.
+            cls.objects.filter(id=item.id, distrito_id=item.distrito_id).delete()
 
         return (mesa_categoria, attachment)
 
     @classmethod
-    def vaciar(cls):
+    def conservar_antiguedad(cls, nuevas, distrito_id=None):
+        """
+        A las tareas `nuevas` que reemplazan a otras encoladas de la misma mesa-categoría o
+        attachment (del distrito, si se indica) les pone la fecha de creación de aquellas, para que
+        reconstruir la cola no reinicie su antigüedad. Debe invocarse antes de vaciar la cola.
+        """
+        encoladas = cls.objects.filter(
+            Q(mesa_categoria_id__in={tarea.mesa_categoria_id for tarea in nuevas} - {None}) |
+            Q(attachment_id__in={tarea.attachment_id for tarea in nuevas} - {None})
+        )
+        if distrito_id is not None:
+            encoladas = encoladas.filter(distrito_id=distrito_id)
+        creadas = {
+            (mesa_categoria_id, attachment_id): creada
+            for mesa_categoria_id, attachment_id, creada in encoladas.values(
+                'mesa_categoria_id', 'attachment_id'
+            ).annotate(primera=Min('creada')).values_list('mesa_categoria_id', 'attachment_id', 'primera')
+        }
+        for tarea in nuevas:
+            tarea.creada = creadas.get((tarea.mesa_categoria_id, tarea.attachment_id), tarea.creada)
+
+    @classmethod
+    def particion(cls, distrito_id):
+        """
+        Nombre de la partición de la tabla que tiene las tareas del distrito.
+        """
+        return f'{cls._meta.db_table}_{distrito_id}'
+
+    @classmethod
+    def particiones(cls):
+        """
+        Nombres de las particiones de la tabla (ninguna si no está particionada, por ejemplo
+        con una versión de PostgreSQL anterior a la 11).
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = to_regclass(%s)", [cls._meta.db_table]
+            )
+            return {particion for particion, in cursor.fetchall()}
+
+    @classmethod
+    def crear_particiones(cls, distrito_ids=None):
+        """
+        Crea las particiones que falten para los distritos indicados (o para todos).
+        Las tareas de esos distritos que hayan ido a parar a la partición por defecto se descartan:
+        el scheduler las vuelve a encolar.
+        """
+        particiones = cls.particiones()
+        if not particiones:
+            return
+        if distrito_ids is None:
+            distrito_ids = Distrito.objects.values_list('id', flat=True)
+        tabla = cls._meta.db_table
+        with connection.cursor() as cursor:
+            for distrito_id in distrito_ids:
+                if cls.particion(distrito_id) in particiones:
+                    continue
+                cursor.execute(f'DELETE FROM {tabla}_otros WHERE distrito_id = %s', [distrito_id])
+                cursor.execute(
+                    f'CREATE TABLE {cls.particion(distrito_id)} PARTITION OF {tabla} '
+                    f'FOR VALUES IN ({int(distrito_id)})'
+                )
+
+    @classmethod
+    def vaciar(cls, distrito_id=None):
+        """
+        Vacía la cola, o sólo las tareas de un distrito. Con la tabla particionada por distrito
+        se trunca sólo su partición, sin bloquear las de los demás.
+        """
         #cls.objects.all().delete()
         with connection.cursor() as cursor:
-            cursor.execute(f'TRUNCATE TABLE {cls._meta.db_table}')
+            if distrito_id is None:
+                cursor.execute(f'TRUNCATE TABLE {cls._meta.db_table}')
+            elif cls.particion(distrito_id) in cls.particiones():
+                cursor.execute(f'TRUNCATE TABLE {cls.particion(distrito_id)}')
+            else:
+                cls.objects.filter(distrito_id=distrito_id).delete()
 
     @classmethod
     def debug(cls, fiscal):
-        return cls.objects.exclude(
-            Q(mesa_categoria__cargas__fiscal=fiscal) |
-            Q(attachment__identificaciones__fiscal=fiscal)
+        mesa_categorias, attachments = TareasDeFiscal.de_fiscal(fiscal)
+        return cls.objects.exclude(mesa_categoria_id__in=mesa_categorias).exclude(
+            attachment_id__in=attachments
         ).order_by('orden')
 
     def __str__(self):
         return f'({self.orden}) <{self.mesa_categoria}, {self.attachment}>'
 
 
+@receiver(post_save, sender=Distrito)
+def crear_particion_cola(sender, instance=None, created=False, **kwargs):
+    if created:
+        ColaCargasPendientes.crear_particiones([instance.id])
+
+
+class NovedadScheduler(models.Model):
+    """
+    Registra que una MesaCategoria o un Attachment cambió de estado, para que el scheduler
+    incremental lo saque de la cola si ya no tiene tareas pendientes y actualice sus contadores
+    sin volver a contar todo.
+
+    Se registra en la misma transacción que el cambio (ver ``registrar_cambios``), anotando a qué
+    contadores aportaba el objeto antes y a cuáles aporta después. Así el scheduler sólo ve la
+    novedad cuando el cambio ya está confirmado, y suma exactamente lo que cambió.
+
+    Sólo se registran novedades si ``settings.SCHEDULER_INCREMENTAL`` está activo.
+    """
+    mesa_categoria = models.ForeignKey(MesaCategoria, null=True, related_name='+', on_delete=models.CASCADE)
+    attachment = models.ForeignKey(Attachment, null=True, related_name='+', on_delete=models.CASCADE)
+    # Si contaba como carga (o foto) pendiente.
+    era_pendiente = models.BooleanField(default=False)
+    # Si contaba como carga parcial pendiente de una categoría sensible.
+    era_parcial_sensible = models.BooleanField(default=False)
+    # Lo mismo, después del cambio.
+    es_pendiente = models.BooleanField(default=False)
+    es_parcial_sensible = models.BooleanField(default=False)
+
+    class Meta:
+        verbose_name = 'Novedad para el scheduler'
+        verbose_name_plural = 'Novedades para el scheduler'
+
+    @classmethod
+    @contextmanager
+    def registrar_cambios(cls, mesa_categorias=None, attachments=None):
+        """
+        Envuelve un cambio que puede modificar las tareas pendientes de las MesaCategoria y
+        Attachments de los querysets parámetro. Los bloquea, anota su estado antes y después
+        del cambio y registra las novedades, todo en una transacción.
+        """
+        if not settings.SCHEDULER_INCREMENTAL:
+            yield
+            return
+
+        with transaction.atomic():
+            mc_ids = list(mesa_categorias.select_for_update().order_by('id').values_list(
+                'id', flat=True)) if mesa_categorias is not None else []
+            attachment_ids = list(attachments.select_for_update().order_by('id').values_list(
+                'id', flat=True)) if attachments is not None else []
+            antes = cls.estado(mc_ids, attachment_ids)
+            yield
+            despues = cls.estado(mc_ids, attachment_ids)
+            cls.objects.bulk_create([
+                cls(mesa_categoria_id=id,
+                    era_pendiente=id in antes['mc_pendientes'],
+                    era_parcial_sensible=id in antes['mc_parciales'],
+                    es_pendiente=id in despues['mc_pendientes'],
+                    es_parcial_sensible=id in despues['mc_parciales'])
+                for id in mc_ids
+            ] + [
+                cls(attachment_id=id,
+                    era_pendiente=id in antes['attachments_pendientes'],
+                    es_pendiente=id in despues['attachments_pendientes'])
+                for id in attachment_ids
+            ])
+
+    @classmethod
+    def estado(cls, mc_ids, attachment_ids):
+        """
+        Ids de las MesaCategoria con carga pendiente y con carga parcial sensible pendiente,
+        y de los attachments sin identificar, entre los parámetro.
+        """
+        return {
+            'mc_pendientes': set(MesaCategoria.objects.con_carga_pendiente(
+                for_update=False).filter(id__in=mc_ids).values_list('id', flat=True)),
+            'mc_parciales': set(MesaCategoria.objects.con_carga_sensible_y_parcial_pendiente(
+                ).filter(id__in=mc_ids).values_list('id', flat=True)),
+            'attachments_pendientes': set(Attachment.objects.sin_identificar(
+                for_update=False).filter(id__in=attachment_ids).values_list('id', flat=True)),
+        }
+
+    def __str__(self):
+        return f'<{self.mesa_categoria}, {self.attachment}>'
+
+
+@receiver(post_save, sender=Attachment)
+def registrar_attachment_nuevo(sender, instance=None, created=False, **kwargs):
+    # Un attachment nuevo no aportaba a ningún contador.
+    if created and settings.SCHEDULER_INCREMENTAL:
+        NovedadScheduler.objects.create(
+            attachment=instance,
+            es_pendiente=instance.parent_id is None and instance.status == Attachment.STATUS.sin_identificar,
+        )
+
+
+class ContadoresScheduler(models.Model):
+    """
+    Cantidad de tareas pendientes con las que el scheduler decide cuándo encolar
+    identificaciones y cuándo cargas. El scheduler incremental las mantiene a partir de
+    las novedades; se recalculan (contando) al reconstruir la cola.
+    """
+    cant_fotos = models.IntegerField(default=0)
+    cant_cargas = models.IntegerField(default=0)
+    cant_cargas_parcial = models.IntegerField(default=0)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Contadores del scheduler'
+        verbose_name_plural = 'Contadores del scheduler'
+
+    @classmethod
+    def actuales(cls):
+        return cls.objects.filter(pk=1).first()
+
+    @classmethod
+    def recalcular(cls):
+        """
+        Cuenta las tareas pendientes y descarta las novedades que ya quedan reflejadas en el
+        recuento. Para que sean exactamente ésas, se cuenta y se borra en una misma foto de la
+        base (REPEATABLE READ): el borrado no alcanza a las novedades de cambios que se
+        confirmen mientras tanto, que tampoco se cuentan.
+        """
+        # Si ya estamos dentro de una transacción (por ejemplo, en los tests) no se puede
+        # cambiar su aislamiento.
+        aislar = not connection.in_atomic_block
+        with transaction.atomic():
+            if aislar:
+                with connection.cursor() as cursor:
+                    cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+            contadores, _ = cls.objects.update_or_create(pk=1, defaults=dict(
+                cant_fotos=Attachment.objects.sin_identificar(for_update=False).count(),
+                cant_cargas=MesaCategoria.objects.con_carga_pendiente(for_update=False).count(),
+                cant_cargas_parcial=MesaCategoria.objects.con_carga_sensible_y_parcial_pendiente().count(),
+            ))
+            NovedadScheduler.objects.all().delete()
+        return contadores
+
+    @classmethod
+    def sumar(cls, fotos=0, cargas=0, cargas_parcial=0):
+        cls.objects.filter(pk=1).update(
+            cant_fotos=F('cant_fotos') + fotos,
+            cant_cargas=F('cant_cargas') + cargas,
+            cant_cargas_parcial=F('cant_cargas_parcial') + cargas_parcial,
+            actualizado=timezone.now(),
+        )
+
+    def __str__(self):
+        return f'fotos: {self.cant_fotos}, cargas: {self.cant_cargas} ({self.cant_cargas_parcial} parciales)'
+
+
+class CircuitoPrioritario(models.Model):
+    """
+    Circuito (por ejemplo, un "circuito testigo") del que se necesita tener cuanto antes
+    `cant_mesas_necesarias` mesas con la carga parcial de la categoría consolidada.
+    El comando ``priorizador_circuitos`` pone al frente de la cola las tareas que faltan.
+    """
+    circuito = models.ForeignKey(Circuito, related_name='prioridades_de_carga', on_delete=models.CASCADE)
+    categoria = models.ForeignKey(Categoria, related_name='circuitos_prioritarios', on_delete=models.CASCADE)
+    cant_mesas_necesarias = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('circuito', 'categoria')
+        verbose_name = 'Circuito prioritario'
+        verbose_name_plural = 'Circuitos prioritarios'
+
+    @classmethod
+    def faltantes(cls):
+        """
+        Devuelve {(circuito_id, categoria_id): cantidad} con cuántas mesas con carga parcial
+        consolidada le faltan a cada circuito prioritario que todavía no llegó a las necesarias.
+        Es una única consulta, sin importar cuántos circuitos haya.
+        """
+        consolidadas = MesaCategoria.objects.filter(
+            mesa__circuito=OuterRef('circuito'),
+            categoria=OuterRef('categoria'),
+            carga_testigo__isnull=False,
+            status__in=[
+                MesaCategoria.STATUS.parcial_consolidada_dc, MesaCategoria.STATUS.parcial_consolidada_csv
+            ],
+        ).order_by().values('categoria').annotate(cantidad=Count('id')).values('cantidad')
+        circuitos = cls.objects.annotate(
+            cant_consolidadas=Coalesce(Subquery(consolidadas, output_field=IntegerField()), 0)
+        ).values_list('circuito_id', 'categoria_id', 'cant_mesas_necesarias', 'cant_consolidadas')
+        return {
+            (circuito_id, categoria_id): necesarias - consolidadas
+            for circuito_id, categoria_id, necesarias, consolidadas in circuitos
+            if necesarias > consolidadas
+        }
+
+    def __str__(self):
+        return f'{self.circuito} - {self.categoria}: {self.cant_mesas_necesarias} mesas'
+
+
+class MetricasColaPorMinuto(models.Model):
+    """
+    Contadores por minuto del funcionamiento de la cola de tareas: pedidos de los fiscales
+    (con su demora y las tareas salteadas porque las tomó otre), asignaciones, tareas
+    completadas y tareas vencidas. Ver ``scheduling.metricas``.
+
+    Cada proceso acumula los incrementos en memoria y un hilo suyo los suma a la tabla cada
+    `SEGUNDOS_VOLCADO` segundos, para no escribir la misma fila en cada pedido.
+    """
+    SEGUNDOS_VOLCADO = 10
+
+    minuto = models.DateTimeField(primary_key=True)
+    pedidos = models.IntegerField(default=0)
+    pedidos_sin_tarea = models.IntegerField(default=0)
+    segundos_pedidos = models.FloatField(default=0)
+    saltos = models.IntegerField(default=0)
+    asignaciones_cargas = models.IntegerField(default=0)
+    asignaciones_identificaciones = models.IntegerField(default=0)
+    cargas_completadas = models.IntegerField(default=0)
+    identificaciones_completadas = models.IntegerField(default=0)
+    tareas_vencidas = models.IntegerField(default=0)
+
+    _lock = threading.Lock()
+    _pendientes = defaultdict(Counter)
+    # Proceso en el que corre el hilo que vuelca los contadores (cambia si el proceso se forkea).
+    _pid_volcador = None
+
+    class Meta:
+        verbose_name = 'Métricas de la cola por minuto'
+        verbose_name_plural = 'Métricas de la cola por minuto'
+
+    @classmethod
+    def contadores(cls):
+        return [field.name for field in cls._meta.fields if field.name != 'minuto']
+
+    @classmethod
+    def registrar(cls, **incrementos):
+        """
+        Suma los incrementos a los del minuto actual, en memoria. Los vuelca a la tabla el hilo
+        de ``volcar_periodicamente``, con su propia conexión, así que no se retiene el lock de la
+        fila del minuto en la transacción en curso. En los tests se vuelca a mano.
+        """
+        minuto = FiscalesActivosPorMinuto.truncar(timezone.now())
+        with cls._lock:
+            cls._pendientes[minuto].update(incrementos)
+            if cls._pid_volcador != os.getpid() and not settings.TESTING:
+                cls._pid_volcador = os.getpid()
+                threading.Thread(target=cls.volcar_periodicamente, daemon=True).start()
+
+    @classmethod
+    def volcar_periodicamente(cls):
+        while True:
+            time.sleep(cls.SEGUNDOS_VOLCADO)
+            try:
+                cls.volcar()
+            except Exception as e:
+                # Se pierden los contadores de este intervalo, pero no el hilo.
+                logger.error('Métricas de la cola', error=str(e))
+            finally:
+                connection.close()
+
+    @classmethod
+    def volcar(cls):
+        """
+        Suma a la tabla lo acumulado en memoria por este proceso.
+        """
+        with cls._lock:
+            pendientes = dict(cls._pendientes)
+            cls._pendientes.clear()
+        campos = cls.contadores()
+        tabla = cls._meta.db_table
+        with connection.cursor() as cursor:
+            for minuto, incrementos in pendientes.items():
+                cursor.execute(f"""
+                    INSERT INTO {tabla} (minuto, {', '.join(campos)})
+                    VALUES (%s, {', '.join(['%s'] * len(campos))})
+                    ON CONFLICT (minuto) DO UPDATE SET
+                    {', '.join(f'{campo} = {tabla}.{campo} + EXCLUDED.{campo}' for campo in campos)}
+                """, [minuto] + [incrementos[campo] for campo in campos])
+
+    @classmethod
+    def depurar(cls, horas=24):
+        cls.objects.filter(minuto__lt=timezone.now() - timedelta(hours=horas)).delete()
+
+    def __str__(self):
+        return f'{self.minuto}: {self.pedidos} pedidos'
+
+
+@receiver(post_save, sender=Carga)
+def registrar_carga_completada(sender, instance=None, created=False, **kwargs):
+    if created and instance.origen == Carga.SOURCES.web:
+        MetricasColaPorMinuto.registrar(cargas_completadas=1)
+
+
+@receiver(post_save, sender=Identificacion)
+def registrar_identificacion_completada(sender, instance=None, created=False, **kwargs):
+    if created and instance.source == Identificacion.SOURCES.web:
+        MetricasColaPorMinuto.registrar(identificaciones_completadas=1)
+
+
 def count_active_sessions():
-    ahora = timezone.now()
-    desde = ahora - timedelta(minutes=5)
-    return Fiscal.objects.filter(last_seen__gt=desde).count() + 1  # Si no hay ninguno que algo genere.
+    return FiscalesActivosPorMinuto.activos() + 1  # Si no hay ninguno que algo genere.
 
 
 class PrioridadScheduling(models.Model):
@@ -216,9 +600,12 @@ class RegistroDePrioridad():
         self.prioridad = prioridad
         self.hasta_cantidad = hasta_cantidad
 
+    def contiene(self, proporcion):
+        return self.desde_proporcion <= proporcion and (
+            self.hasta_proporcion == 100 or self.hasta_proporcion > proporcion)
+
     def aplica(self, proporcion, orden_de_llegada):
-        return (self.desde_proporcion <= proporcion and (self.hasta_proporcion == 100 or self.hasta_proporcion > proporcion)) \
-            or (self.hasta_cantidad and orden_de_llegada <= self.hasta_cantidad)
+        return self.contiene(proporcion) or (self.hasta_cantidad and orden_de_llegada <= self.hasta_cantidad)
 
     def es_compatible_con(self, otro):
         return self.hasta_proporcion <= otro.desde_proporcion or otro.hasta_proporcion <= self.desde_proporcion
@@ -236,6 +623,7 @@ class MapaPrioridades():
 
     def __init__(self):
         self.registros = []
+        self.compilar()
 
     def agregar_registro(self, registro):
         registro_incompatible = next(
@@ -244,14 +632,54 @@ class MapaPrioridades():
             raise RangosDeProporcionesSeSolapanError(
                 F"Rangos se solapan entre <{registro}> y <{registro_incompatible}>")
         self.registros.append(registro)
+        self.compilar()
+
+    def compilar(self):
+        """
+        Ordena los registros por desde_proporcion y arma las tablas que usa `registro_que_aplica`:
+        los comienzos de los rangos (para buscar con bisect) y las posiciones de los registros
+        que definen hasta_cantidad.
+        """
+        self.ordenados = sorted(self.registros, key=lambda reg: reg.desde_proporcion)
+        # Los rangos vacíos nunca contienen una proporción.
+        self.posiciones_rangos = [
+            posicion for posicion, reg in enumerate(self.ordenados)
+            if reg.desde_proporcion < reg.hasta_proporcion or reg.hasta_proporcion == 100
+        ]
+        self.desdes_rangos = [
+            self.ordenados[posicion].desde_proporcion for posicion in self.posiciones_rangos
+        ]
+        self.posiciones_con_cantidad = [
+            posicion for posicion, reg in enumerate(self.ordenados) if reg.hasta_cantidad
+        ]
+        # Los rangos que llegan a 100 no tienen tope, así que pueden contener a proporciones
+        # de otros rangos que empiezan después: basta con el primero de ellos.
+        self.posicion_sin_tope = next(
+            (posicion for posicion, reg in enumerate(self.ordenados) if reg.hasta_proporcion == 100), None)
 
     def registros_ordenados(self):
-        registros_ordenados = list(self.registros)
-        registros_ordenados.sort(key=lambda reg: reg.desde_proporcion)
-        return registros_ordenados
+        return list(self.ordenados)
 
     def registro_que_aplica(self, proporcion, orden_de_llegada):
-        return next((reg for reg in self.registros_ordenados() if reg.aplica(proporcion, orden_de_llegada)), None)
+        """
+        El primer registro (por desde_proporcion) que aplica, sin recorrerlos todos:
+        como los rangos no se solapan, el que contiene a la proporción es el último que empieza
+        antes (o el primero sin tope); un registro anterior sólo puede aplicar por hasta_cantidad.
+        """
+        posicion = None
+        indice = bisect.bisect_right(self.desdes_rangos, proporcion) - 1
+        if indice >= 0 and self.ordenados[self.posiciones_rangos[indice]].contiene(proporcion):
+            posicion = self.posiciones_rangos[indice]
+        sin_tope = self.posicion_sin_tope
+        if sin_tope is not None and self.ordenados[sin_tope].contiene(proporcion):
+            posicion = sin_tope if posicion is None else min(posicion, sin_tope)
+        for posicion_con_cantidad in self.posiciones_con_cantidad:
+            if posicion is not None and posicion_con_cantidad >= posicion:
+                break
+            registro = self.ordenados[posicion_con_cantidad]
+            if orden_de_llegada <= registro.hasta_cantidad:
+                return registro
+        return self.ordenados[posicion] if posicion is not None else None
 
     def valor_para(self, proporcion, orden_de_llegada):
         registro = self.registro_que_aplica(proporcion, orden_de_llegada)
@@ -331,12 +759,79 @@ def mapa_prioridades_desde_setting(setting):
     return mapa
 
 
+CLAVE_EPOCA_PRIORIDADES = 'epoca-prioridades'
+
+
+class MapasPrioridadesCompilados():
+    """
+    Los MapaPrioridades de todas las secciones y categorías que tienen PrioridadScheduling,
+    armados con una única consulta.
+    Cada proceso los conserva mientras no cambie la época de prioridades (guardada en la tabla
+    de épocas), que avanza con cada alta, baja o modificación de una PrioridadScheduling.
+    La época se consulta a lo sumo cada `settings.SEGUNDOS_VIGENCIA_MAPAS_PRIORIDADES` segundos;
+    en el proceso en el que cambian las prioridades se invalidan en el momento.
+    """
+
+    def __init__(self):
+        self.epoca = None
+        self.consultada = None
+        self.por_seccion = {}
+        self.por_categoria = {}
+        self.vacio = MapaPrioridades()
+
+    def invalidar(self):
+        self.epoca = None
+        self.consultada = None
+
+    def vigentes(self):
+        vigencia = settings.SEGUNDOS_VIGENCIA_MAPAS_PRIORIDADES
+        if self.consultada is not None and time.monotonic() - self.consultada < vigencia:
+            return self
+        # La época se toma antes de leer las prioridades: si cambian mientras tanto,
+        # se vuelven a leer la próxima vez.
+        epoca = Epoca.actual(CLAVE_EPOCA_PRIORIDADES)
+        self.consultada = time.monotonic()
+        if epoca != self.epoca:
+            por_seccion, por_categoria = defaultdict(MapaPrioridades), defaultdict(MapaPrioridades)
+            for prioridad_scheduling in PrioridadScheduling.objects.all():
+                if prioridad_scheduling.seccion_id and not prioridad_scheduling.categoria_id:
+                    mapa = por_seccion[prioridad_scheduling.seccion_id]
+                elif prioridad_scheduling.categoria_id and not prioridad_scheduling.seccion_id:
+                    mapa = por_categoria[prioridad_scheduling.categoria_id]
+                else:
+                    continue
+                mapa.agregar_registro(prioridad_scheduling.como_registro_prioridad())
+            self.por_seccion, self.por_categoria = dict(por_seccion), dict(por_categoria)
+            self.epoca = epoca
+        return self
+
+    def de_seccion(self, seccion_id):
+        return self.por_seccion.get(seccion_id, self.vacio)
+
+    def de_categoria(self, categoria_id):
+        return self.por_categoria.get(categoria_id, self.vacio)
+
+
+mapas_prioridades_compilados = MapasPrioridadesCompilados()
+
+
+def mapas_prioridades_vigentes():
+    return mapas_prioridades_compilados.vigentes()
+
+
+@receiver(post_save, sender=PrioridadScheduling)
+@receiver(post_delete, sender=PrioridadScheduling)
+def invalidar_mapas_prioridades(sender, **kwargs):
+    Epoca.avanzar(CLAVE_EPOCA_PRIORIDADES)
+    mapas_prioridades_compilados.invalidar()
+
+
 def mapa_prioridades_para_seccion(seccion):
     """
-    Crea y devuelve el MapaPrioridades que corresponde a una Seccion, de acuerdo a las PrioridadScheduling
+    Devuelve el MapaPrioridades que corresponde a una Seccion, de acuerdo a las PrioridadScheduling
     que hubiera definidas.
     """
-    return PrioridadScheduling.mapa_prioridades(PrioridadScheduling.objects.filter(seccion=seccion, categoria=None))
+    return mapas_prioridades_vigentes().de_seccion(seccion.id)
 
 
 def mapa_prioridades_default_categoria():
@@ -349,22 +844,32 @@ def mapa_prioridades_default_seccion():
 
 def mapa_prioridades_para_categoria(categoria):
     """
-    Crea y devuelve el MapaPrioridades que corresponde a una Categoria, de acuerdo a las PrioridadScheduling
+    Devuelve el MapaPrioridades que corresponde a una Categoria, de acuerdo a las PrioridadScheduling
     que hubiera definidas.
     """
-    return PrioridadScheduling.mapa_prioridades(PrioridadScheduling.objects.filter(categoria=categoria, seccion=None))
+    return mapas_prioridades_vigentes().de_categoria(categoria.id)
 
 
 def mapa_prioridades_para_mesa_categoria(mesa_categoria):
     """
     Crea y devuelve el MapaPrioridades que corresponde a una MesaCategoria, de acuerdo a su categoria y a su seccion
     """
-    # obtengo los mapas para seccion y categoria, con default a lo que sale de los settings
-    mapa_especifico_seccion = mapa_prioridades_para_seccion(mesa_categoria.mesa.lugar_votacion.circuito.seccion)
-    mapa_seccion = MapaPrioridadesConDefault(mapa_especifico_seccion, mapa_prioridades_default_seccion())
+    seccion_id = mesa_categoria.seccion_id or mesa_categoria.mesa.seccion_id
+    return mapa_prioridades_para_seccion_y_categoria(seccion_id, mesa_categoria.categoria_id)
+
 
-    mapa_especifico_categoria = mapa_prioridades_para_categoria(mesa_categoria.categoria)
-    mapa_categoria = MapaPrioridadesConDefault(mapa_especifico_categoria, mapa_prioridades_default_categoria())
+def mapa_prioridades_para_seccion_y_categoria(seccion_id, categoria_id, mapas=None):
+    """
+    Crea y devuelve el MapaPrioridades que corresponde a las MesaCategoria de una categoría en una sección.
+    Para armar varios se pueden pasar los `mapas` vigentes, y así consultar la época una única vez.
+    """
+    mapas = mapas or mapas_prioridades_vigentes()
+
+    # obtengo los mapas para seccion y categoria, con default a lo que sale de los settings
+    mapa_seccion = MapaPrioridadesConDefault(
+        mapas.de_seccion(seccion_id), mapa_prioridades_default_seccion())
+    mapa_categoria = MapaPrioridadesConDefault(
+        mapas.de_categoria(categoria_id), mapa_prioridades_default_categoria())
 
     # a la MesaCategoria le corresponde el __producto__ entre seccion y categoria
     return MapaPrioridadesProducto(mapa_seccion, mapa_categoria)
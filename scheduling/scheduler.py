@@ -1,9 +1,17 @@
+from collections import defaultdict
+from functools import partial
+
 from django.db import transaction
+from django.db.models import Exists, F, Min, OuterRef, Q
 from constance import config
 from django.conf import settings
-from adjuntos.models import Attachment
+from adjuntos.models import Attachment, Identificacion
 from elecciones.models import MesaCategoria
-from .models import ColaCargasPendientes, count_active_sessions
+from fiscales.models import FiscalesActivosPorMinuto
+from .cola_tareas import cola_de_tareas
+from .models import (
+    CircuitoPrioritario, ColaCargasPendientes, ContadoresScheduler, NovedadScheduler, count_active_sessions
+)
 
 
 def scheduler(reconstruir_la_cola=False):
@@ -21,23 +29,315 @@ def scheduler(reconstruir_la_cola=False):
 
     - En otro caso, no hay nada para hacer.
     """
+    long_cola, orden_inicial = espacio_en_la_cola()
+
+    # Al contar se dejan actualizados los contadores que usa el scheduler incremental.
+    contadores = ContadoresScheduler.recalcular()
+
+    cargas, identificaciones = tareas_candidatas(long_cola)
+    nuevas, k, num_cargas, num_idents = intercalar_tareas(
+        iter(cargas), iter(identificaciones), contadores, long_cola, orden_inicial
+    )
+
+    with transaction.atomic():
+        if reconstruir_la_cola:
+            ColaCargasPendientes.crear_particiones()
+            ColaCargasPendientes.conservar_antiguedad(nuevas)
+            ColaCargasPendientes.vaciar()
+            FiscalesActivosPorMinuto.recalcular()
+        ColaCargasPendientes.objects.bulk_create(nuevas, ignore_conflicts=True)
+        if reconstruir_la_cola:
+            transaction.on_commit(cola_de_tareas().notificar_cambios)
+        else:
+            transaction.on_commit(partial(
+                cola_de_tareas().notificar_cambios,
+                agregadas=ColaCargasPendientes.objects.filter(orden__gte=orden_inicial)
+            ))
+
+    return (k - orden_inicial, num_cargas, num_idents)
+
+
+def scheduler_incremental(cant_novedades=None):
+    """
+    Variante del scheduler cuyo costo depende de lo que cambió y no del total de tareas pendientes.
+
+    - Consume las novedades registradas por la consolidación (identificaciones y cargas
+      consolidadas, incluidas las invalidadas por trolls) y los attachments nuevos:
+      saca de la cola lo que ya no tiene tareas pendientes y actualiza los contadores.
+
+    - Completa la cola con las tareas más prioritarias que no estén encoladas,
+      con el mismo criterio que ``scheduler``.
+
+    La cola no se vacía: las tareas que siguen pendientes conservan su lugar.
+    """
+    procesar_novedades(cant_novedades)
+    contadores = ContadoresScheduler.actuales() or ContadoresScheduler.recalcular()
+
+    long_cola, orden_inicial = espacio_en_la_cola()
+    nuevas, k, num_cargas, num_idents = [], orden_inicial, 0, 0
+    if long_cola > 0:
+        cargas, identificaciones = tareas_candidatas(long_cola, excluir_encoladas=True)
+        nuevas, k, num_cargas, num_idents = intercalar_tareas(
+            iter(cargas), iter(identificaciones), contadores, long_cola, orden_inicial
+        )
+        ColaCargasPendientes.objects.bulk_create(nuevas, ignore_conflicts=True)
+        transaction.on_commit(partial(
+            cola_de_tareas().notificar_cambios,
+            agregadas=ColaCargasPendientes.objects.filter(orden__gte=orden_inicial)
+        ))
+
+    return (k - orden_inicial, num_cargas, num_idents)
+
+
+def reconstruir_cola_de_distrito(distrito_id):
+    """
+    Vuelve a armar sólo las tareas de la cola de un distrito, sin tocar las de los demás.
+    Las nuevas tareas ocupan los lugares que tenían las anteriores, así que el distrito no gana
+    ni pierde prioridad frente al resto. Si el distrito no tiene tareas encoladas no se hace nada.
+    """
+    encoladas = list(
+        ColaCargasPendientes.objects.filter(distrito_id=distrito_id).values_list('id', 'orden')
+    )
+    if not encoladas:
+        return (0, 0, 0)
+    lugares = sorted(orden for _, orden in encoladas)
+    contadores = ContadoresScheduler.actuales() or ContadoresScheduler.recalcular()
+
+    cargas, identificaciones = tareas_candidatas(len(lugares), distrito_id=distrito_id)
+    nuevas, _, num_cargas, num_idents = intercalar_tareas(
+        iter(cargas), iter(identificaciones), contadores, len(lugares), 0
+    )
+    # Las unidades que sobran de la última tarea quedan en el último lugar.
+    for i, tarea in enumerate(nuevas):
+        tarea.orden = lugares[min(i, len(lugares) - 1)]
+
+    with transaction.atomic():
+        ColaCargasPendientes.conservar_antiguedad(nuevas, distrito_id)
+        ColaCargasPendientes.vaciar(distrito_id)
+        ColaCargasPendientes.objects.bulk_create(nuevas, ignore_conflicts=True)
+        transaction.on_commit(partial(
+            cola_de_tareas().notificar_cambios,
+            agregadas=ColaCargasPendientes.objects.filter(distrito_id=distrito_id),
+            quitadas=[id for id, _ in encoladas]
+        ))
+
+    return (len(nuevas), num_cargas, num_idents)
+
+
+def encolar_circuitos_prioritarios():
+    """
+    Pone al frente de la cola lo que falta para que cada ``CircuitoPrioritario`` llegue a sus
+    mesas necesarias: las cargas parciales pendientes de la categoría en el circuito y, si no
+    alcanzan, las fotos sin identificar preidentificadas en el circuito. De cada una se encolan
+    todas las unidades que le faltan, como en ``intercalar_tareas``, delante de la primera tarea
+    de la cola y en el orden en que se eligieron. Las que ya estaban encoladas se reemplazan
+    (conservando su antigüedad).
+
+    La cantidad de consultas no depende de cuántos circuitos prioritarios haya.
+    Devuelve cuántas cargas y cuántas fotos se priorizaron.
+    """
+    faltantes = CircuitoPrioritario.faltantes()
+    if not faltantes:
+        return (0, 0)
+
+    nuevas = []
+    mesa_categorias = MesaCategoria.objects.con_carga_sensible_y_parcial_pendiente().filter(
+        mesa__circuito_id__in={circuito_id for circuito_id, _ in faltantes},
+        categoria_id__in={categoria_id for _, categoria_id in faltantes},
+    ).order_by('coeficiente_para_orden_de_carga', 'id').values_list(
+        'id', 'status', 'mesa__circuito_id', 'categoria_id', 'distrito_id', 'seccion_id'
+    )
+    cant_cargas = 0
+    for mc_id, status, circuito_id, categoria_id, distrito_id, seccion_id in mesa_categorias:
+        cant_unidades = unidades_de_carga(status)
+        if faltantes.get((circuito_id, categoria_id), 0) > 0 and cant_unidades > 0:
+            faltantes[(circuito_id, categoria_id)] -= 1
+            cant_cargas += 1
+            nuevas.extend(
+                ColaCargasPendientes(
+                    mesa_categoria_id=mc_id,
+                    numero_carga=i,
+                    distrito_id=distrito_id,
+                    seccion_id=seccion_id
+                ) for i in range(cant_unidades)
+            )
+    cant_fotos = 0
+
+    # Las fotos todavía no tienen categoría: de cada circuito se toman
+    # las que le faltan a su categoría más atrasada.
+    fotos_faltantes = defaultdict(int)
+    for (circuito_id, _), cantidad in faltantes.items():
+        if cantidad > 0:
+            fotos_faltantes[circuito_id] = max(fotos_faltantes[circuito_id], cantidad)
+    if fotos_faltantes:
+        fotos = Attachment.objects.sin_identificar(for_update=False).filter(
+            pre_identificacion__circuito_id__in=fotos_faltantes.keys()
+        ).priorizadas().annotate(
+            tiene_identificaciones=Exists(Identificacion.objects.filter(attachment=OuterRef('id')))
+        ).values_list(
+            'id', 'tiene_identificaciones', 'pre_identificacion__circuito_id',
+            'pre_identificacion__distrito_id', 'pre_identificacion__seccion_id'
+        )
+        for attachment_id, tiene_identificaciones, circuito_id, distrito_id, seccion_id in fotos:
+            if fotos_faltantes[circuito_id] > 0:
+                fotos_faltantes[circuito_id] -= 1
+                cant_fotos += 1
+                nuevas.extend(
+                    ColaCargasPendientes(
+                        attachment_id=attachment_id,
+                        numero_carga=i,
+                        distrito_id=distrito_id,
+                        seccion_id=seccion_id
+                    ) for i in range(unidades_de_identificacion(tiene_identificaciones))
+                )
+
+    priorizadas = ColaCargasPendientes.objects.filter(
+        Q(mesa_categoria_id__in={nueva.mesa_categoria_id for nueva in nuevas} - {None}) |
+        Q(attachment_id__in={nueva.attachment_id for nueva in nuevas} - {None})
+    )
+    with transaction.atomic():
+        quitadas = list(priorizadas.values_list('id', flat=True))
+        ColaCargasPendientes.conservar_antiguedad(nuevas)
+        priorizadas.delete()
+        # Los lugares anteriores al primero de la cola, en el orden en que se eligieron.
+        frente = ColaCargasPendientes.objects.aggregate(frente=Min('orden'))['frente']
+        orden_inicial = (frente or 0) - len(nuevas)
+        for i, nueva in enumerate(nuevas):
+            nueva.orden = orden_inicial + i
+        ColaCargasPendientes.objects.bulk_create(nuevas, ignore_conflicts=True)
+        transaction.on_commit(partial(
+            cola_de_tareas().notificar_cambios, agregadas=priorizadas, quitadas=quitadas
+        ))
+
+    return (cant_cargas, cant_fotos)
+
+
+def procesar_novedades(cant_novedades=None):
+    """
+    Suma a los contadores la diferencia entre lo que aportaban las mesa-categorías y attachments
+    con novedades antes de cada cambio y lo que aportan después, y saca de la cola a los que ya
+    no tienen tareas pendientes. Devuelve la cantidad de novedades procesadas.
+    """
+    with transaction.atomic():
+        novedades = NovedadScheduler.objects.select_for_update(skip_locked=True).order_by('id')
+        if cant_novedades:
+            novedades = novedades[0:cant_novedades]
+        novedades = list(novedades.values_list(
+            'id', 'mesa_categoria_id', 'attachment_id',
+            'era_pendiente', 'era_parcial_sensible', 'es_pendiente', 'es_parcial_sensible'
+        ))
+        NovedadScheduler.objects.filter(id__in=[novedad[0] for novedad in novedades]).delete()
+    if not novedades:
+        return 0
+
+    fotos, cargas, cargas_parcial = 0, 0, 0
+    mesa_categorias, attachments = set(), set()
+    for _, mc_id, attachment_id, era_pendiente, era_parcial, es_pendiente, es_parcial in novedades:
+        if mc_id:
+            mesa_categorias.add(mc_id)
+            cargas += es_pendiente - era_pendiente
+            cargas_parcial += es_parcial - era_parcial
+        if attachment_id:
+            attachments.add(attachment_id)
+            fotos += es_pendiente - era_pendiente
+
+    # Para sacar de la cola se mira el estado actual, que puede ser posterior a las novedades.
+    mc_pendientes = set(MesaCategoria.objects.con_carga_pendiente(
+        for_update=False).filter(id__in=mesa_categorias).values_list('id', flat=True))
+    attachments_pendientes = set(Attachment.objects.sin_identificar(
+        for_update=False).filter(id__in=attachments).values_list('id', flat=True))
+
+    terminadas = ColaCargasPendientes.objects.filter(
+        Q(mesa_categoria_id__in=mesa_categorias - mc_pendientes) |
+        Q(attachment_id__in=attachments - attachments_pendientes)
+    )
+    quitadas = list(terminadas.values_list('id', flat=True))
+    if quitadas:
+        terminadas.delete()
+        transaction.on_commit(partial(cola_de_tareas().notificar_cambios, quitadas=quitadas))
+
+    ContadoresScheduler.sumar(fotos=fotos, cargas=cargas, cargas_parcial=cargas_parcial)
+    return len(novedades)
+
+
+def espacio_en_la_cola():
+    """
+    Devuelve cuántos elementos hay que agregar a la cola y a partir de qué orden.
+    """
     largo_cola = ColaCargasPendientes.largo_cola()
     ultimo = ColaCargasPendientes.objects.order_by('-orden').first()
     orden_inicial = ultimo.orden if ultimo else 0
     cota_inferior_largo = max(count_active_sessions(), config.COTA_INFERIOR_COLA_TAREAS)
     long_cola = int(cota_inferior_largo * config.FACTOR_LARGO_COLA_POR_USUARIOS_ACTIVOS) - largo_cola
+    return long_cola, orden_inicial
+
+
+def tareas_candidatas(long_cola, excluir_encoladas=False, distrito_id=None):
+    """
+    Devuelve las mesa-categorías con carga pendiente y los attachments sin identificar que
+    puede encolar ``intercalar_tareas``. Cada paso encola a lo sumo uno de cada tipo, así que
+    alcanza con traer los `long_cola` más prioritarios: la vuelta hace una consulta por tipo
+    sin importar cuántas tareas pendientes haya.
 
-    mc_con_carga_pendiente = MesaCategoria.objects.con_carga_pendiente(for_update=False)
-    attachments_sin_identificar = Attachment.objects.sin_identificar(for_update=False)
+    Los attachments vienen anotados con lo que hace falta para encolarlos sin ir a la base
+    por cada uno: si tienen alguna identificación y el distrito y la sección de su
+    preidentificación.
 
-    cant_fotos = attachments_sin_identificar.count()
-    cant_cargas = mc_con_carga_pendiente.count()
+    Si se indica `distrito_id` sólo se devuelven las tareas de ese distrito.
+    """
+    long_cola = max(long_cola, 0)
+    cargas = MesaCategoria.objects.con_carga_pendiente(for_update=False)
+    identificaciones = Attachment.objects.sin_identificar(for_update=False)
+    if distrito_id is not None:
+        cargas = cargas.filter(distrito_id=distrito_id)
+        identificaciones = identificaciones.filter(pre_identificacion__distrito_id=distrito_id)
+    if excluir_encoladas:
+        encoladas = ColaCargasPendientes.objects
+        cargas = cargas.exclude(id__in=encoladas.exclude(mesa_categoria=None).values('mesa_categoria'))
+        identificaciones = identificaciones.exclude(
+            id__in=encoladas.exclude(attachment=None).values('attachment')
+        )
+
+    cargas = cargas.ordenadas_por_prioridad_batch()[:long_cola]
+    identificaciones = identificaciones.priorizadas().annotate(
+        tiene_identificaciones=Exists(Identificacion.objects.filter(attachment=OuterRef('id'))),
+        distrito_preidentificacion_id=F('pre_identificacion__distrito_id'),
+        seccion_preidentificacion_id=F('pre_identificacion__seccion_id'),
+    )[:long_cola]
+    return cargas, identificaciones
 
-    mc_con_carga_importante = MesaCategoria.objects.con_carga_sensible_y_parcial_pendiente()
-    cant_cargas_parcial = mc_con_carga_importante.count()
 
-    identificaciones = iter(attachments_sin_identificar.priorizadas())
-    cargas = iter(mc_con_carga_pendiente.ordenadas_por_prioridad_batch())
+def unidades_de_carga(status):
+    """
+    Cuántas cargas hay que encolar de una mesa-categoría con ese status para que consolide.
+    """
+    # Si ya está consolidada por CSV hay que hacer una carga menos.
+    if status in [MesaCategoria.STATUS.parcial_consolidada_csv, MesaCategoria.STATUS.total_consolidada_csv]:
+        return settings.MIN_COINCIDENCIAS_CARGAS - 1
+    # Si está en conflicto sólo necesitamos una carga más.
+    if status in [MesaCategoria.STATUS.parcial_en_conflicto, MesaCategoria.STATUS.total_en_conflicto]:
+        return 1
+    return settings.MIN_COINCIDENCIAS_CARGAS
+
+
+def unidades_de_identificacion(tiene_identificaciones):
+    """
+    Cuántas identificaciones hay que encolar de un attachment para que consolide.
+    """
+    # Si hay alguna identificación asumimos que sólo falta una para consolidar.
+    return 1 if tiene_identificaciones else settings.MIN_COINCIDENCIAS_IDENTIFICACION
+
+
+def intercalar_tareas(cargas, identificaciones, contadores, long_cola, orden_inicial):
+    """
+    Arma hasta `long_cola` elementos de la cola, tomando de los iteradores `cargas`
+    (mesa-categorías) e `identificaciones` (attachments, anotados como en ``tareas_candidatas``)
+    según la cantidad de tareas pendientes de cada tipo que indican los `contadores`.
+    """
+    cant_fotos = max(contadores.cant_fotos, 0)
+    cant_cargas = max(contadores.cant_cargas, 0)
+    # Las cargas parciales son parte de las cargas (aunque los contadores estén desfasados).
+    cant_cargas_parcial = min(max(contadores.cant_cargas_parcial, 0), cant_cargas)
 
     nuevas, k, num_cargas, num_idents = [], orden_inicial, 0, 0
 
@@ -62,16 +362,14 @@ def scheduler(reconstruir_la_cola=False):
         if turno_mc or (cant_fotos == 0 and cant_cargas > 0):
             # Mantenemos el invariante que `cant_cargas >= 0` y si
             # estamos en este punto sabemos que `cant_cargas > 0`.
-            mc = next(cargas)
+            mc = next(cargas, None)
+            if mc is None:
+                # Los contadores pueden estar desfasados: no quedan cargas para encolar.
+                cant_cargas, cant_cargas_parcial = 0, 0
+                continue
             cant_cargas -= 1
 
-            cant_unidades = settings.MIN_COINCIDENCIAS_CARGAS
-            # Si ya está consolidada por CSV hay que hacer una carga menos.
-            if mc.status in [MesaCategoria.STATUS.parcial_consolidada_csv, MesaCategoria.STATUS.total_consolidada_csv]:
-                cant_unidades = settings.MIN_COINCIDENCIAS_CARGAS - 1
-            # Si está en conflicto sólo necesitamos una carga más.
-            elif mc.status in [MesaCategoria.STATUS.parcial_en_conflicto, MesaCategoria.STATUS.total_en_conflicto]:
-                cant_unidades = 1
+            cant_unidades = unidades_de_carga(mc.status)
 
             if mc.status in MesaCategoria.status_carga_parcial:
                 cant_cargas_parcial -= 1
@@ -80,11 +378,11 @@ def scheduler(reconstruir_la_cola=False):
                 # Encolo tantas unidades como haga falta.
                 nuevas.append(
                     ColaCargasPendientes(
-                        mesa_categoria=mc,
+                        mesa_categoria_id=mc.id,
                         orden=k,
                         numero_carga=i,
-                        distrito=mc.mesa.distrito,
-                        seccion=mc.mesa.seccion
+                        distrito_id=mc.distrito_id,
+                        seccion_id=mc.seccion_id
                     )
                 )
                 k += 1
@@ -95,31 +393,24 @@ def scheduler(reconstruir_la_cola=False):
         # Toca encolar foto. El chequeo `cant_fotos > 0` sólo tiene sentido
         # si `config.COEFICIENTE_IDENTIFICACION_CARGA <= 0`.
         if not turno_mc and cant_fotos > 0:
-            foto = next(identificaciones)
+            foto = next(identificaciones, None)
+            if foto is None:
+                cant_fotos = 0
+                continue
             cant_fotos -= 1
 
-            cant_unidades = settings.MIN_COINCIDENCIAS_IDENTIFICACION
-            # Si hay alguna identificación asumimos que sólo falta una para consolidar.
-            if foto.identificaciones.exists():
-                cant_unidades = 1
-
-            for i in range(cant_unidades):
+            for i in range(unidades_de_identificacion(foto.tiene_identificaciones)):
                 nuevas.append(
                     ColaCargasPendientes(
-                        attachment=foto,
+                        attachment_id=foto.id,
                         orden=k,
                         numero_carga=i,
-                        distrito=foto.distrito_preidentificacion,
-                        seccion=foto.seccion_preidentificacion
+                        distrito_id=foto.distrito_preidentificacion_id,
+                        seccion_id=foto.seccion_preidentificacion_id
                     )
                 )
                 k += 1
 
             num_idents += 1
 
-    with transaction.atomic():
-        if reconstruir_la_cola:
-            ColaCargasPendientes.vaciar()
-        ColaCargasPendientes.objects.bulk_create(nuevas, ignore_conflicts=True)
-
-    return (k - orden_inicial, num_cargas, num_idents)
+    return nuevas, k, num_cargas, num_idents
@@ -0,0 +1,402 @@
+"""
+Simulador de eventos discretos del circuito de tareas (scheduler, cola y consolidación), para elegir
+los parámetros de scheduling antes de la elección en lugar de ajustarlos en vivo.
+
+Se simula la llegada de actas según una curva (sintética o registrada) y un conjunto de fiscales que
+piden tareas, tardan un tiempo aleatorio en resolverlas y las entregan. Todo lo demás es el código
+real sobre la base local: ``scheduler``, la cola de tareas configurada, la asignación de tareas a les
+fiscales y la consolidación. Lo único simulado es el reloj: los eventos se procesan en orden sin
+esperar, y el vencimiento de las asignaciones (``settings.TIMEOUT_TAREAS``) se reproduce atrasando
+``Fiscal.asignacion_ultima_tarea`` según el tiempo simulado.
+
+Modifica la base: ¡usar sólo en una base de pruebas! (por ejemplo, con el dataset de
+``generar_dataset_sintetico``).
+"""
+import csv
+import heapq
+import random
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+from types import SimpleNamespace
+
+from constance import config
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from adjuntos.consolidacion import consumir_novedades
+from adjuntos.models import Attachment, Identificacion, PreIdentificacion
+from elecciones.models import Carga, Mesa, MesaCategoria, VotoMesaReportado
+from fiscales.acciones import (
+    CargaCategoriaEnActa, IdentificacionDeFoto, NoHayAccion, elegir_siguiente_accion_en_el_momento
+)
+from fiscales.models import Fiscal
+from .cola_tareas import cola_de_tareas
+from .models import ColaCargasPendientes, ContadoresScheduler
+from .scheduler import scheduler, scheduler_incremental
+
+CURVAS = ['campana', 'uniforme']
+
+# Lo que se cuenta en cada minuto simulado.
+EVENTOS = [
+    'actas',
+    'identificaciones',
+    'cargas',
+    'pedidos_sin_tarea',
+    'inanicion',
+    'tareas_de_mas',
+    'cargas_perdidas',
+    'abandonos',
+]
+# Lo que se mide al final de cada minuto simulado.
+ESTADO = [
+    'largo_cola',
+    'fotos_identificadas',
+    'mesa_categorias_consolidadas',
+    'mesas_consolidadas',
+]
+METRICAS = EVENTOS + ESTADO
+
+
+def llegadas_sinteticas(cant_actas, minutos, curva='campana', semilla=42):
+    """
+    Devuelve los segundos de llegada de `cant_actas` actas distribuidas en `minutos`:
+    en forma pareja o con un pico en el primer tercio, como después del cierre de los comicios.
+    """
+    rng = random.Random(semilla)
+    duracion = minutos * 60
+    if curva == 'uniforme':
+        segundos = [rng.uniform(0, duracion) for _ in range(cant_actas)]
+    else:
+        segundos = [rng.triangular(0, duracion, duracion / 3) for _ in range(cant_actas)]
+    return sorted(segundos)
+
+
+def llegadas_registradas(archivo, semilla=42):
+    """
+    Devuelve los segundos de llegada de las actas de una curva registrada: un CSV con las columnas
+    `minuto` y `actas` (cuántas llegaron en ese minuto), por ejemplo de una elección anterior.
+    """
+    rng = random.Random(semilla)
+    segundos = []
+    for fila in csv.DictReader(archivo):
+        minuto = float(fila['minuto'])
+        segundos.extend(rng.uniform(minuto * 60, (minuto + 1) * 60) for _ in range(int(fila['actas'])))
+    return sorted(segundos)
+
+
+class Simulador():
+    """
+    Corre la simulación. Cada fiscal repite: pedir una tarea, resolverla en un tiempo
+    uniforme entre la mitad y una vez y media de la duración media, y entregarla.
+    Con probabilidad `prob_abandono` se va sin entregar (la tarea queda asignada hasta que vence)
+    y con probabilidad `prob_error` identifica una mesa equivocada o carga un voto de más.
+
+    Cada ``config.PAUSA_SCHEDULER`` segundos simulados se hace una ronda como la del comando
+    ``scheduler``: consolidación y encolado (completo o incremental).
+    """
+
+    def __init__(
+        self,
+        llegadas,
+        cant_fiscales=50,
+        segundos_identificacion=30,
+        segundos_carga=90,
+        segundos_espera_sin_tarea=15,
+        prob_error=0.02,
+        prob_abandono=0.01,
+        minutos=None,
+        incremental=False,
+        cant_rondas_antes_de_reconstruir_la_cola=100,
+        cant_elem_consolidador=500,
+        semilla=42,
+        log=None,
+    ):
+        self.llegadas = llegadas
+        self.cant_fiscales = cant_fiscales
+        self.segundos_identificacion = segundos_identificacion
+        self.segundos_carga = segundos_carga
+        self.segundos_espera_sin_tarea = segundos_espera_sin_tarea
+        self.prob_error = prob_error
+        self.prob_abandono = prob_abandono
+        # Por defecto, una hora más allá de la llegada de la última acta.
+        ultima_llegada = llegadas[-1] if llegadas else 0
+        self.fin = minutos * 60 if minutos else ultima_llegada + 60 * 60
+        self.incremental = incremental
+        self.cant_rondas_antes_de_reconstruir_la_cola = cant_rondas_antes_de_reconstruir_la_cola
+        self.cant_elem_consolidador = cant_elem_consolidador
+        self.rng = random.Random(semilla)
+        self.semilla = semilla
+        self.log = log or (lambda mensaje: None)
+
+        self.corrida = uuid.uuid4().hex[:8]
+        self.ahora = 0
+        self.eventos = []
+        self.cant_eventos = 0
+        self.minutos = []
+        self.cant_minutos_medidos = 0
+        self.ronda_consolidador = 0
+        # Mesa verdadera de cada acta.
+        self.mesa_de_acta = {}
+        # Segundo simulado desde el que cada fiscal tiene asignada su tarea.
+        self.asignados_desde = {}
+
+    def programar(self, segundo, evento, *args):
+        # `cant_eventos` desempata para que no se comparen los eventos.
+        self.cant_eventos += 1
+        heapq.heappush(self.eventos, (segundo, self.cant_eventos, evento, args))
+
+    def minuto(self, indice):
+        while len(self.minutos) <= indice:
+            self.minutos.append(OrderedDict((metrica, 0) for metrica in METRICAS))
+        return self.minutos[indice]
+
+    def minuto_actual(self):
+        return self.minuto(int(self.ahora // 60))
+
+    def duracion(self, media):
+        return self.rng.uniform(media / 2, media * 3 / 2)
+
+    def correr(self):
+        self.preparar()
+        for segundo in self.llegadas:
+            self.programar(segundo, self.llegada_de_acta)
+        for fiscal in self.fiscales:
+            self.programar(self.rng.uniform(0, 60), self.pedido, fiscal)
+        self.programar(0, self.ronda)
+        self.programar(60, self.fin_de_minuto)
+
+        while self.eventos:
+            segundo, _, evento, args = heapq.heappop(self.eventos)
+            if segundo > self.fin:
+                break
+            self.ahora = segundo
+            evento(*args)
+        return self.minutos
+
+    def preparar(self):
+        mesas = list(Mesa.objects.filter(attachments=None).values_list('id', 'distrito_id', 'seccion_id'))
+        if len(mesas) < len(self.llegadas):
+            raise ValueError(
+                f'Hay {len(mesas)} mesas sin actas y se simulan {len(self.llegadas)} llegadas.'
+            )
+        self.mesas = self.rng.sample(mesas, len(self.llegadas))
+        self.mesas_con_acta = []
+        # Sin estado confirmado no se les crea usuario: no lo necesitan.
+        self.fiscales = [
+            Fiscal.objects.create(apellido='Simulación', nombres=f'{self.corrida} {i}')
+            for i in range(self.cant_fiscales)
+        ]
+        self.cola = cola_de_tareas()
+        self.log(f'Simulación {self.corrida}: {len(self.llegadas)} actas, {self.cant_fiscales} fiscales.')
+
+    def votos(self, mesa_id, opcion_id):
+        """
+        Votos "verdaderos" de la opción en el acta de la mesa. Los de las opciones de metadata
+        son los mismos en todas las categorías.
+        """
+        return random.Random(f'{self.semilla}-{mesa_id}-{opcion_id}').randint(0, 300)
+
+    def llegada_de_acta(self):
+        mesa_id, distrito_id, seccion_id = self.mesas[len(self.mesa_de_acta)]
+        # Como si la subiera un fiscal del distrito de la mesa.
+        pre_identificacion = PreIdentificacion.objects.create(distrito_id=distrito_id, seccion_id=seccion_id)
+        attachment = Attachment.objects.create(
+            foto_digest=f'simulacion-{self.corrida}-{mesa_id}',
+            mimetype='image/jpeg',
+            pre_identificacion=pre_identificacion,
+        )
+        self.mesa_de_acta[attachment.id] = mesa_id
+        self.mesas_con_acta.append(mesa_id)
+        self.minuto_actual()['actas'] += 1
+
+    def hay_tareas_pendientes(self):
+        contadores = ContadoresScheduler.actuales()
+        return bool(contadores and (contadores.cant_fotos > 0 or contadores.cant_cargas > 0))
+
+    def pedido(self, fiscal):
+        """
+        Le fiscal pide su siguiente tarea, como en ``fiscales.acciones.siguiente_accion``.
+        """
+        minuto = self.minuto_actual()
+        fiscal.refresh_from_db()
+        if not fiscal.last_seen or timezone.now() - fiscal.last_seen > timedelta(minutes=1):
+            fiscal.update_last_seen(timezone.now())
+        request = SimpleNamespace(user=SimpleNamespace(fiscal=fiscal))
+
+        with transaction.atomic():
+            fiscal.limpiar_asignacion_previa()
+        self.asignados_desde.pop(fiscal.id, None)
+
+        with transaction.atomic():
+            mesa_categoria, foto = self.cola.siguiente_tarea(fiscal)
+            if mesa_categoria:
+                accion = CargaCategoriaEnActa(request, mesa_categoria)
+            elif foto:
+                accion = IdentificacionDeFoto(request, foto)
+            else:
+                accion = None
+        if accion is None:
+            minuto['pedidos_sin_tarea'] += 1
+            if self.hay_tareas_pendientes():
+                minuto['inanicion'] += 1
+            if config.ASIGNAR_MESA_EN_EL_MOMENTO_SI_NO_HAY_COLA:
+                accion = elegir_siguiente_accion_en_el_momento(request)
+        if accion is None or isinstance(accion, NoHayAccion):
+            self.programar(self.ahora + self.segundos_espera_sin_tarea, self.pedido, fiscal)
+            return
+
+        self.asignados_desde[fiscal.id] = self.ahora
+        if self.rng.random() < self.prob_abandono:
+            minuto['abandonos'] += 1
+            return
+
+        if isinstance(accion, IdentificacionDeFoto):
+            segundos = self.duracion(self.segundos_identificacion)
+            self.programar(self.ahora + segundos, self.identificar, fiscal, accion.attachment)
+        else:
+            # Como en ``CargaCategoriaEnActa.ejecutar``.
+            mc = accion.mc
+            parcial = (
+                mc.categoria.requiere_cargas_parciales and mc.status in MesaCategoria.status_carga_parcial
+            )
+            tipo = Carga.TIPOS.parcial if parcial else Carga.TIPOS.total
+            segundos = self.duracion(self.segundos_carga)
+            self.programar(self.ahora + segundos, self.cargar, fiscal, mc, tipo)
+
+    def identificar(self, fiscal, attachment):
+        """
+        Como ``IdentificacionCreateView.form_valid``.
+        """
+        minuto = self.minuto_actual()
+        mesa_id = self.mesa_de_acta[attachment.id]
+        if self.rng.random() < self.prob_error:
+            mesa_id = self.rng.choice(self.mesas)[0]
+
+        attachment.refresh_from_db()
+        if attachment.status != Attachment.STATUS.sin_identificar:
+            minuto['tareas_de_mas'] += 1
+        with transaction.atomic():
+            Identificacion.objects.create(
+                status=Identificacion.STATUS.identificada,
+                mesa_id=mesa_id,
+                fiscal=fiscal,
+                attachment=attachment,
+            )
+            attachment.desasignar_a_fiscal()
+        minuto['identificaciones'] += 1
+        self.programar(self.ahora, self.pedido, fiscal)
+
+    def cargar(self, fiscal, mesa_categoria, tipo):
+        """
+        Como la vista ``fiscales.views.carga``.
+        """
+        minuto = self.minuto_actual()
+        self.programar(self.ahora, self.pedido, fiscal)
+        fiscal.refresh_from_db()
+        if fiscal.mesa_categoria_asignada_id != mesa_categoria.id:
+            # La vista no acepta la carga.
+            minuto['cargas_perdidas'] += 1
+            return
+
+        mesa_categoria.refresh_from_db()
+        if tipo == Carga.TIPOS.total:
+            resuelta = mesa_categoria.status == MesaCategoria.STATUS.total_consolidada_dc
+        else:
+            resuelta = mesa_categoria.status not in MesaCategoria.status_carga_parcial
+        if resuelta:
+            minuto['tareas_de_mas'] += 1
+
+        opciones = mesa_categoria.categoria.opciones_actuales(
+            tipo == Carga.TIPOS.parcial, excluir_optativas=True
+        )
+        with transaction.atomic():
+            carga = Carga.objects.create(
+                mesa_categoria=mesa_categoria, tipo=tipo, fiscal=fiscal, origen=Carga.SOURCES.web
+            )
+            votos = [
+                VotoMesaReportado(
+                    carga=carga, opcion=opcion, votos=self.votos(mesa_categoria.mesa_id, opcion.id)
+                )
+                for opcion in opciones
+            ]
+            if votos and self.rng.random() < self.prob_error:
+                votos[self.rng.randrange(len(votos))].votos += 1
+            VotoMesaReportado.objects.bulk_create(votos)
+            mesa_categoria.desasignar_a_fiscal()
+        minuto['cargas'] += 1
+
+    def vencer_asignaciones(self):
+        """
+        Atrasa la última asignación de les fiscales cuya tarea venció en tiempo simulado
+        para que ``Fiscal.liberar_mesacategorias_y_attachments`` la libere.
+        """
+        limite = self.ahora - settings.TIMEOUT_TAREAS * 60
+        vencidos = [fiscal_id for fiscal_id, desde in self.asignados_desde.items() if desde < limite]
+        if not vencidos:
+            return
+        Fiscal.objects.filter(id__in=vencidos, asignacion_ultima_tarea__isnull=False).update(
+            asignacion_ultima_tarea=timezone.now() - timedelta(minutes=settings.TIMEOUT_TAREAS + 1)
+        )
+        for fiscal_id in vencidos:
+            del self.asignados_desde[fiscal_id]
+
+    def ronda(self):
+        """
+        Como ``Command.una_ronda`` del comando ``scheduler``.
+        """
+        self.vencer_asignaciones()
+        consumir_novedades(self.cant_elem_consolidador)
+        self.ronda_consolidador += 1
+        reconstruir_la_cola = self.ronda_consolidador % self.cant_rondas_antes_de_reconstruir_la_cola == 0
+        if self.incremental and not reconstruir_la_cola:
+            scheduler_incremental()
+        else:
+            scheduler(reconstruir_la_cola)
+        self.programar(self.ahora + config.PAUSA_SCHEDULER, self.ronda)
+
+    def fin_de_minuto(self):
+        minuto = self.minuto(self.cant_minutos_medidos)
+        self.cant_minutos_medidos += 1
+        minuto['largo_cola'] = ColaCargasPendientes.largo_cola()
+        minuto['fotos_identificadas'] = Attachment.objects.filter(
+            id__in=self.mesa_de_acta.keys(), status=Attachment.STATUS.identificada
+        ).count()
+        mesa_categorias = MesaCategoria.objects.solo_de_cats_activas().filter(
+            mesa_id__in=self.mesas_con_acta
+        )
+        minuto['mesa_categorias_consolidadas'] = mesa_categorias.filter(
+            status=MesaCategoria.STATUS.total_consolidada_dc
+        ).count()
+        minuto['mesas_consolidadas'] = len(self.mesas_con_acta) - mesa_categorias.exclude(
+            status=MesaCategoria.STATUS.total_consolidada_dc
+        ).values('mesa_id').distinct().count()
+        self.log(f'Minuto {self.cant_minutos_medidos}: {dict(minuto)}')
+        self.programar(self.ahora + 60, self.fin_de_minuto)
+
+    def resumen(self):
+        """
+        Totales de la corrida: mesas consolidadas por minuto (hasta llegar al total consolidado),
+        minutos hasta consolidar la mitad y el 90% de las mesas con acta, pedidos sin tarea habiendo
+        tareas pendientes y proporción de trabajo de más sobre el total entregado.
+        """
+        total = {evento: sum(minuto[evento] for minuto in self.minutos) for evento in EVENTOS}
+        consolidadas = [minuto['mesas_consolidadas'] for minuto in self.minutos[:self.cant_minutos_medidos]]
+        mesas_consolidadas = consolidadas[-1] if consolidadas else 0
+
+        def minutos_hasta(cantidad):
+            return next((i + 1 for i, cant in enumerate(consolidadas) if cant and cant >= cantidad), None)
+
+        entregadas = total['identificaciones'] + total['cargas']
+        return OrderedDict([
+            ('actas', total['actas']),
+            ('mesas_consolidadas', mesas_consolidadas),
+            ('mesas_por_minuto', round(mesas_consolidadas / (minutos_hasta(mesas_consolidadas) or 1), 2)),
+            ('minutos_50', minutos_hasta(0.5 * len(self.llegadas))),
+            ('minutos_90', minutos_hasta(0.9 * len(self.llegadas))),
+            ('inanicion', total['inanicion']),
+            ('tareas_entregadas', entregadas),
+            ('proporcion_de_mas', round(total['tareas_de_mas'] / entregadas, 4) if entregadas else 0),
+            ('cargas_perdidas', total['cargas_perdidas']),
+        ])
@@ -0,0 +1,193 @@
+from datetime import timedelta
+from multiprocessing.managers import RemoteError
+
+import pytest
+from constance.test import override_config
+from django.db import transaction
+from django.utils import timezone
+
+from elecciones.tests.factories import (
+    AttachmentFactory, CargaFactory, DistritoFactory, FiscalFactory, IdentificacionFactory,
+    MesaCategoriaFactory
+)
+from fiscales.models import TareasDeFiscal
+from scheduling.cola_tareas import ColaEnBase, ColaEnMemoria, ColaEnMemoriaRemota
+from scheduling.metricas import formato_prometheus, resumen
+from scheduling.models import ColaCargasPendientes, MetricasColaPorMinuto
+
+
+def test_cola_en_memoria_por_orden_y_afinidad():
+    cola = ColaEnMemoria()
+    # (id, orden, mesa_categoria_id, attachment_id, distrito_id, seccion_id)
+    cola.cargar([
+        (1, 10, None, 100, 1, 11),
+        (2, 5, None, 200, 2, 21),
+        (3, 30, None, 300, 2, 22),
+        (4, 20, None, 400, 1, 12),
+    ])
+    assert cola.largo() == 4
+
+    # La del distrito 1 está a más de 3 lugares de la primera: sale la primera.
+    assert cola.siguiente(distrito_id=1, bonus_afinidad=3)[0] == 2
+    # Ahora la del distrito 1 es la primera.
+    assert cola.siguiente(distrito_id=2, bonus_afinidad=10)[0] == 1
+    # Sin bonus se prefiere siempre la afín.
+    assert cola.siguiente(seccion_id=22)[0] == 3
+
+    # Lo entregado no vuelve al recargar desde la tabla.
+    cola.cargar([(1, 10, None, 100, 1, 11), (4, 20, None, 400, 1, 12)])
+    assert cola.largo() == 1
+    assert cola.siguiente()[0] == 4
+    assert cola.siguiente() is None
+
+
+def test_cola_en_memoria_excluye_tareas():
+    cola = ColaEnMemoria()
+    cola.cargar([
+        (1, 10, None, 100, 1, 11),
+        (2, 20, 500, None, 1, 11),
+        (3, 30, None, 300, 1, 11),
+    ])
+    assert cola.siguiente(excluir_attachments={100}, excluir_mesa_categorias={500})[0] == 3
+    assert cola.siguiente(distrito_id=1, excluir_attachments={100})[0] == 2
+    # Las excluidas quedan para otres.
+    assert cola.siguiente()[0] == 1
+
+
+def test_cola_en_memoria_agregar_y_quitar():
+    cola = ColaEnMemoria()
+    cola.cargar([
+        (1, 10, None, 100, 1, 11),
+        (2, 20, 500, None, 1, 11),
+        (3, 30, None, 300, 2, 21),
+    ])
+    cola.quitar([1])
+    # La 3 se adelanta y llega una nueva.
+    cola.agregar([(3, 0, None, 300, 2, 21), (4, 15, 600, None, 1, 12)])
+    assert cola.largo() == 3
+    assert cola.siguiente(distrito_id=1)[0] == 4
+    assert cola.siguiente()[0] == 3
+    # Lo entregado no vuelve aunque se lo agregue de nuevo.
+    cola.agregar([(3, 0, None, 300, 2, 21)])
+    assert cola.siguiente(distrito_id=2)[0] == 2
+    assert cola.siguiente() is None
+
+
+def test_cola_en_memoria_remota(db):
+    distrito = DistritoFactory()
+    fotos = AttachmentFactory.create_batch(3)
+    for orden, foto in enumerate(fotos):
+        ColaCargasPendientes.objects.create(
+            attachment=foto, orden=orden, distrito=distrito if orden == 2 else None
+        )
+
+    cola = ColaEnMemoriaRemota(cola=ColaEnMemoria())
+    cola.notificar_cambios()
+
+    assert cola.siguiente_tarea() == (None, fotos[0])
+    fiscal = FiscalFactory(distrito_afin=distrito)
+    assert cola.siguiente_tarea(fiscal) == (None, fotos[2])
+    # La tarea entregada se borra de la tabla.
+    assert list(ColaCargasPendientes.objects.values_list('attachment', flat=True)) == [fotos[1].id]
+
+    # Si alguien la tomó por otro camino se pasa a la siguiente.
+    ColaCargasPendientes.objects.all().delete()
+    assert cola.siguiente_tarea() == (None, None)
+
+
+def test_cola_en_memoria_remota_devuelve_la_tarea_si_se_revierte(db, mocker):
+    fotos = AttachmentFactory.create_batch(2)
+    for orden, foto in enumerate(fotos):
+        ColaCargasPendientes.objects.create(attachment=foto, orden=orden)
+    cola = ColaEnMemoriaRemota(cola=ColaEnMemoria())
+    cola.notificar_cambios()
+
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            assert cola.siguiente_tarea() == (None, fotos[0])
+            raise RuntimeError()
+    cola.devolver_tarea()
+    # El DELETE se deshizo y la tarea vuelve a salir primera.
+    assert ColaCargasPendientes.objects.count() == 2
+    assert cola.siguiente_tarea() == (None, fotos[0])
+
+    # Si el proceso de la cola falla al atender el pedido se usa la tabla.
+    mocker.patch.object(cola.cola, 'siguiente', side_effect=RemoteError())
+    assert cola.siguiente_tarea() == (None, fotos[1])
+    assert cola.cola is None
+
+
+def test_tareas_de_fiscal_excluidas(db):
+    fiscal = FiscalFactory()
+    foto = AttachmentFactory()
+    mc = MesaCategoriaFactory()
+    IdentificacionFactory(fiscal=fiscal, attachment=foto)
+    CargaFactory(fiscal=fiscal, mesa_categoria=mc)
+    CargaFactory(fiscal=fiscal, mesa_categoria=mc)
+    assert TareasDeFiscal.de_fiscal(fiscal) == ([mc.id], [foto.id])
+    assert TareasDeFiscal.de_fiscal(FiscalFactory()) == ([], [])
+
+    otra_foto = AttachmentFactory()
+    for cola in [ColaEnBase(), ColaEnMemoriaRemota(cola=ColaEnMemoria())]:
+        ColaCargasPendientes.objects.all().delete()
+        ColaCargasPendientes.objects.create(attachment=foto, orden=0)
+        ColaCargasPendientes.objects.create(mesa_categoria=mc, orden=1)
+        ColaCargasPendientes.objects.create(attachment=otra_foto, orden=2)
+        cola.notificar_cambios()
+
+        with override_config(UMBRAL_EXCLUIR_TAREAS_FISCAL=10):
+            assert cola.siguiente_tarea(fiscal) == (None, otra_foto)
+            assert cola.siguiente_tarea(fiscal) == (None, None)
+        assert ColaCargasPendientes.objects.count() == 2
+
+
+def test_tareas_de_fiscal_acotadas(db, mocker):
+    mocker.patch.object(TareasDeFiscal, 'CANTIDAD_MAXIMA', 3)
+    fiscal = FiscalFactory()
+    for id in [1, 2, 3, 2, 4, 5]:
+        TareasDeFiscal.agregar(fiscal.id, 'attachments', id)
+    # Se conservan las últimas, en orden, sin repetir.
+    assert TareasDeFiscal.de_fiscal(fiscal) == ([], [3, 4, 5])
+
+
+def test_metricas_de_la_cola(db, mocker):
+    ahora = timezone.now()
+    mocker.patch('scheduling.models.timezone.now', return_value=ahora)
+    # Se descarta lo que hayan registrado otros tests.
+    MetricasColaPorMinuto.volcar()
+    MetricasColaPorMinuto.objects.all().delete()
+
+    fotos = AttachmentFactory.create_batch(3)
+    mc = MesaCategoriaFactory()
+    for orden, (foto, mesa_categoria) in enumerate([(fotos[0], None), (None, mc), (fotos[1], None)]):
+        ColaCargasPendientes.objects.create(
+            attachment=foto, mesa_categoria=mesa_categoria, orden=orden, creada=ahora - timedelta(seconds=30)
+        )
+    cola = ColaEnMemoriaRemota(cola=ColaEnMemoria())
+    cola.notificar_cambios()
+    # La primera la tomó alguien por otro camino: se saltea.
+    ColaCargasPendientes.objects.filter(orden=0).delete()
+    assert cola.siguiente_tarea() == (mc, None)
+    assert cola.siguiente_tarea() == (None, fotos[1])
+    assert ColaEnBase().siguiente_tarea() == (None, None)
+
+    ColaCargasPendientes.objects.create(attachment=fotos[2], orden=3, creada=ahora - timedelta(seconds=90))
+    CargaFactory(mesa_categoria=mc)
+    IdentificacionFactory(attachment=fotos[0])
+    MetricasColaPorMinuto.volcar()
+
+    datos = resumen(MetricasColaPorMinuto.objects.get().minuto)
+    assert datos['tareas_carga'] == 0
+    assert datos['tareas_identificacion'] == 1
+    assert datos['antiguedad_segundos'] == 90
+    assert datos['pedidos_con_tarea'] == 2
+    assert datos['pedidos_sin_tarea'] == 1
+    assert datos['saltos'] == 1
+    assert datos['asignaciones_cargas'] == 1
+    assert datos['asignaciones_identificaciones'] == 1
+    assert datos['cargas_completadas'] == 1
+    assert datos['identificaciones_completadas'] == 1
+
+    texto = formato_prometheus(datos)
+    assert 'escrutinio_cola_tareas{tipo="identificacion"} 1\n' in texto
+    assert 'escrutinio_cola_antiguedad_segundos 90.0\n' in texto
@@ -1,5 +1,5 @@
 from elecciones.models import (
-    MesaCategoria, Carga
+    MesaCategoria, Carga, MesasIdentificadasCircuito
 )
 from elecciones.tests.factories import (CategoriaFactory, CargaFactory, MesaFactory)
 from .factories import PrioridadSchedulingFactory
@@ -469,3 +469,38 @@ def test_excluir_fiscal_que_ya_cargo(db, settings):
     mesacat_fiscal_3 = MesaCategoria.objects.con_carga_pendiente().sin_cargas_del_fiscal(fiscal_3).mas_prioritaria()
     assert mesacat_fiscal_2 == None
     assert mesacat_fiscal_3 == mesacat_pv
+
+
+def test_contadores_de_mesas_identificadas(db, settings):
+    asignar_prioridades_standard(settings)
+    settings.MIN_COINCIDENCIAS_IDENTIFICACION = 1
+    fiscal = nuevo_fiscal()
+
+    la_seccion, circuito, lugar_votacion = crear_seccion("Bera centro")
+    pv = CategoriaFactory(nombre="PV")
+    gv = CategoriaFactory(nombre="GV")
+    [mesas] = crear_mesas([lugar_votacion], [pv, gv], 10)
+
+    identificar_mesa(mesas[0], fiscal)
+    identificar_mesa(mesas[1], fiscal)
+    contador = MesasIdentificadasCircuito.objects.get(circuito=circuito, categoria=pv)
+    assert (contador.total, contador.identificadas) == (10, 2)
+
+    # Otra foto de una mesa ya identificada no le cambia el orden de llegada.
+    identificar_mesa(mesas[0], fiscal)
+    verificar_valores_scheduling_mesacat(mesas[0], pv, 1, 1, 200)
+    contador.refresh_from_db()
+    assert contador.identificadas == 2
+
+    # Una mesa que pierde su foto deja de contar.
+    mesas[1].invalidar_asignacion_attachment()
+    contador.refresh_from_db()
+    assert contador.identificadas == 1
+
+    identificar_mesa(mesas[2], fiscal)
+    verificar_valores_scheduling_mesacat(mesas[2], pv, 11, 2, 110000)
+    verificar_valores_scheduling_mesacat(mesas[2], gv, 11, 2, 110000)
+
+    MesasIdentificadasCircuito.reconstruir()
+    contador = MesasIdentificadasCircuito.objects.get(circuito=circuito, categoria=gv)
+    assert (contador.total, contador.identificadas) == (10, 2)
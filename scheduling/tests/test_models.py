@@ -1,6 +1,9 @@
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from scheduling.models import (
+    CLAVE_EPOCA_PRIORIDADES, PrioridadScheduling,
     mapa_prioridades_desde_setting, mapa_prioridades_para_categoria, mapa_prioridades_para_seccion,
     mapa_prioridades_para_mesa_categoria
 )
@@ -12,10 +15,10 @@ from .utils_para_test import (
 )
 from elecciones.tests.factories import (
     SeccionFactory, CategoriaFactory, MesaCategoriaFactory,
-    CircuitoFactory, LugarVotacionFactory, MesaFactory
+    CircuitoFactory, LugarVotacionFactory, MesaFactory, AttachmentFactory
 )
 from elecciones.models import (
-    Seccion, Categoria, Mesa
+    Epoca, Seccion, Categoria, Mesa, MesaCategoria
 )
 
 # En este archivo se incluyen los tests de calculo de prioridades teniendo en cuenta
@@ -407,3 +410,56 @@ def test_prioridades_mesacat_seccion_con_definicion_parcial_2(db, settings, prop
     prioridades = mapa_prioridades_para_mesa_categoria(mesa_categoria)
 
     assert(prioridades.valor_para(proporcion, orden_de_llegada)) == prioridad
+
+
+def test_mapas_prioridades_se_invalidan_al_cambiar_prioridades(db, settings):
+    asignar_prioridades_standard(settings)
+    seccion = SeccionFactory(prioridad_2_a_10=50)
+    verificar_registro_prioridad(mapa_prioridades_para_seccion(seccion).registros_ordenados()[0], 2, 10, 50)
+
+    seccion.prioridad_2_a_10 = 60
+    seccion.save()
+    verificar_registro_prioridad(mapa_prioridades_para_seccion(seccion).registros_ordenados()[0], 2, 10, 60)
+
+    # Si las cambia otro proceso, se ven al vencer la vigencia de la consulta de la época.
+    settings.SEGUNDOS_VIGENCIA_MAPAS_PRIORIDADES = 60
+    mapa_prioridades_para_seccion(seccion)
+    PrioridadScheduling.objects.filter(seccion=seccion, desde_proporcion=2).update(prioridad=70)
+    Epoca.avanzar(CLAVE_EPOCA_PRIORIDADES)
+    verificar_registro_prioridad(mapa_prioridades_para_seccion(seccion).registros_ordenados()[0], 2, 10, 60)
+    settings.SEGUNDOS_VIGENCIA_MAPAS_PRIORIDADES = 0
+    verificar_registro_prioridad(mapa_prioridades_para_seccion(seccion).registros_ordenados()[0], 2, 10, 70)
+
+
+def test_recalcular_coeficientes_en_masa(db, settings):
+    definir_prioridades_seccion_categoria(settings)
+    seccion = seccion_prioritaria()
+    mesas = [crear_mesa(seccion) for i in range(3)]
+    for mesa in mesas:
+        AttachmentFactory(mesa=mesa)
+    for orden_de_llegada, (mesa, categoria) in enumerate(
+        [(mesa, categoria) for mesa in mesas for categoria in [categoria_pv(), categoria_gv()]], start=1
+    ):
+        MesaCategoriaFactory(
+            mesa=mesa, categoria=categoria, percentil=orden_de_llegada * 3,
+            orden_de_llegada=orden_de_llegada, coeficiente_para_orden_de_carga=1
+        )
+
+    # Al cambiar las prioridades de la sección se recalculan los coeficientes de sus MesaCategoria.
+    seccion.prioridad_hasta_2 = 3
+    seccion.cantidad_minima_prioridad_hasta_2 = 2
+    seccion.prioridad_2_a_10 = 40
+    seccion.save()
+    mesa_cats = MesaCategoria.objects.filter(seccion=seccion, percentil__isnull=False)
+    assert mesa_cats.count() == 6
+    for mesa_cat in mesa_cats:
+        coeficiente = mesa_cat.coeficiente_para_orden_de_carga
+        mesa_cat.recalcular_coeficiente_para_orden_de_carga()
+        assert coeficiente == mesa_cat.coeficiente_para_orden_de_carga != 1
+
+    # La cantidad de consultas no depende de la cantidad de MesaCategoria.
+    mesa_cats.update(coeficiente_para_orden_de_carga=1)
+    with CaptureQueriesContext(connection) as consultas:
+        MesaCategoria.recalcular_coeficiente_para_orden_de_carga_para_seccion(seccion)
+    assert len(consultas) <= 4
+    assert not mesa_cats.filter(coeficiente_para_orden_de_carga=1).exists()
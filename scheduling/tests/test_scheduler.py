@@ -1,25 +1,40 @@
+from datetime import timedelta
+
 from elecciones.models import (
     MesaCategoria, Carga
 )
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
 from elecciones.tests.factories import (
     AttachmentFactory,
     CargaFactory,
     CategoriaFactory,
     CategoriaOpcionFactory,
+    CircuitoFactory,
+    DistritoFactory,
     IdentificacionFactory,
+    LugarVotacionFactory,
     MesaCategoriaFactory,
     MesaFactory,
     OpcionFactory,
+    PreidentificacionFactory,
     VotoMesaReportadoFactory,
     FiscalFactory
 )
 
 from elecciones.tests.conftest import fiscal_client, setup_groups, fiscal_client_from_fiscal    # noqa
 from constance.test import override_config
-from scheduling.models import ColaCargasPendientes
+from scheduling.models import (
+    CircuitoPrioritario, ColaCargasPendientes, ContadoresScheduler, NovedadScheduler
+)
 from adjuntos.models import Identificacion, Attachment
 from adjuntos.consolidacion import consumir_novedades_identificacion, consumir_novedades_carga
-from scheduling.scheduler import scheduler
+from scheduling.scheduler import (
+    encolar_circuitos_prioritarios, reconstruir_cola_de_distrito, scheduler, scheduler_incremental
+)
+from scheduling.simulador import Simulador, llegadas_sinteticas
 
 
 def test_scheduler(db, settings):
@@ -81,6 +96,212 @@ def test_scheduler(db, settings):
         assert i in cola_primera
 
 
+def test_scheduler_incremental(db, settings):
+    """
+    El scheduler incremental saca de la cola lo que deja de estar pendiente, encola lo nuevo
+    y mantiene los contadores sin volver a contar.
+    """
+    settings.SCHEDULER_INCREMENTAL = True
+    AttachmentFactory.create_batch(5, status=Attachment.STATUS.sin_identificar)
+    m1 = MesaFactory(categorias=[CategoriaFactory()])
+    identificacion = IdentificacionFactory(
+        mesa=m1,
+        status=Identificacion.STATUS.identificada,
+        source=Identificacion.SOURCES.csv,
+    )
+
+    scheduler_incremental()
+    assert ColaCargasPendientes.largo_cola() == 5 * settings.MIN_COINCIDENCIAS_IDENTIFICACION + 1
+    contadores = ContadoresScheduler.actuales()
+    assert (contadores.cant_fotos, contadores.cant_cargas) == (6, 0)
+    assert not NovedadScheduler.objects.exists()
+
+    # Al consolidar la identificación la foto sale de la cola y entra la carga de la mesa.
+    consumir_novedades_identificacion()
+    # La novedad registra el estado antes y después de consolidar.
+    novedad = NovedadScheduler.objects.get(attachment=identificacion.attachment)
+    assert (novedad.era_pendiente, novedad.es_pendiente) == (True, False)
+    novedad = NovedadScheduler.objects.get(mesa_categoria__mesa=m1)
+    assert (novedad.era_pendiente, novedad.es_pendiente) == (False, True)
+    scheduler_incremental()
+    assert not ColaCargasPendientes.objects.filter(attachment=identificacion.attachment).exists()
+    assert ColaCargasPendientes.objects.filter(
+        mesa_categoria__mesa=m1).count() == settings.MIN_COINCIDENCIAS_CARGAS
+    contadores = ContadoresScheduler.actuales()
+    assert (contadores.cant_fotos, contadores.cant_cargas) == (5, 1)
+    cola = list(ColaCargasPendientes.objects.values_list('id', 'orden'))
+
+    # Sin novedades la cola queda igual.
+    scheduler_incremental()
+    assert list(ColaCargasPendientes.objects.values_list('id', 'orden')) == cola
+
+
+def test_sin_scheduler_incremental_no_se_registran_novedades(db, settings):
+    settings.SCHEDULER_INCREMENTAL = False
+    m1 = MesaFactory(categorias=[CategoriaFactory()])
+    IdentificacionFactory(
+        mesa=m1,
+        status=Identificacion.STATUS.identificada,
+        source=Identificacion.SOURCES.csv,
+    )
+    consumir_novedades_identificacion()
+    assert MesaCategoria.objects.filter(mesa=m1).con_carga_pendiente(for_update=False).exists()
+    assert not NovedadScheduler.objects.exists()
+
+
+def test_scheduler_sin_consultas_por_tarea(db, settings):
+    """
+    Armar la cola hace la misma cantidad de consultas sin importar cuántas tareas se encolan.
+    """
+    settings.MIN_COINCIDENCIAS_IDENTIFICACION = 2
+    distrito = DistritoFactory()
+
+    def agregar_tareas(cantidad):
+        for i in range(cantidad):
+            # Una foto preidentificada con una identificación sin consolidar.
+            foto = AttachmentFactory(pre_identificacion=PreidentificacionFactory(distrito=distrito))
+            IdentificacionFactory(attachment=foto, status=Identificacion.STATUS.identificada)
+            # Y una mesa identificada con carga pendiente.
+            IdentificacionFactory(
+                mesa=MesaFactory(categorias=[CategoriaFactory()]),
+                status=Identificacion.STATUS.identificada,
+                source=Identificacion.SOURCES.csv,
+            )
+        consumir_novedades_identificacion()
+
+    def consultas_scheduler():
+        with CaptureQueriesContext(connection) as consultas:
+            scheduler(reconstruir_la_cola=True)
+        return len(consultas)
+
+    agregar_tareas(2)
+    pocas = consultas_scheduler()
+    agregar_tareas(5)
+    assert consultas_scheduler() == pocas
+
+    fotos = ColaCargasPendientes.objects.exclude(attachment__pre_identificacion=None)
+    # Cada foto ya tiene una identificación: falta sólo una.
+    assert fotos.count() == 7
+    assert set(fotos.values_list('distrito', flat=True)) == {distrito.id}
+
+
+def test_encolar_circuitos_prioritarios(db, settings):
+    settings.MIN_COINCIDENCIAS_CARGAS = 2
+    settings.MIN_COINCIDENCIAS_IDENTIFICACION = 2
+    categoria = CategoriaFactory(sensible=True)
+    circuito = CircuitoFactory()
+    mesas = [
+        MesaFactory(categorias=[categoria], lugar_votacion=LugarVotacionFactory(circuito=circuito))
+        for _ in range(2)
+    ]
+    for mesa in mesas:
+        IdentificacionFactory(
+            mesa=mesa, status=Identificacion.STATUS.identificada, source=Identificacion.SOURCES.csv
+        )
+    consumir_novedades_identificacion()
+    foto = AttachmentFactory(pre_identificacion=PreidentificacionFactory(circuito=circuito))
+    # Una foto de otro circuito no se prioriza.
+    otra_foto = AttachmentFactory(pre_identificacion=PreidentificacionFactory(circuito=CircuitoFactory()))
+    ColaCargasPendientes.objects.create(attachment=otra_foto, orden=10)
+
+    CircuitoPrioritario.objects.create(circuito=circuito, categoria=categoria, cant_mesas_necesarias=3)
+    assert CircuitoPrioritario.faltantes() == {(circuito.id, categoria.id): 3}
+
+    # Una de las mesas ya estaba encolada por el scheduler: conserva su antigüedad.
+    encolada = MesaCategoria.objects.get(mesa=mesas[0])
+    antes = timezone.now() - timedelta(minutes=5)
+    for numero_carga in range(2):
+        ColaCargasPendientes.objects.create(
+            mesa_categoria=encolada, orden=50, numero_carga=numero_carga, creada=antes
+        )
+
+    # Dos cargas y, como no alcanzan, una foto, con todas las unidades que les faltan.
+    assert encolar_circuitos_prioritarios() == (2, 1)
+    cola = list(ColaCargasPendientes.objects.order_by('orden', 'id').values_list(
+        'mesa_categoria__mesa', 'attachment', 'orden'
+    ))
+    # Delante de lo que ya estaba en la cola, en el orden en que se eligieron.
+    assert [orden for _, _, orden in cola] == [4, 5, 6, 7, 8, 9, 10]
+    assert cola[0][0] == cola[1][0] and cola[2][0] == cola[3][0]
+    assert {mesa for mesa, _, _ in cola[:4]} == {mesas[0].id, mesas[1].id}
+    assert [attachment for _, attachment, _ in cola[4:]] == [foto.id, foto.id, otra_foto.id]
+    assert set(ColaCargasPendientes.objects.filter(
+        mesa_categoria=encolada).values_list('creada', flat=True)) == {antes}
+
+    # Volver a correrlo no duplica tareas.
+    encolar_circuitos_prioritarios()
+    assert ColaCargasPendientes.largo_cola() == 7
+
+
+def test_scheduler_no_repite_tareas_con_la_cola_particionada(db, settings):
+    """
+    Las tareas ya encoladas no se repiten, tengan o no distrito (las sin distrito van a una
+    partición en la que NULL no choca con la unicidad que incluye al distrito).
+    """
+    settings.MIN_COINCIDENCIAS_IDENTIFICACION = 2
+    distrito = DistritoFactory()
+    if connection.vendor == 'postgresql' and connection.pg_version >= 110000:
+        assert ColaCargasPendientes.particion(distrito.id) in ColaCargasPendientes.particiones()
+
+    AttachmentFactory.create_batch(3)
+    AttachmentFactory(pre_identificacion=PreidentificacionFactory(distrito=distrito))
+    IdentificacionFactory(
+        mesa=MesaFactory(categorias=[CategoriaFactory()]),
+        status=Identificacion.STATUS.identificada,
+        source=Identificacion.SOURCES.csv,
+    )
+    consumir_novedades_identificacion()
+
+    scheduler()
+    largo = ColaCargasPendientes.largo_cola()
+    assert ColaCargasPendientes.objects.filter(distrito=None).exists()
+    scheduler()
+    assert ColaCargasPendientes.largo_cola() == largo
+
+
+def test_reconstruir_cola_de_distrito(db, settings):
+    settings.MIN_COINCIDENCIAS_CARGAS = 1
+    distritos = [DistritoFactory(), DistritoFactory()]
+    categoria = CategoriaFactory()
+    for distrito in distritos:
+        for _ in range(2):
+            mesa = MesaFactory(
+                categorias=[categoria],
+                lugar_votacion=LugarVotacionFactory(circuito=CircuitoFactory(seccion__distrito=distrito))
+            )
+            IdentificacionFactory(
+                mesa=mesa, status=Identificacion.STATUS.identificada, source=Identificacion.SOURCES.csv
+            )
+    consumir_novedades_identificacion()
+    scheduler(reconstruir_la_cola=True)
+
+    def cola(distrito):
+        tareas = ColaCargasPendientes.objects.filter(distrito=distrito)
+        return set(tareas.values_list('id', 'orden', 'mesa_categoria'))
+
+    otro_distrito = cola(distritos[1])
+    lugares = {orden for _, orden, _ in cola(distritos[0])}
+    assert len(otro_distrito) == 2 and len(lugares) == 2
+
+    # Una de las mesas del distrito ya no tiene carga pendiente.
+    consolidada, pendiente = MesaCategoria.objects.filter(distrito=distritos[0]).order_by('id')
+    consolidada.actualizar_status(MesaCategoria.STATUS.total_consolidada_dc, None)
+    # Reconstruir la cola no reinicia la antigüedad de las tareas que siguen pendientes.
+    antes = timezone.now() - timedelta(minutes=5)
+    ColaCargasPendientes.objects.update(creada=antes)
+
+    assert reconstruir_cola_de_distrito(distritos[0].id) == (1, 1, 0)
+    assert ColaCargasPendientes.objects.get(mesa_categoria=pendiente).creada == antes
+    # La pendiente quedó en el primero de los lugares del distrito, y las demás tareas no se tocaron.
+    assert [(orden, mc) for _, orden, mc in cola(distritos[0])] == [(min(lugares), pendiente.id)]
+    assert cola(distritos[1]) == otro_distrito
+    # Un distrito sin tareas encoladas no cambia.
+    assert reconstruir_cola_de_distrito(DistritoFactory().id) == (0, 0, 0)
+
+    scheduler(reconstruir_la_cola=True)
+    assert set(ColaCargasPendientes.objects.values_list('creada', flat=True)) == {antes}
+
+
 def consumir(es_attachment=True):
     """
     Consumo una tarea y espero que sea attachment (o no).
@@ -192,3 +413,26 @@ def test_scheduler_orden_distinto(db, settings):
     assert ColaCargasPendientes.largo_cola() == 0
     (mc, attachment) = ColaCargasPendientes.siguiente_tarea(fiscal=None)
     assert mc is None and attachment is None
+
+
+def test_simulador(db, settings):
+    settings.MIN_COINCIDENCIAS_IDENTIFICACION = 1
+    settings.MIN_COINCIDENCIAS_CARGAS = 1
+    categoria = CategoriaFactory()
+    mesas = [MesaFactory(categorias=[categoria]) for _ in range(3)]
+
+    simulador = Simulador(
+        llegadas_sinteticas(3, 1, curva='uniforme'), cant_fiscales=2, prob_error=0, prob_abandono=0,
+        minutos=10
+    )
+    minutos = simulador.correr()
+    assert simulador.cant_minutos_medidos == 10
+    assert sum(minuto['actas'] for minuto in minutos) == 3
+
+    # Las tres actas se identifican con su mesa y se cargan una vez.
+    assert set(Attachment.objects.values_list('mesa', flat=True)) == {mesa.id for mesa in mesas}
+    assert MesaCategoria.objects.filter(status=MesaCategoria.STATUS.total_consolidada_dc).count() == 3
+    resumen = simulador.resumen()
+    assert resumen['mesas_consolidadas'] == 3
+    assert resumen['tareas_entregadas'] == 6
+    assert resumen['proporcion_de_mas'] == 0